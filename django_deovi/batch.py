@@ -0,0 +1,217 @@
+"""
+==========
+Batch load
+==========
+
+Load many device dumps listed in a manifest, each one in its own process.
+
+A manifest is a JSON list of entries where each entry is either an object with
+``device``, ``dump`` and optional ``covers_basepath`` items, or a list of the same
+values in this order: ::
+
+    [
+        {"device": "nas-1", "dump": "nas-1.json"},
+        ["nas-2", "nas-2/dump.json", "nas-2/covers"]
+    ]
+
+Relative paths are resolved from the manifest directory. When covers basepath is
+not given, the dump directory is used like the ``load_medias`` command does.
+
+"""
+import json
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.db import connections
+
+from .exceptions import DjangoDeoviError
+from .loader import DumpLoader
+from .outputs import BaseOutput
+
+
+ManifestEntry = namedtuple("ManifestEntry", ["device", "dump", "covers_basepath"])
+"""
+A manifest entry for a single device dump.
+"""
+
+LoadResult = namedtuple("LoadResult", ["entry", "elapsed", "report", "error"])
+"""
+Result of a single device dump load. ``error`` is ``None`` on success, else it is
+the error message, a load with rolled back chunks is a failure. ``report`` is the
+load report from ``DumpLoader.load`` as a dictionnary so it can be passed from a
+worker process, it is ``None`` if load has not finished.
+"""
+
+
+def failed_chunks_message(positions):
+    """
+    Build the error message for a load with failed chunks.
+
+    Arguments:
+        positions (list): Positions of failed chunks.
+
+    Returns:
+        string: Error message.
+    """
+    return "Failed to load {} chunk(s): {}".format(
+        len(positions),
+        ", ".join([str(item) for item in sorted(positions)]),
+    )
+
+
+def read_manifest(path):
+    """
+    Read and validate a manifest file.
+
+    Arguments:
+        path (pathlib.Path): Manifest file path.
+
+    Returns:
+        list: ``ManifestEntry`` objects for each manifest entry.
+    """
+    try:
+        items = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise DjangoDeoviError("Unable to read manifest: {}".format(e))
+
+    if not isinstance(items, list):
+        raise DjangoDeoviError("Manifest must be a list of entries.")
+
+    basedir = path.parent.resolve()
+    entries = []
+
+    for position, item in enumerate(items):
+        if isinstance(item, dict):
+            values = [
+                item.get("device"), item.get("dump"), item.get("covers_basepath")
+            ]
+        elif isinstance(item, list) and len(item) in (2, 3):
+            values = (item + [None])[:3]
+        else:
+            values = [None, None, None]
+
+        device, dump, covers_basepath = values
+
+        if not device or not dump:
+            msg = "Manifest entry {} must define at least a device and a dump."
+            raise DjangoDeoviError(msg.format(position))
+
+        dump = basedir / dump
+        covers_basepath = (
+            basedir / covers_basepath if covers_basepath else dump.parent
+        )
+
+        entries.append(ManifestEntry(device, dump, covers_basepath))
+
+    devices = [entry.device for entry in entries]
+    duplicates = sorted(set([item for item in devices if devices.count(item) > 1]))
+    if duplicates:
+        msg = "Manifest has many entries for the same device: {}"
+        raise DjangoDeoviError(msg.format(", ".join(duplicates)))
+
+    return entries
+
+
+def init_worker():
+    """
+    Initialize a worker process.
+
+    A forked process inherits from an already setup Django but a spawned one has to
+    set it up again.
+    """
+    if not apps.ready:
+        django.setup()
+
+
+def load_entry(entry, options=None):
+    """
+    Load a single device dump.
+
+    This is performed in a worker process so it must be a module level function.
+    Any error is catched and returned so a failure does not stop other loads.
+
+    Arguments:
+        entry (ManifestEntry): Entry to load.
+
+    Keyword Arguments:
+        options (dict): Options to give to ``DumpLoader``. The ``sync``,
+            ``force`` and ``resume`` items are given to ``DumpLoader.load``
+            instead.
+
+    Returns:
+        LoadResult: Load result.
+    """
+    options = dict(options or {})
+    sync = options.pop("sync", False)
+    force = options.pop("force", False)
+    resume = options.pop("resume", False)
+    start = time.perf_counter()
+
+    try:
+        if not entry.dump.exists():
+            msg = "Given dump path does not exists: {}".format(entry.dump)
+            raise DjangoDeoviError(msg)
+
+        loader = DumpLoader(output_interface=BaseOutput(), **options)
+        report = loader.load(
+            entry.device,
+            entry.dump,
+            covers_basepath=entry.covers_basepath.resolve(),
+            sync=sync,
+            force=force,
+            resume=resume,
+        )
+    except Exception as e:
+        return LoadResult(entry, time.perf_counter() - start, None, str(e))
+
+    error = None
+    if report.failed_chunks:
+        error = failed_chunks_message(report.failed_chunks)
+
+    return LoadResult(entry, time.perf_counter() - start, report.as_dict(), error)
+
+
+def load_manifest(entries, processes=None, options=None):
+    """
+    Load device dumps from manifest entries.
+
+    Each dump is loaded in a pool of processes. Database connections are closed
+    before starting processes so each worker process opens its own connection.
+
+    Arguments:
+        entries (list): ``ManifestEntry`` objects to load.
+
+    Keyword Arguments:
+        processes (integer): Number of worker processes. Default to the number of
+            processors. With a single process, dumps are loaded one after another
+            in the current process.
+        options (dict): Options given to ``load_entry``.
+
+    Returns:
+        list: ``LoadResult`` objects in the same order than entries.
+    """
+    if processes == 1 or len(entries) < 2:
+        return [load_entry(entry, options=options) for entry in entries]
+
+    connections.close_all()
+
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=init_worker
+    ) as executor:
+        futures = [
+            executor.submit(load_entry, entry, options=options)
+            for entry in entries
+        ]
+
+    results = []
+    for entry, future in zip(entries, futures):
+        # A worker process which died abruptly does not return any result
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(LoadResult(entry, 0, None, str(e) or repr(e)))
+
+    return results
@@ -0,0 +1,256 @@
+"""
+==============
+Dump converter
+==============
+
+Convert a dump file to another format from ``django_deovi.reader.DUMP_FORMATS``.
+
+Source dump is streamed with the reader so only a registry directory at once is
+held in memory. Binary formats need the length of a map before its items, so the
+encoded items of a streamed section are written to a temporary file until its
+length is known.
+
+"""
+import json
+import shutil
+import tempfile
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .exceptions import DjangoDeoviError
+from .reader import (
+    CHUNK_SIZE, DUMP_FORMATS, STREAMED_SECTIONS, iter_dump, require_format_package,
+)
+
+
+class DumpConverter:
+    """
+    Convert a dump to JSON.
+
+    JSON does not need the length of objects so items are written as they come.
+    This is also the base of converters for binary formats.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each read from source dump.
+    """
+    format_name = "json"
+
+    def __init__(self, chunk_size=None):
+        require_format_package(self.format_name)
+        self.chunk_size = chunk_size or CHUNK_SIZE
+
+    def encode(self, value):
+        """
+        Encode a value.
+
+        Arguments:
+            value (object): Value to encode.
+
+        Returns:
+            bytes: Encoded value.
+        """
+        return json.dumps(value).encode("utf-8")
+
+    def write(self, items, fp):
+        """
+        Write dump items.
+
+        Arguments:
+            items (iterator): Dump items as yielded from
+                ``django_deovi.reader.iter_dump``.
+            fp (io.BufferedIOBase): Opened binary file object to write to.
+
+        Returns:
+            integer: Number of written items from streamed sections.
+        """
+        written = 0
+        sections = 0
+        opened = None
+        first_item = True
+
+        fp.write(b"{")
+
+        for section, key, value in items:
+            # Close a streamed section once its items are over
+            if opened is not None and section != opened:
+                fp.write(b"}")
+                opened = None
+
+            if section in STREAMED_SECTIONS and key is None:
+                fp.write((b"," if sections else b"") + self.encode(section) + b":{")
+                sections += 1
+                opened = section
+                first_item = True
+            elif section in STREAMED_SECTIONS:
+                fp.write(
+                    (b"" if first_item else b",") + self.encode(key) + b":" +
+                    self.encode(value)
+                )
+                first_item = False
+                written += 1
+            else:
+                fp.write(
+                    (b"," if sections else b"") + self.encode(section) + b":" +
+                    self.encode(value)
+                )
+                sections += 1
+
+        if opened is not None:
+            fp.write(b"}")
+        fp.write(b"}")
+
+        return written
+
+    def convert(self, source, destination):
+        """
+        Convert a dump file.
+
+        Arguments:
+            source (pathlib.Path or dict): Path to the dump file to convert, it may
+                be compressed and in any format. Or directly a dump dictionnary.
+            destination (pathlib.Path): Path to the file to write.
+
+        Returns:
+            integer: Number of converted registry directories.
+        """
+        items = iter_dump(source, chunk_size=self.chunk_size)
+
+        with destination.open("wb") as fp:
+            return self.write(items, fp)
+
+
+class BinaryDumpConverter(DumpConverter):
+    """
+    Base converter for binary formats.
+
+    Binary formats need the length of a map before its items, so the encoded items
+    of a streamed section are written to a temporary file until its length is
+    known.
+
+    Arguments:
+        encode (callable): Function to encode a value to bytes.
+        encode_map_header (callable): Function to encode the header of a map from
+            its number of items.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each read from source dump.
+    """
+    def __init__(self, encode, encode_map_header, chunk_size=None):
+        super().__init__(chunk_size=chunk_size)
+        self.encode = encode
+        self.encode_map_header = encode_map_header
+
+    def write(self, items, fp):
+        sections = []
+        written = 0
+
+        try:
+            for section, key, value in items:
+                if section in STREAMED_SECTIONS and key is None:
+                    sections.append([section, tempfile.TemporaryFile(), 0])
+                elif section in STREAMED_SECTIONS:
+                    sections[-1][1].write(self.encode(key) + self.encode(value))
+                    sections[-1][2] += 1
+                    written += 1
+                else:
+                    sections.append([section, self.encode(value), None])
+
+            fp.write(self.encode_map_header(len(sections)))
+            for section, content, length in sections:
+                fp.write(self.encode(section))
+                if length is None:
+                    fp.write(content)
+                else:
+                    fp.write(self.encode_map_header(length))
+                    content.seek(0)
+                    shutil.copyfileobj(content, fp)
+        finally:
+            for section, content, length in sections:
+                if length is not None:
+                    content.close()
+
+        return written
+
+
+class MessagePackDumpConverter(BinaryDumpConverter):
+    """
+    Convert to MessagePack.
+    """
+    format_name = "msgpack"
+
+    def __init__(self, chunk_size=None):
+        require_format_package(self.format_name)
+        packer = msgpack.Packer(use_bin_type=True)
+        super().__init__(
+            packer.pack, packer.pack_map_header, chunk_size=chunk_size
+        )
+
+
+def encode_cbor_map_header(length):
+    """
+    Encode the header of a CBOR map with the shortest length encoding.
+
+    Arguments:
+        length (integer): Number of map items.
+
+    Returns:
+        bytes: Encoded header.
+    """
+    # Major type 5
+    if length < 24:
+        return bytes([0xa0 + length])
+
+    for info, size in ((24, 1), (25, 2), (26, 4), (27, 8)):
+        if length < 256 ** size:
+            return bytes([0xa0 + info]) + length.to_bytes(size, "big")
+
+
+class CBORDumpConverter(BinaryDumpConverter):
+    """
+    Convert to CBOR.
+    """
+    format_name = "cbor"
+
+    def __init__(self, chunk_size=None):
+        require_format_package(self.format_name)
+        super().__init__(
+            cbor2.dumps, encode_cbor_map_header, chunk_size=chunk_size
+        )
+
+
+CONVERTERS = {
+    DumpConverter.format_name: DumpConverter,
+    MessagePackDumpConverter.format_name: MessagePackDumpConverter,
+    CBORDumpConverter.format_name: CBORDumpConverter,
+}
+"""
+Available converters per format name.
+"""
+
+
+def get_converter(dump_format, chunk_size=None):
+    """
+    Get a dump converter.
+
+    Arguments:
+        dump_format (string): A format name from
+            ``django_deovi.reader.DUMP_FORMATS``.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each read from source dump.
+
+    Returns:
+        DumpConverter: Converter object.
+    """
+    if dump_format not in DUMP_FORMATS:
+        raise DjangoDeoviError("Unknown dump format: {}".format(dump_format))
+
+    return CONVERTERS[dump_format](chunk_size=chunk_size)
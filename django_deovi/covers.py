@@ -0,0 +1,88 @@
+"""
+===========
+Cover files
+===========
+
+Covers attached by the loader are stored under a name computed from their content,
+so identical covers from any directory or device share a single stored file and an
+unchanged cover is never copied again.
+
+Since a stored cover may be shared by many objects, it must only be removed from
+storage once no object references it anymore.
+
+"""
+import hashlib
+from contextlib import nullcontext
+from pathlib import Path
+
+
+COVERS_DIR = "directory/cover/content"
+"""
+Storage directory where content addressed covers are stored.
+"""
+
+NAME_DIGEST_SIZE = 20
+"""
+Size in bytes of the content checksum used to name a cover file.
+"""
+
+
+def content_name(fileobject, basedir=None):
+    """
+    Compute the storage name of a file from its content.
+
+    Name is made of the content checksum, prefixed with a subdirectory of its two
+    first characters so stored files are spread over many directories. Original
+    file extension is kept.
+
+    Arguments:
+        fileobject (django.core.files.File): File to compute name for.
+
+    Keyword Arguments:
+        basedir (string): Storage directory to prefix name with. Default to
+            ``COVERS_DIR``.
+
+    Returns:
+        string: Storage name.
+    """
+    checksum = hashlib.blake2b(digest_size=NAME_DIGEST_SIZE)
+
+    for chunk in fileobject.chunks():
+        checksum.update(chunk)
+
+    digest = checksum.hexdigest()
+
+    return "{}/{}/{}{}".format(
+        basedir or COVERS_DIR,
+        digest[:2],
+        digest,
+        Path(fileobject.name).suffix.lower(),
+    )
+
+
+def store_cover(storage, fileobject, basedir=None, lock=None):
+    """
+    Store a cover file under its content name unless it is already stored.
+
+    Arguments:
+        storage (django.core.files.storage.Storage): Storage to save file to.
+        fileobject (django.core.files.File): Cover file to store.
+
+    Keyword Arguments:
+        basedir (string): Storage directory to store file into. Default to
+            ``COVERS_DIR``.
+        lock (threading.Lock): If given, the lookup and save are performed while
+            holding it, so threads storing the same cover do not save it twice
+            under different names.
+
+    Returns:
+        tuple: Storage name of the stored cover and a boolean which is True if file
+        has been copied to storage or False if it was already stored.
+    """
+    name = content_name(fileobject, basedir=basedir)
+
+    with lock or nullcontext():
+        if storage.exists(name):
+            return name, False
+
+        return storage.save(name, fileobject), True
@@ -0,0 +1,114 @@
+"""
+===============
+Delta documents
+===============
+
+A delta document describes the changes of a device since a base dump, so a small
+change on a huge device does not need to load and compare its full registry again.
+
+It is a JSON object which starts with a ``delta`` item: ::
+
+    {
+        "delta": {
+            "base": "<checksum of the base dump file>",
+            "checksum": "<checksum of the full dump file including the changes>",
+            "size": 123456
+        },
+        "device": {"total": 1000, "used": 250, "free": 750},
+        "directories": {
+            "added": {"<key>": {<directory payload>}},
+            "changed": {"<key>": {<directory payload>}},
+            "removed": ["<directory path>"]
+        },
+        "files": {
+            "added": [{<file payload>}],
+            "changed": [{<file payload>}],
+            "removed": ["<file path>"]
+        }
+    }
+
+Directory and file payloads are the same than in a full dump, directory payloads
+may have their ``children_files`` and file payloads are attached to the directory
+from their ``absolute_dir``. Every items are optional except ``delta``, where
+``size`` is only used to fingerprint the resulting dump.
+
+A delta can only be applied on a device whose last loaded dump is the base one.
+
+"""
+from .exceptions import DjangoDeoviError
+from .reader import iter_dump
+
+
+DELTA_SECTION = "delta"
+"""
+Name of the top level item which identifies a delta document, it must be the first
+one.
+"""
+
+
+def is_delta(dump):
+    """
+    Check if a dump is a delta document.
+
+    Only the first item of a dump file is read.
+
+    Arguments:
+        dump (pathlib.Path or dict): The path object for the dump file or directly
+            the dump dictionnary.
+
+    Returns:
+        bool: True if dump is a delta document.
+    """
+    if isinstance(dump, dict):
+        return DELTA_SECTION in dump
+
+    items = iter_dump(dump)
+
+    try:
+        section, key, value = next(items)
+    except (StopIteration, DjangoDeoviError):
+        return False
+    finally:
+        items.close()
+
+    return section == DELTA_SECTION
+
+
+def validate_delta(delta):
+    """
+    Validate a delta document structure and fill its missing items.
+
+    Arguments:
+        delta (dict): Decoded delta document.
+
+    Returns:
+        dict: Delta document where every items are set.
+    """
+    meta = delta.get(DELTA_SECTION)
+    if not isinstance(meta, dict) or not meta.get("base") or not meta.get("checksum"):
+        raise DjangoDeoviError(
+            "Invalid delta document, it must have a 'delta' item with a 'base' "
+            "and a 'checksum'."
+        )
+
+    directories = delta.get("directories") or {}
+    files = delta.get("files") or {}
+
+    return {
+        DELTA_SECTION: {
+            "base": meta["base"],
+            "checksum": meta["checksum"],
+            "size": meta.get("size") or 0,
+        },
+        "device": delta.get("device"),
+        "directories": {
+            "added": directories.get("added") or {},
+            "changed": directories.get("changed") or {},
+            "removed": directories.get("removed") or [],
+        },
+        "files": {
+            "added": files.get("added") or [],
+            "changed": files.get("changed") or [],
+            "removed": files.get("removed") or [],
+        },
+    }
@@ -0,0 +1,161 @@
+"""
+==========
+Files diff
+==========
+
+Vectorized comparison of dumped files against existing MediaFile rows with pandas.
+
+Comparing files one by one in Python is the main cost of a load for devices with
+millions of files. Instead, the dumped files and the existing rows of many
+directories are loaded into DataFrames and classified with a single merge on
+directory and file path, then a comparison for each column:
+
+* ``create``: dumped files which do not exist yet;
+* ``update``: existing files with at least a changed value;
+* ``unchanged``: existing files without any changed value;
+* ``delete``: existing files which are not in the dump.
+
+Values are kept as Python objects in DataFrames so they compare exactly like the
+ORM values (timezone aware datetimes, integers without any float conversion).
+
+"""
+from collections import namedtuple
+
+import pandas
+
+from .index import IndexedFile
+from .models import MediaFile
+
+
+FileDiffResult = namedtuple(
+    "FileDiffResult", ["create", "update", "unchanged", "delete", "changed"]
+)
+"""
+Classified rows from a diff. Every items are DataFrames, ``changed`` has the same
+index than ``update`` and a boolean column for each compared field which is true
+when its value has changed.
+"""
+
+
+class FileDiff:
+    """
+    Compare dumped files to existing MediaFile rows.
+
+    Arguments:
+        fields (list): Names of MediaFile fields to compare.
+
+    Attributes:
+        KEYS (list): Column names used to match dumped files with existing rows.
+    """
+    KEYS = ["directory_id", "path"]
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def get_dumped_frame(self, batches):
+        """
+        Build a DataFrame of dumped files.
+
+        Arguments:
+            batches (dict): Batch of dumped files for each directory id.
+
+        Returns:
+            pandas.DataFrame: A row for each file with columns for directory id,
+            file position in its batch and every MediaFile field values.
+        """
+        data = {"directory_id": [], "position": []}
+
+        for directory_id, batch in batches.items():
+            data["directory_id"].extend([directory_id] * len(batch))
+            data["position"].extend(range(len(batch)))
+            for name, values in batch.convert_to_orm_columns().items():
+                data.setdefault(name, []).extend(values)
+
+        return pandas.DataFrame(data, dtype=object)
+
+    def get_existing_frame(self, directory_ids, index=None):
+        """
+        Build a DataFrame of existing files.
+
+        Arguments:
+            directory_ids (list): Directory ids to get files from.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): If given, files are taken
+                from this index instead of database. Directories are removed from
+                index, this way only the compared fields which are indexed are
+                available. Every indexed values are added to the DataFrame.
+
+        Returns:
+            pandas.DataFrame: A row for each file with columns for directory id,
+            primary key and compared field values.
+        """
+        if index is not None:
+            fields = list(IndexedFile._fields[1:])
+            rows = [
+                (directory_id, path, row.pk) + tuple(
+                    getattr(row, name) for name in fields
+                )
+                for directory_id in directory_ids
+                for path, row in index.directories.pop(directory_id, {}).items()
+            ]
+        else:
+            fields = self.fields
+            rows = MediaFile.objects.filter(
+                directory_id__in=directory_ids,
+            ).order_by().values_list("directory_id", "path", "pk", *fields)
+
+        return pandas.DataFrame.from_records(
+            list(rows),
+            columns=["directory_id", "path", "pk"] + fields,
+        ).astype(object)
+
+    def compare(self, dumped, existing):
+        """
+        Classify dumped files and existing rows.
+
+        Only the fields which are in both DataFrames are compared, a missing value
+        is equal to another missing value.
+
+        Arguments:
+            dumped (pandas.DataFrame): Dumped files as from ``get_dumped_frame``.
+            existing (pandas.DataFrame): Existing files as from
+                ``get_existing_frame``.
+
+        Returns:
+            FileDiffResult: Classified rows. Existing values of compared fields
+            have the suffix ``_existing``.
+        """
+        merged = dumped.merge(
+            existing,
+            how="outer",
+            on=self.KEYS,
+            suffixes=("", "_existing"),
+            indicator=True,
+        )
+        both = merged[merged["_merge"] == "both"]
+
+        compared = [
+            name for name in self.fields
+            if name in dumped.columns and name in existing.columns
+        ]
+        changed = pandas.DataFrame(
+            {
+                name: ~(
+                    both[name].eq(both[name + "_existing"]) |
+                    (both[name].isna() & both[name + "_existing"].isna())
+                )
+                for name in compared
+            },
+            index=both.index,
+            dtype=bool,
+        )
+        updated = changed.any(axis=1)
+
+        return FileDiffResult(
+            create=merged[merged["_merge"] == "left_only"],
+            update=both[updated],
+            unchanged=both[~updated],
+            delete=merged[merged["_merge"] == "right_only"],
+            changed=changed[updated],
+        )
@@ -1,21 +1,23 @@
 import datetime
-
-from dataclasses import dataclass
+from sys import intern
 
 from django.utils import timezone
 
 from .exceptions import DjangoDeoviError
 
 
-@dataclass
 class DumpedFile:
     """
     This is a basic NON Django model object.
 
     DumpedFile is device agnostic.
 
-    This use the Python dataclass to automatically implement comparaison as we could
-    expect from a proper data object.
+    Objects are compared on their field values from ``FIELDNAMES``, the transported
+    ``_mediafile`` is ignored.
+
+    Object is slotted and values from ``INTERNED_FIELDS`` are interned since they
+    are repeated for every files of a directory, so holding a lot of files costs
+    less memory.
 
     Arguments:
         **kwargs: Items to set field attributes. Only allowed field names from
@@ -38,6 +40,10 @@ class DumpedFile:
         "path", "name", "absolute_dir", "relative_dir", "directory", "extension",
         "container", "size", "mtime"
     ]
+    # Field names with values shared between sibling files
+    INTERNED_FIELDS = [
+        "absolute_dir", "relative_dir", "directory", "extension", "container"
+    ]
     # Associations of "DumpedFile fieldname : MediaFile fieldname"
     MEDIA_FILES_FIELDS = {
         "path": "path",
@@ -49,6 +55,8 @@ class DumpedFile:
         "mtime": "stored_date",
     }
 
+    __slots__ = tuple(FIELDNAMES) + ("_mediafile",)
+
     def __init__(self, *args, **kwargs):
         self._mediafile = kwargs.pop("mediafile", None)
         self._set_fields(**kwargs)
@@ -75,7 +83,7 @@ class DumpedFile:
                     msg = "DumpedFile.mtime must be a string in ISO format."
                     raise DjangoDeoviError(msg)
 
-                setattr(self, item, kwargs.get(item))
+                setattr(self, item, self._intern(item, kwargs.get(item)))
 
         # If there is any missing required field, raise an error
         if _missing_kwargs:
@@ -84,6 +92,29 @@ class DumpedFile:
             )
             raise DjangoDeoviError(msg)
 
+    @classmethod
+    def _intern(cls, name, value):
+        """
+        Intern a string value if its field is from ``INTERNED_FIELDS``.
+
+        Arguments:
+            name (string): Field name.
+            value (object): Field value.
+
+        Returns:
+            object: Interned value or the value unchanged.
+        """
+        if name in cls.INTERNED_FIELDS and isinstance(value, str):
+            return intern(value)
+
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, DumpedFile):
+            return NotImplemented
+
+        return self.to_dict() == other.to_dict()
+
     def __repr__(self):
         return "<DumpedFile: {}>".format(self.path)
 
@@ -106,6 +137,30 @@ class DumpedFile:
         """
         return getattr(self, item)
 
+    @classmethod
+    def from_values(cls, values, mediafile=None):
+        """
+        Return a DumpedFile from already validated values, without any validation.
+
+        This is used to get a view of a file from ``DumpedFileBatch``.
+
+        Arguments:
+            values (dict): Values for every field names from ``FIELDNAMES``.
+
+        Keyword Arguments:
+            mediafile (django_deovi.models.MediaFile): A MediaFile object to
+                transport.
+
+        Returns:
+            DumpedFile: A DumpedFile object with given values.
+        """
+        obj = cls.__new__(cls)
+        for name, value in values.items():
+            setattr(obj, name, value)
+        obj._mediafile = mediafile
+
+        return obj
+
     @classmethod
     def from_dict(cls, **kwargs):
         """
@@ -167,3 +222,199 @@ class DumpedFile:
             modelname: self._convert_type(modelname, getattr(self, dumpname))
             for dumpname, modelname in self.MEDIA_FILES_FIELDS.items()
         }
+
+
+class DumpedFileBatch:
+    """
+    Columnar batch of dumped files.
+
+    Values are stored as a list for each field name, they are validated and
+    converted column per column instead of building a ``DumpedFile`` object for each
+    file. A ``DumpedFile`` can still be get for any file as a view on batch values.
+
+    Batch should be created with ``from_payloads`` or ``from_objects``.
+
+    Arguments:
+        columns (dict): List of values for each field name from
+            ``DumpedFile.FIELDNAMES``. All lists have the same length.
+    """
+    FIELDNAMES = DumpedFile.FIELDNAMES
+    INTERNED_FIELDS = DumpedFile.INTERNED_FIELDS
+    MEDIA_FILES_FIELDS = DumpedFile.MEDIA_FILES_FIELDS
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_payloads(cls, files):
+        """
+        Create a batch from file payloads with validation.
+
+        Arguments:
+            files (list): List of dictionnaries for dumped files.
+
+        Returns:
+            DumpedFileBatch: Batch of given files.
+        """
+        columns = {
+            name: [item.get(name) for item in files]
+            for name in cls.FIELDNAMES
+        }
+
+        # Shared values are interned like DumpedFile does
+        for name in cls.INTERNED_FIELDS:
+            columns[name] = [
+                intern(value) if isinstance(value, str) else value
+                for value in columns[name]
+            ]
+
+        missing = [
+            name for name, values in columns.items()
+            if any(value is None for value in values)
+        ]
+        if missing:
+            msg = "DumpedFile missed some required arguments: {}".format(
+                ", ".join(missing)
+            )
+            raise DjangoDeoviError(msg)
+
+        if not all(isinstance(value, str) for value in columns["mtime"]):
+            raise DjangoDeoviError("DumpedFile.mtime must be a string in ISO format.")
+
+        return cls(columns)
+
+    @classmethod
+    def from_objects(cls, files):
+        """
+        Create a batch from DumpedFile objects which are already validated.
+
+        Arguments:
+            files (list): List of DumpedFile objects.
+
+        Returns:
+            DumpedFileBatch: Batch of given files.
+        """
+        if isinstance(files, cls):
+            return files
+
+        return cls({
+            name: [getattr(item, name) for item in files]
+            for name in cls.FIELDNAMES
+        })
+
+    def __len__(self):
+        return len(self.columns["path"])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.view(position)
+
+    def __getitem__(self, position):
+        return self.view(position)
+
+    def __eq__(self, other):
+        if isinstance(other, DumpedFileBatch):
+            return self.columns == other.columns
+
+        if isinstance(other, list):
+            return list(self) == other
+
+        return NotImplemented
+
+    def __repr__(self):
+        return "<DumpedFileBatch: {} files>".format(len(self))
+
+    @property
+    def paths(self):
+        """
+        List of file paths.
+        """
+        return self.columns["path"]
+
+    def view(self, position, mediafile=None):
+        """
+        Get a file from batch.
+
+        Arguments:
+            position (integer): File position in batch.
+
+        Keyword Arguments:
+            mediafile (django_deovi.models.MediaFile): A MediaFile object to
+                transport.
+
+        Returns:
+            DumpedFile: A DumpedFile object for file values.
+        """
+        return DumpedFile.from_values(
+            {name: values[position] for name, values in self.columns.items()},
+            mediafile=mediafile,
+        )
+
+    def select(self, positions):
+        """
+        Create a new batch with some files.
+
+        Arguments:
+            positions (list): Positions of files to select.
+
+        Returns:
+            DumpedFileBatch: Batch of selected files.
+        """
+        return DumpedFileBatch({
+            name: [values[position] for position in positions]
+            for name, values in self.columns.items()
+        })
+
+    def convert_dates(self, values):
+        """
+        Convert ISO datetime strings to timezone aware datetimes.
+
+        Naive datetimes get the default timezone like ``DumpedFile`` does. Identical
+        strings are only parsed once.
+
+        Arguments:
+            values (list): List of ISO datetime strings.
+
+        Returns:
+            list: List of datetime objects.
+        """
+        default_timezone = timezone.get_default_timezone()
+        parse = datetime.datetime.fromisoformat
+        parsed = {}
+
+        for value in set(values):
+            converted = parse(value)
+            if converted.utcoffset() is None:
+                converted = converted.replace(tzinfo=default_timezone)
+            parsed[value] = converted
+
+        return [parsed[value] for value in values]
+
+    def convert_to_orm_columns(self):
+        """
+        Return columns with the MediaFile field names and value types.
+
+        Returns:
+            dict: List of values for each MediaFile field name.
+        """
+        return {
+            modelname: (
+                self.convert_dates(self.columns[dumpname])
+                if modelname == "stored_date" else self.columns[dumpname]
+            )
+            for dumpname, modelname in self.MEDIA_FILES_FIELDS.items()
+        }
+
+    def iter_orm_fields(self):
+        """
+        Iterate over files values with the MediaFile field names and value types.
+
+        Yields:
+            dict: MediaFile field values for a file, like
+            ``DumpedFile.convert_to_orm_fields``.
+        """
+        columns = self.convert_to_orm_columns()
+        names = list(columns)
+
+        for values in zip(*columns.values()):
+            yield dict(zip(names, values))
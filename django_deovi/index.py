@@ -0,0 +1,188 @@
+"""
+=============
+Device index
+=============
+
+Compact in-memory indexes of a device Directory and MediaFile rows used by the loader
+instead of querying existing objects one by one.
+
+"""
+from collections import namedtuple
+
+from .models import Directory, MediaFile
+
+
+IndexedDirectory = namedtuple("IndexedDirectory", ["pk", "checksum", "cover"])
+"""
+Indexed values for a single Directory row.
+"""
+
+IndexedFile = namedtuple("IndexedFile", ["pk", "filesize", "stored_date"])
+"""
+Indexed values for a single MediaFile row.
+"""
+
+
+def index_directories(device, paths=None):
+    """
+    Index every Directory from a device in a single query.
+
+    Only the values required to know if a directory has changed and to update it
+    are fetched, the large ones like payload are not.
+
+    Arguments:
+        device (django_deovi.models.Device): Device to index directories from.
+
+    Keyword Arguments:
+        paths (list): If given, only the directories with these paths are indexed.
+
+    Returns:
+        dict: A dictionnary where each item key is a directory path and item value is
+        an ``IndexedDirectory``.
+    """
+    queryset = Directory.objects.filter(device=device)
+    if paths is not None:
+        queryset = queryset.filter(path__in=paths)
+
+    rows = queryset.order_by().values_list("path", "pk", "checksum", "cover")
+
+    return {
+        path: IndexedDirectory(pk, checksum, cover)
+        for path, pk, checksum, cover in rows
+    }
+
+
+def get_directory(device, path, row):
+    """
+    Build a Directory object from indexed values.
+
+    Built object only have the indexed values, every other fields are deferred.
+    It is only suitable to be filled and then updated with a bulk update.
+
+    Arguments:
+        device (django_deovi.models.Device): Device of directory.
+        path (string): Directory path.
+        row (IndexedDirectory): Indexed values.
+
+    Returns:
+        django_deovi.models.Directory: Directory object.
+    """
+    return Directory.from_db(
+        Directory.objects.db,
+        ["id", "device_id", "path", "checksum", "cover"],
+        [row.pk, device.pk, path, row.checksum, row.cover],
+    )
+
+
+class MediaFileIndex:
+    """
+    Index of MediaFile rows grouped by directory id then by path.
+
+    Only a few values are indexed and they are stored as tuples so the index stays
+    compact even for a device with a lot of files.
+
+    Attributes:
+        FIELDS (list): MediaFile field names to get for each indexed row.
+        directories (dict): Indexed rows, each item key is a directory id and item
+            value is a dictionnary of ``IndexedFile`` indexed on file path.
+    """
+    FIELDS = ["directory_id", "path", "pk", "filesize", "stored_date"]
+
+    def __init__(self):
+        self.directories = {}
+
+    def __len__(self):
+        return sum([len(item) for item in self.directories.values()])
+
+    def __contains__(self, item):
+        directory_id, path = item
+
+        return path in self.directories.get(directory_id, {})
+
+    @classmethod
+    def from_device(cls, device, chunk_size=2000):
+        """
+        Build an index of every MediaFile from a device in a single query.
+
+        Arguments:
+            device (django_deovi.models.Device): Device to index files from.
+
+        Keyword Arguments:
+            chunk_size (integer): Number of rows fetched from database cursor at
+                once.
+
+        Returns:
+            MediaFileIndex: Index filled with device files.
+        """
+        index = cls()
+
+        rows = MediaFile.objects.filter(
+            directory__device=device,
+        ).order_by().values_list(*cls.FIELDS)
+
+        for row in rows.iterator(chunk_size=chunk_size):
+            index.add(*row)
+
+        return index
+
+    def add(self, directory_id, path, pk, filesize, stored_date):
+        """
+        Add a row to the index.
+
+        Arguments:
+            directory_id (integer): Related Directory primary key.
+            path (string): File path.
+            pk (integer): MediaFile primary key.
+            filesize (integer): File size.
+            stored_date (datetime.datetime): File storage date.
+        """
+        self.directories.setdefault(directory_id, {})[path] = IndexedFile(
+            pk, filesize, stored_date
+        )
+
+    def pop(self, directory_id, path):
+        """
+        Remove a row from index and return it.
+
+        Arguments:
+            directory_id (integer): Related Directory primary key.
+            path (string): File path.
+
+        Returns:
+            IndexedFile: Indexed values if row exists in index else ``None``.
+        """
+        files = self.directories.get(directory_id)
+        if not files:
+            return None
+
+        return files.pop(path, None)
+
+    def discard(self, directory_id):
+        """
+        Remove every rows of a directory from index.
+
+        Arguments:
+            directory_id (integer): Related Directory primary key.
+        """
+        self.directories.pop(directory_id, None)
+
+    def get_mediafile(self, directory_id, path, row):
+        """
+        Build a MediaFile object from indexed values.
+
+        Built object only have the indexed values, every other fields are deferred.
+        It is only suitable to compare indexed values and perform bulk update on it.
+
+        Arguments:
+            directory_id (integer): Related Directory primary key.
+            path (string): File path.
+            row (IndexedFile): Indexed values.
+
+        Returns:
+            django_deovi.models.MediaFile: MediaFile object.
+        """
+        return MediaFile.from_db(
+            MediaFile.objects.db,
+            ["id", "directory_id", "path", "filesize", "stored_date"],
+            [row.pk, directory_id, path, row.filesize, row.stored_date],
+        )
@@ -0,0 +1,172 @@
+"""
+===============
+Cover ingestion
+===============
+
+Store the pending covers recorded by a loader with ``defer_covers`` enabled.
+
+Directory metadata is visible as soon as the load is over, then covers are copied
+by batches in a pool of threads since copying a lot of files from a network mounted
+dump folder is slow.
+
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.files import File
+from django.db import transaction
+
+from .covers import content_name, store_cover
+from .models import Directory
+from .models.querysets import purge_covers
+from .outputs import BaseOutput
+
+
+class CoverIngester:
+    """
+    Ingest pending directory covers.
+
+    Keyword Arguments:
+        output_interface (object): Object to output messages, default to
+            ``django_deovi.outputs.BaseOutput``.
+        workers (integer): Number of threads to read and copy cover files. Default to
+            ``CoverIngester.WORKERS``.
+        batch_size (integer): Number of directories to ingest and update at once.
+            Default to ``CoverIngester.BATCH_SIZE``.
+    """
+    BATCH_SIZE = 500
+    WORKERS = 8
+
+    def __init__(self, output_interface=None, workers=None, batch_size=None):
+        self.log = output_interface or BaseOutput()
+        self.workers = workers or self.WORKERS
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.storage = Directory._meta.get_field("cover").storage
+        self._lock = threading.Lock()
+
+    def get_name(self, path):
+        """
+        Compute the storage name of a cover file.
+
+        Arguments:
+            path (pathlib.Path): Cover file path.
+
+        Returns:
+            string: Storage name or ``None`` if file does not exist.
+        """
+        if not path.exists():
+            return None
+
+        with File(path.open("rb"), name=path.name) as fp:
+            return content_name(fp)
+
+    def store(self, path):
+        """
+        Copy a cover file to storage unless it is already stored.
+
+        The storage lookup and save are shared with every threads through a lock
+        (see ``django_deovi.covers.store_cover``).
+
+        Arguments:
+            path (pathlib.Path): Cover file path.
+
+        Returns:
+            string: Name of the stored file, the storage may have changed it.
+        """
+        with File(path.open("rb"), name=path.name) as fp:
+            return store_cover(self.storage, fp, lock=self._lock)[0]
+
+    def ingest_batch(self, rows):
+        """
+        Ingest covers of a batch of directories.
+
+        Cover names are computed first so identical covers are only copied once,
+        then covers are copied and directories are updated with a bulk update.
+        Replaced covers are removed once the update has been committed, if no other
+        directory use them.
+
+        Arguments:
+            rows (list): List of tuples ``(pk, pending_cover, cover)`` for
+                directories to ingest.
+
+        Returns:
+            tuple: Number of ingested covers and number of missing cover files.
+        """
+        paths = sorted(set([Path(pending) for pk, pending, cover in rows]))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            names = dict(zip(paths, executor.map(self.get_name, paths)))
+
+            # Many paths may have the same content, so the same name
+            sources = {name: path for path, name in names.items() if name}
+            stored = dict(zip(
+                sources.keys(),
+                executor.map(self.store, sources.values()),
+            ))
+
+        directories = []
+        replaced = []
+        missing = 0
+
+        for pk, pending, cover in rows:
+            name = names[Path(pending)]
+
+            # Like with the loader, a missing cover file removes the directory cover
+            if name is None:
+                self.log.warning("📄 Unable to find file: {}".format(pending))
+                missing += 1
+            else:
+                name = stored[name]
+
+            if cover and cover != name:
+                replaced.append(cover)
+
+            directories.append(Directory(pk=pk, cover=name, pending_cover=""))
+
+        with transaction.atomic():
+            Directory.objects.bulk_update(directories, ["cover", "pending_cover"])
+            transaction.on_commit(lambda: purge_covers(Directory, replaced))
+
+        return len(rows) - missing, missing
+
+    def ingest(self, queryset=None):
+        """
+        Ingest every pending covers.
+
+        Keyword Arguments:
+            queryset (django.db.models.QuerySet): Directory queryset to ingest covers
+                from. Default to every directories.
+
+        Returns:
+            dict: Number of ingested covers in item ``ingested`` and number of
+            missing cover files in item ``missing``.
+        """
+        if queryset is None:
+            queryset = Directory.objects.all()
+
+        queryset = queryset.exclude(pending_cover="").order_by("pk")
+
+        ingested = 0
+        missing = 0
+        last_pk = 0
+
+        # Batches are selected from the last primary key since ingested directories
+        # are removed from the queryset
+        while True:
+            rows = list(
+                queryset.filter(pk__gt=last_pk).values_list(
+                    "pk", "pending_cover", "cover"
+                )[:self.batch_size]
+            )
+            if not rows:
+                break
+
+            done, lost = self.ingest_batch(rows)
+            ingested += done
+            missing += lost
+            last_pk = rows[-1][0]
+
+        self.log.info("🖼️ Ingested {} covers, {} missing".format(ingested, missing))
+
+        return {"ingested": ingested, "missing": missing}
@@ -5,17 +5,34 @@ Deovi dump manager
 
 """
 import json
+import queue
+import threading
+import time
 
+from contextlib import nullcontext
+from itertools import islice
 from pathlib import Path
 
 from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.core.validators import validate_slug
+from django.db import connection, connections, transaction
 from django.utils import timezone
 
-from .dump import DumpedFile
+from .covers import store_cover
+from .delta import is_delta, validate_delta
+from .diff import FileDiff
+from .dump import DumpedFileBatch
+from .exceptions import DjangoDeoviError
+from .index import MediaFileIndex, get_directory, index_directories
 from .models import Device, Directory, MediaFile
+from .models.querysets import purge_covers
 from .outputs import BaseOutput
+from .plan import LoadPlan
+from .reader import iter_dump, read_dump_file
+from .report import LoadReport
+from .utils.fingerprint import DumpFingerprint, file_stat, hash_file
+from .writers import UpsertWriter, get_writer
 
 
 class DumpLoader:
@@ -33,6 +50,10 @@ class DumpLoader:
         EDITABLE_FIELDS (list): Only those MediaFile fields are allowed to be edited
             from loaded payload. Field 'loaded_date' should never be editable since it
             is already forced from 'create_files' and 'edit_files' methods.
+        CHUNK_LIMIT (integer): Default number of dumped directories to process
+            together.
+        DELETE_BATCH (integer): Default number of objects to delete in a single batch
+            when pruning. ``batch_limit`` is used instead if it has been given.
 
     Keyword Arguments:
         batch_limit (integer): Limit of entries to create or update in a single batch
@@ -41,20 +62,91 @@ class DumpLoader:
         output_interface (django_deovi.outputs.BaseOutput): The interface to use to
             output operation messages. It defaults on the basic interface which use
             Python logging.
+        chunk_limit (integer): Number of dumped directories to process together.
+            Directories from the same chunk are written with a single bulk
+            operation and committed in a single transaction. The bigger is the chunk,
+            the less queries and commits there is but the more memory it needs since
+            every chunk directories payload are held in memory. Default to
+            ``DumpLoader.CHUNK_LIMIT``.
+        read_size (integer): Minimal size of each read when streaming a dump file.
+            Default to ``django_deovi.reader.CHUNK_SIZE``.
+        file_index (boolean): If enabled, every MediaFile of the device are indexed
+            in memory with a single query before processing directories and file
+            distribution use this index instead of a query for each directory.
+            Default to False.
+        workers (integer): Number of threads to process chunks concurrently. Each
+            thread uses its own database connection. Default to 1 which process
+            chunks sequentially without any thread.
+        defer_covers (boolean): If enabled, cover files are not stored during load,
+            their resolved paths are recorded in ``Directory.pending_cover`` to be
+            ingested later with ``django_deovi.ingest.CoverIngester``. Default to
+            False.
+        writer (string or object): Writer to create files, either a writer name
+            from ``django_deovi.writers.WRITERS`` or a writer object. Default to the
+            fastest one for the database vendor.
+        upsert (boolean): If enabled, the files of each directory are written with
+            a single upsert statement (see ``django_deovi.writers.UpsertWriter``)
+            instead of reading existing files to create and edit them separately.
+            Only SQLite and PostgreSQL are supported. Default to False.
+        diff_engine (string): Engine to compare dumped files to existing ones, a
+            name from ``DIFF_ENGINES``. With ``python`` files are compared one by
+            one for each directory. With ``pandas`` files of every directories from
+            a chunk are compared at once with a vectorized diff (see
+            ``django_deovi.diff.FileDiff``), this is faster for devices with a lot
+            of files. It has no effect with upsert. Default to ``python``.
     """
     EDITABLE_FIELDS = [
         "filename", "absolute_dir", "container", "filesize", "stored_date"
     ]
-
-    def __init__(self, batch_limit=None, output_interface=None):
+    CHUNK_LIMIT = 500
+    DELETE_BATCH = 500
+    DIFF_ENGINES = ["python", "pandas"]
+    QUEUE_TIMEOUT = 0.5
+
+    def __init__(self, batch_limit=None, output_interface=None, chunk_limit=None,
+                 read_size=None, file_index=False, workers=None,
+                 defer_covers=False, writer=None, upsert=False, diff_engine=None):
         self.batch_limit = batch_limit
         self.log = output_interface or BaseOutput()
+        self.chunk_limit = chunk_limit or self.CHUNK_LIMIT
+        self.read_size = read_size
+        self.file_index = file_index
+        self.workers = workers or 1
+        self.defer_covers = defer_covers
+        self.writer = get_writer(writer, batch_size=batch_limit)
+        self.upsert_writer = None
+        if upsert:
+            self.upsert_writer = UpsertWriter(
+                batch_size=batch_limit, fields=self.EDITABLE_FIELDS
+            )
+        if diff_engine not in [None] + self.DIFF_ENGINES:
+            raise DjangoDeoviError("Unknown diff engine: {}".format(diff_engine))
+        self.diff = None
+        if diff_engine == "pandas":
+            self.diff = FileDiff(self.EDITABLE_FIELDS)
+        self._sections = set()
+        self.failed_chunks = []
+        self.skipped_directories = []
+        self._purged_covers = []
+        self.report = LoadReport()
+        self.checkpoint_checksum = None
+        self._write_lock = nullcontext()
+        self._checkpoint_lock = threading.Lock()
+        self._covers_lock = threading.Lock()
+        self._checkpoint_position = 1
+        self._committed = {}
 
     def open_dump(self, dump):
         """
+        Load a whole dump in memory.
+
+        Loader only use it for delta documents since it is too expensive for large
+        dumps, see ``iter_dump`` instead.
+
         Arguments:
             dump (pathlib.Path or dict): Either directly the dump dictionnary or a path
-                object for the dump file to load.
+                object for the dump file to load, it may be compressed and in any
+                format from ``django_deovi.reader.DUMP_FORMATS``.
 
         Returns:
             dict: A dictionnary of directories from dump.
@@ -62,7 +154,109 @@ class DumpLoader:
         if isinstance(dump, dict):
             return dump
 
-        return json.loads(dump.read_text())
+        return read_dump_file(dump)
+
+    def iter_dump(self, dump):
+        """
+        Iterate over dump content without loading it entirely in memory.
+
+        Arguments:
+            dump (pathlib.Path or dict): Either directly the dump dictionnary or a path
+                object for the dump file to read.
+
+        Returns:
+            iterator: Iterator of dump items as tuples ``(section, key, value)``. See
+            ``django_deovi.reader.JSONDumpReader`` for details.
+        """
+        return iter_dump(dump, chunk_size=self.read_size)
+
+    def iter_registry(self, device, items):
+        """
+        Filter registry directories from dump items.
+
+        Device disk usage is applied on the fly when its section is met. Since
+        directories are written as they come, the device section must come before
+        the registry one, else an error is raised before the first directory.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to update.
+            items (iterator): Dump items as returned from ``iter_dump``.
+
+        Yields:
+            tuple: Directory key and directory payload.
+        """
+        self._sections = set()
+
+        for section, key, value in items:
+            self._sections.add(section)
+
+            if section == "device":
+                # Update device with disk usage
+                self.set_device_stats(device, value)
+            elif section == "registry" and key is not None:
+                if "device" not in self._sections:
+                    self.invalid_structure()
+
+                yield key, value
+
+    def invalid_structure(self):
+        """
+        Output the critical error for a dump without the expected sections.
+        """
+        self.log.critical(
+            "The JSON dump structure does not fit to Deovi>=0.7.0, it must "
+            "have a 'device' and 'registry'."
+        )
+
+    def resume_registry(self, device, directories, existing, index=None):
+        """
+        Skip dumped directories until the device checkpoint key.
+
+        Skipped directories have already been committed from an unfinished load, so
+        they are removed from existing directories and their dumped files are
+        removed from files index. Files which are not in the dump anymore are kept
+        in index so they still can be pruned.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object with checkpoint.
+            directories (iterator): Iterator of tuples ``(key, payload)`` for each
+                dumped directory.
+            existing (dict): The map of existing directories from
+                ``preload_directories``. Skipped directories are removed from it.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files.
+
+        Yields:
+            tuple: Directory key and directory payload after checkpoint key.
+        """
+        directories = iter(directories)
+        skipped = 0
+
+        for key, data in directories:
+            skipped += 1
+            row = existing.pop(data["path"], None)
+            if index is not None and row is not None:
+                for item in data["children_files"]:
+                    index.pop(row.pk, item["path"])
+
+            if key == device.checkpoint_key:
+                break
+
+        self.log.info("⏩ Resumed after {} directories already loaded".format(
+            skipped
+        ))
+
+        yield from directories
+
+    def _get_paths(self, files):
+        """
+        Get paths from a batch of files or a list of file payloads.
+        """
+        if isinstance(files, DumpedFileBatch):
+            return files.paths
+
+        return [item["path"] for item in files]
 
     def get_existing(self, directory, files):
         """
@@ -71,13 +265,14 @@ class DumpLoader:
         Arguments:
             directory (django_deovi.models.Directory): Directory object to assign all
                 the files.
-            files (list): List of dictionnaries for directory children files.
+            files (list or django_deovi.dump.DumpedFileBatch): List of dictionnaries
+                or batch for directory children files.
 
         Returns:
             dict: A dictionnary where each item key is a path and item value is the
                 related MediaFile object.
         """
-        paths = [item["path"] for item in files]
+        paths = self._get_paths(files)
 
         existing = MediaFile.objects.filter(
             directory=directory,
@@ -89,61 +284,110 @@ class DumpLoader:
             for item in existing
         }
 
+    def get_indexed(self, directory, files, index):
+        """
+        Retrieve and return every existing MediaFile for the given directory from
+        files index.
+
+        Found files are removed from index so at the end of a load it only contains
+        the files which were not in the dump.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Directory object to assign all
+                the files.
+            files (list or django_deovi.dump.DumpedFileBatch): List of dictionnaries
+                or batch for directory children files.
+            index (django_deovi.index.MediaFileIndex): Index of device files.
+
+        Returns:
+            dict: A dictionnary where each item key is a path and item value is a
+            MediaFile object built from index. These objects only have the indexed
+            values.
+        """
+        existing = {}
+
+        for path in self._get_paths(files):
+            row = index.pop(directory.pk, path)
+            if row is not None:
+                existing[path] = index.get_mediafile(directory.pk, path, row)
+
+        return existing
+
     def create_files(self, directory, files, batch_date):
         """
-        Create dump files in database using a bulk creation.
+        Create dump files in database using the loader writer.
 
-        NOTE: Remember that bulk discard the save() method.
+        NOTE: Remember that writers discard the save() method.
 
         Arguments:
             directory (django_deovi.models.Directory): Directory object to assign all
                 the files.
-            files (list): List of DumpedFile objects for directory children files.
+            files (django_deovi.dump.DumpedFileBatch or list): Batch or list of
+                DumpedFile objects for directory children files.
             batch_date (datetime.datetime): A datetime object to fill
                 ``MediaFile.loaded_date`` field value. It is used to ensure all the
                 files loaded from the directory have the same update date.
         """
         self.log.debug("- Proceed to bulk creation")
 
-        MediaFile.objects.bulk_create([
-            MediaFile(
-                **item.convert_to_orm_fields(),
-                loaded_date=batch_date,
-                directory=directory,
+        self.writer.create(directory, files, batch_date)
+
+    def get_file_changes(self, item):
+        """
+        Compare dumped file values to its MediaFile object.
+
+        Only the editable fields are compared. Deferred fields of MediaFile object
+        (like from an object built from files index) are assumed to be unchanged,
+        this is safe for the fields which are deduced from the path.
+
+        Arguments:
+            item (django_deovi.dump.DumpedFile): DumpedFile object which transport its
+                MediaFile object.
+
+        Returns:
+            dict: Values from dumped file which differ from MediaFile object.
+        """
+        deferred = item._mediafile.get_deferred_fields()
+
+        return {
+            name: value
+            for name, value in item.convert_to_orm_fields().items()
+            if (
+                name in self.EDITABLE_FIELDS and
+                name not in deferred and
+                getattr(item._mediafile, name) != value
             )
-            for item in files
-        ], batch_size=self.batch_limit)
+        }
 
     def edit_files(self, files, batch_date):
         """
-        Create dump files in database using a bulk edition.
+        Edit dump files in database using bulk editions.
+
+        Only the files with changes are edited and only on their changed fields. Edited
+        files are grouped on their changed fields so there is a bulk edition for each
+        group.
 
         This operation method does not care about directory since it is not an editable
         field from a dump loading.
 
         NOTE: Remember that bulk discard the save() method.
 
-        NOTE:
-            Performance could be better with a diff implementation to know the fields
-            that have really changed and to avoid to always edit all allowed fields.
-            Especially since the common updates will probably be on some few fields
-            (like size or date).
-
-            Also, any file from given batch files will be edited even if it does not
-            have any changes.
-
         Arguments:
             files (list): List of DumpedFile objects for directory children files.
                 Opposed to ``create_files``, the DumpedFile objects are expected to
                 transport a MediaFile object which have been retrieved during
                 distribution. This object will be used to proceed to bulk update.
             batch_date (datetime.datetime): A datetime object to fill
-                ``MediaFile.loaded_date`` field value. It is used to ensure all the
-                files loaded from the directory have the same update date.
+                ``MediaFile.loaded_date`` field value of edited files. It is used to
+                ensure all the files loaded from the directory have the same update
+                date.
+
+        Returns:
+            integer: Number of edited files.
         """
         self.log.debug("- Proceed to bulk edition")
 
-        bulk_items = []
+        groups = {}
 
         for item in files:
             # This may not be really useful since this requirement is correctly
@@ -154,23 +398,29 @@ class DumpLoader:
                 msg = "Entry was missing original MediaFile object: {}"
                 self.log.critical(msg.format(item.path))
 
+            changes = self.get_file_changes(item)
+            if not changes:
+                continue
+
             # Apply new values on object fields from dumped file data
-            for name, value in item.convert_to_orm_fields().items():
-                # Update all available field attributes
-                if name in self.EDITABLE_FIELDS:
-                    setattr(item._mediafile, name, value)
-                # Force the loaded date from the batch date
-                setattr(item._mediafile, "loaded_date", batch_date)
-
-                bulk_items.append(item._mediafile)
-
-        # Proceed to the bulk update
-        MediaFile.objects.bulk_update(
-            bulk_items,
-            self.EDITABLE_FIELDS + ["loaded_date"]
-        )
+            for name, value in changes.items():
+                setattr(item._mediafile, name, value)
+            # Force the loaded date from the batch date
+            item._mediafile.loaded_date = batch_date
+
+            groups.setdefault(tuple(sorted(changes)), []).append(item._mediafile)
+
+        # Proceed to a bulk update for each group of changed fields
+        for fields, bulk_items in groups.items():
+            MediaFile.objects.bulk_update(
+                bulk_items,
+                list(fields) + ["loaded_date"],
+                batch_size=self.batch_limit,
+            )
+
+        return sum([len(item) for item in groups.values()])
 
-    def file_distribution(self, directory, files):
+    def file_distribution(self, directory, files, index=None):
         """
         Distribute file entry for creation or edition depending if their path already
         exists in database or not.
@@ -178,36 +428,204 @@ class DumpLoader:
         Arguments:
             directory (django_deovi.models.Directory): Directory object to assign all
                 the files.
-            files (list): List of dictionnaries for directory children files.
+            files (list): List of dictionnaries for directory children files. They
+                are validated at once into a ``DumpedFileBatch``.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): If given, existing files are
+                searched from this index instead of database.
 
         Returns:
-            tuple: List of "to create" file items and list of "to edit" file items.
-            File item is the file payload as retrieved from dump.
+            tuple: Batch of "to create" files and list of "to edit" files. Files to
+            edit are ``DumpedFile`` objects which transport their MediaFile object.
         """
-        # Find existing file paths from db
-        existing = self.get_existing(directory, files)
+        batch = DumpedFileBatch.from_payloads(files)
+
+        # Find existing file paths from index or db
+        if index is not None:
+            existing = self.get_indexed(directory, batch, index)
+        else:
+            existing = self.get_existing(directory, batch)
         if len(existing) > 0:
             msg = "- Found {} existing MediaFile objects related to this dump"
             self.log.info(msg.format(len(existing)))
 
-        # Push non existing items to the creation list
-        to_create = [
-            DumpedFile(**item) for item in files
-            if item["path"] not in existing
-        ]
+        # Push non existing items to the creation batch
+        to_create = batch.select([
+            position for position, path in enumerate(batch.paths)
+            if path not in existing
+        ])
         if len(to_create) > 0:
             self.log.info("- Files entry to create: {}".format(len(to_create)))
 
         # Push existing items to the edition list
         to_edit = [
-            DumpedFile(**item, mediafile=existing[item["path"]]) for item in files
-            if item["path"] in existing
+            batch.view(position, mediafile=existing[path])
+            for position, path in enumerate(batch.paths)
+            if path in existing
         ]
         if len(to_edit) > 0:
             self.log.info("- Files entry to edit: {}".format(len(to_edit)))
 
         return to_create, to_edit
 
+    def write_files(self, directory, files, index=None, counters=None):
+        """
+        Write files of a directory.
+
+        Files are distributed to be created or edited, unless upsert is enabled
+        then they are all written at once without reading existing files.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Directory object to assign all
+                the files.
+            files (list): List of dictionnaries for directory children files.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files to use
+                for file distribution. With upsert, written files are only removed
+                from it.
+            counters (dict): If given, it is filled with the number of created,
+                updated or upserted files.
+        """
+        counters = {} if counters is None else counters
+        batch_date = timezone.now()
+
+        if self.upsert_writer is not None:
+            if index is not None:
+                for item in files:
+                    index.pop(directory.pk, item["path"])
+
+            with self.report.stage("upsert"):
+                written = self.upsert_writer.create(
+                    directory, DumpedFileBatch.from_payloads(files), batch_date
+                )
+            self.log.info("- Files entry upserted: {}".format(written))
+            self.add_counters(counters, files_upserted=written)
+            return
+
+        # Distribute file to bulk chains
+        with self.report.stage("distribution"):
+            to_create, to_edit = self.file_distribution(
+                directory, files, index=index
+            )
+
+        if len(to_create) > 0:
+            with self.report.stage("create"):
+                self.create_files(directory, to_create, batch_date=batch_date)
+            self.add_counters(counters, files_created=len(to_create))
+
+        if len(to_edit) > 0:
+            with self.report.stage("edit"):
+                edited = self.edit_files(to_edit, batch_date=batch_date)
+            self.add_counters(counters, files_updated=edited)
+
+    def edit_files_diff(self, result, batch_date):
+        """
+        Edit files from a diff result using bulk editions.
+
+        Like ``edit_files``, edited files are grouped on their changed fields so
+        there is a bulk edition for each group.
+
+        Arguments:
+            result (django_deovi.diff.FileDiffResult): Diff result.
+            batch_date (datetime.datetime): A datetime object to fill
+                ``MediaFile.loaded_date`` field value of edited files.
+
+        Returns:
+            integer: Number of edited files.
+        """
+        self.log.debug("- Proceed to bulk edition")
+
+        columns = list(result.changed.columns)
+        groups = result.update.groupby([result.changed[name] for name in columns])
+
+        for flags, rows in groups:
+            fields = [name for name, flag in zip(columns, flags) if flag]
+
+            MediaFile.objects.bulk_update(
+                [
+                    MediaFile(
+                        pk=values[0],
+                        loaded_date=batch_date,
+                        **dict(zip(fields, values[1:]))
+                    )
+                    for values in rows[["pk"] + fields].itertuples(
+                        index=False, name=None
+                    )
+                ],
+                fields + ["loaded_date"],
+                batch_size=self.batch_limit,
+            )
+
+        return len(result.update)
+
+    def write_files_diff(self, directories, index=None, counters=None):
+        """
+        Write files of many directories at once from a diff.
+
+        Dumped files are compared to existing ones with the loader diff engine,
+        then files to create are written with the loader writer for each
+        directory and files to edit are written with bulk editions.
+
+        Arguments:
+            directories (list): List of tuples with a Directory object and the list
+                of dictionnaries for its children files.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files to
+                compare to instead of database. Compared directories are removed
+                from index, then the files which are not in the dump are added back
+                so they can still be pruned.
+            counters (dict): If given, it is filled with the number of created and
+                updated files.
+        """
+        counters = {} if counters is None else counters
+        batch_date = timezone.now()
+        objects = {directory.pk: directory for directory, files in directories}
+
+        with self.report.stage("distribution"):
+            batches = {
+                directory.pk: DumpedFileBatch.from_payloads(files)
+                for directory, files in directories
+            }
+            result = self.diff.compare(
+                self.diff.get_dumped_frame(batches),
+                self.diff.get_existing_frame(list(batches), index=index),
+            )
+
+        self.log.info(
+            "- Files entry compared: {} to create, {} to edit, {} unchanged".format(
+                len(result.create), len(result.update), len(result.unchanged)
+            )
+        )
+
+        if index is not None:
+            for row in result.delete.itertuples(index=False):
+                index.add(
+                    row.directory_id,
+                    row.path,
+                    row.pk,
+                    row.filesize_existing,
+                    row.stored_date_existing,
+                )
+
+        if len(result.create) > 0:
+            positions = result.create.groupby("directory_id")["position"]
+            with self.report.stage("create"):
+                for directory_id, values in positions:
+                    self.create_files(
+                        objects[directory_id],
+                        batches[directory_id].select(list(values)),
+                        batch_date=batch_date,
+                    )
+            self.add_counters(counters, files_created=len(result.create))
+
+        if len(result.update) > 0:
+            with self.report.stage("edit"):
+                edited = self.edit_files_diff(result, batch_date=batch_date)
+            self.add_counters(counters, files_updated=edited)
+
     def _is_directory_elligible(self, from_checksum, to_checksum, created):
         """
         Check if directory is elligible to write operation depending its checksum
@@ -234,42 +652,630 @@ class DumpLoader:
 
         return from_checksum != to_checksum
 
+    def get_cover_path(self, path, basepath=None):
+        """
+        Resolve a cover file path.
+
+        Arguments:
+            path (string or pathlib.Path): Path to the file. Path string will be
+                converted to Path object.
+            basepath (pathlib.Path): Base directory path used to resolve relative path.
+
+        Returns:
+            pathlib.Path: Resolved path or ``None`` if path is empty.
+        """
+        if not path:
+            return None
+
+        # Convert to Path object if needed
+        if isinstance(path, str):
+            path = Path(path)
+
+        # Prefix relative path with basepath if given
+        if not path.is_absolute() and basepath:
+            return basepath / path
+
+        return path
+
     def get_attached_file(self, path, basepath=None):
         """
         Try to get file from given path and return a Django File object ready
         to save in model.
 
+        File is not opened yet, it has to be opened when read so a lot of covers can
+        be attached without holding as many file descriptors.
+
         Arguments:
             path (string or pathlib.Path): Path to the file to get. Path string will
                 be converted to Path object.
             basepath (pathlib.Path): Base directory path used to resolve relative path.
 
         Returns:
-            django.core.files.File: Django file object filled with file from resolved
-            path.
+            django.core.files.File: Closed Django file object for the resolved path.
         """
-        if path:
-            # Convert to Path object if needed
-            if isinstance(path, str):
-                path = Path(path)
-
-            # Prefix relative path with basepath if given
-            filepath = path
-            if not path.is_absolute() and basepath:
-                filepath = basepath / path
+        filepath = self.get_cover_path(path, basepath=basepath)
 
+        if filepath:
             if not filepath.exists():
                 self.log.warning("📄 Unable to find file: {}".format(path))
             else:
-                # Build a Django File ready to save
-                return File(filepath.open("rb"), name=filepath)
+                # Build a Django File ready to save, opened only once stored
+                return File(None, name=filepath)
 
         return None
 
-    def process_directory(self, device, directories, covers_basepath):
+    def preload_directories(self, device):
+        """
+        Fetch every existing Directory of a device in a single query.
+
+        Only path, checksum and cover of directories are fetched, this is enough to
+        skip the unchanged ones without any other query.
+
+        Arguments:
+            device (django_deovi.models.Device): Device to get directories from.
+
+        Returns:
+            dict: A dictionnary where each item key is a directory path and item value
+            is an ``django_deovi.index.IndexedDirectory``.
+        """
+        return index_directories(device)
+
+    def iter_chunks(self, directories):
+        """
+        Group dumped directories into lists of ``chunk_limit`` items at most.
+
+        Arguments:
+            directories (iterator): Iterator of tuples ``(key, payload)`` for each
+                dumped directory.
+
+        Yields:
+            list: A chunk of directory tuples.
+        """
+        directories = iter(directories)
+
+        while True:
+            chunk = list(islice(directories, self.chunk_limit))
+            if not chunk:
+                return
+
+            yield chunk
+
+    def fill_directory(self, directory, data, covers_basepath):
+        """
+        Set Directory object attributes from dumped directory data.
+
+        Object is not saved, this is left to the bulk operations.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Directory object to fill.
+            data (dict): Dumped directory data.
+            covers_basepath (pathlib.Path): Base directory path used to resolve cover
+                relative path.
+        """
+        directory.title = data.get("title", "")
+        directory.checksum = data.get("checksum", "")
+
+        if self.defer_covers:
+            # Current cover is kept until the pending one has been ingested
+            pending = self.get_cover_path(data.get("cover"), basepath=covers_basepath)
+            directory.pending_cover = str(pending.resolve()) if pending else ""
+            if not pending:
+                directory.cover = None
+        else:
+            directory.pending_cover = ""
+            directory.cover = self.get_attached_file(
+                data.get("cover"),
+                basepath=covers_basepath,
+            )
+        # TODO: Payload should not include everything, only what has not been
+        # filled in model fields
+        directory.payload = json.dumps(data)
+        directory.last_update = timezone.now()
+
+    def _commit_covers(self, directories):
+        """
+        Store pending cover files of given directories.
+
+        This has to be done manually since bulk operations do not care about files.
+        Covers are stored under a name computed from their content so a cover which
+        is already stored (from any directory) is not copied again. Each cover file
+        is opened only while it is stored.
+
+        Arguments:
+            directories (list): List of Directory objects.
+
+        Returns:
+            integer: Number of cover files copied to storage.
+        """
+        storage = Directory._meta.get_field("cover").storage
+        copied = 0
+
+        for directory in directories:
+            cover = directory.cover
+            if cover and not cover._committed:
+                with cover.file.open("rb") as source:
+                    directory.cover, stored = store_cover(
+                        storage, source, lock=self._covers_lock
+                    )
+                copied += stored
+
+        return copied
+
+    def write_directories(self, device, to_create, to_update):
+        """
+        Write new and changed directories with bulk operations.
+
+        NOTE: Remember that bulk discard the save() method and signals, so replaced
+        cover files are queued here to be purged with ``purge_deferred_covers``.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object of directories.
+            to_create (list): List of new Directory objects to create. Their cover
+                files are expected to be already stored.
+            to_update (list): List of tuples for existing Directory objects to update,
+                each one with the object and its previous cover file name. Their cover
+                files are expected to be already stored.
+        """
+        if to_create:
+            with self.report.stage("create"):
+                Directory.objects.bulk_create(to_create, batch_size=self.batch_limit)
+
+                # Database backend may not be able to return the primary keys
+                missing = [item.path for item in to_create if item.pk is None]
+                if missing:
+                    pks = dict(
+                        Directory.objects.filter(
+                            device=device,
+                            path__in=missing,
+                        ).values_list("path", "pk")
+                    )
+                    for item in to_create:
+                        if item.pk is None:
+                            item.pk = pks[item.path]
+
+        if to_update:
+            with self.report.stage("edit"):
+                Directory.objects.bulk_update(
+                    [directory for directory, previous_cover in to_update],
+                    [
+                        "title", "checksum", "cover", "pending_cover", "payload",
+                        "last_update",
+                    ],
+                    batch_size=self.batch_limit,
+                )
+
+            replaced = [
+                previous_cover
+                for directory, previous_cover in to_update
+                if previous_cover and previous_cover != directory.cover.name
+            ]
+            self.defer_purge(replaced)
+
+    def prepare_chunk(self, device, chunk, covers_basepath, existing, index=None,
+                      counters=None):
+        """
+        Prepare a chunk of directory entries from a dump without any database
+        operation.
+
+        New and elligible directories are filled from their dumped data and their
+        cover files are stored.
+
+        Directories with an unchanged checksum are not elligible, their primary key
+        is added to ``skipped_directories``.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to assign all the files.
+            chunk (list): List of tuples ``(key, payload)`` for dumped directories.
+            covers_basepath (pathlib.Path): Base directory path used to resolve
+                cover relative path.
+            existing (dict): The map of existing directories from
+                ``preload_directories``. Processed directories are removed from it.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files to use
+                for file distribution. Files from directories which are not elligible
+                are removed from it.
+            counters (dict): If given, it is filled with the number of created,
+                updated and skipped directories and copied covers, with the counter
+                names from ``django_deovi.report.COUNTERS``.
+
+        Returns:
+            tuple: List of entries for every chunk directory, list of Directory objects
+            to create and list of Directory objects to update. Each entry is a tuple
+            with the Directory object (or ``None`` if not elligible), its creation
+            state and dumped data.
+        """
+        entries = []
+        to_create = []
+        to_update = []
+
+        for dump_dir_name, dump_dir_data in chunk:
+            path = dump_dir_data["path"]
+            row = existing.pop(path, None)
+            created = row is None
+
+            if created:
+                directory = Directory(device=device, path=path)
+                self.fill_directory(directory, dump_dir_data, covers_basepath)
+                to_create.append(directory)
+            elif self._is_directory_elligible(
+                row.checksum, dump_dir_data.get("checksum"), created=False
+            ):
+                directory = get_directory(device, path, row)
+                self.fill_directory(directory, dump_dir_data, covers_basepath)
+                to_update.append((directory, row.cover))
+            else:
+                # Don't process directory (and its mediafiles) if not elligible
+                if index is not None:
+                    index.discard(row.pk)
+                self.skipped_directories.append(row.pk)
+                directory = None
+
+            entries.append((directory, created, dump_dir_data))
+
+        with self.report.stage("covers"):
+            copied = self._commit_covers(
+                to_create + [directory for directory, previous_cover in to_update]
+            )
+
+        if counters is not None:
+            self.add_counters(
+                counters,
+                directories_created=len(to_create),
+                directories_updated=len(to_update),
+                directories_skipped=len(entries) - len(to_create) - len(to_update),
+                covers_copied=copied,
+            )
+
+        return entries, to_create, to_update
+
+    def write_chunk(self, device, prepared, index=None, counters=None):
+        """
+        Write a prepared chunk of directory entries.
+
+        Directories are written all together first, then their files are processed
+        directory per directory.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to assign all the files.
+            prepared (tuple): Prepared chunk as returned from ``prepare_chunk``.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files to use
+                for file distribution.
+            counters (dict): If given, it is filled with the number of created and
+                updated files, with the counter names from
+                ``django_deovi.report.COUNTERS``.
+
+        Returns:
+            list: List of tuple for each saved directory. Tuple has two elements, the
+            directory object and boolean for creation state.
+        """
+        saved = []
+        compared = []
+        counters = {} if counters is None else counters
+        entries, to_create, to_update = prepared
+
+        self.write_directories(device, to_create, to_update)
+
+        for directory, created, dump_dir_data in entries:
+            self.log.info("📂 Working on directory: {}".format(dump_dir_data["path"]))
+            if directory is None:
+                continue
+
+            if created:
+                self.log.debug("- New directory created")
+            else:
+                self.log.debug("- Got an existing directory")
+
+            # Files from the whole chunk are compared at once with a diff engine
+            if self.diff is not None and self.upsert_writer is None:
+                compared.append((directory, dump_dir_data["children_files"]))
+            else:
+                self.write_files(
+                    directory,
+                    dump_dir_data["children_files"],
+                    index=index,
+                    counters=counters,
+                )
+
+            if dump_dir_data["children_files"]:
+                saved.append((directory, created))
+
+        if compared:
+            self.write_files_diff(compared, index=index, counters=counters)
+
+        return saved
+
+    def purge_prepared_covers(self, prepared):
+        """
+        Queue the cover files stored for a prepared chunk which has not been
+        written to be purged with ``purge_deferred_covers``.
+
+        Arguments:
+            prepared (tuple): Prepared chunk as returned from ``prepare_chunk``.
+        """
+        entries, to_create, to_update = prepared
+
+        self.defer_purge(
+            [item.cover.name for item in to_create if item.cover] + [
+                directory.cover.name
+                for directory, previous_cover in to_update
+                if directory.cover and directory.cover.name != previous_cover
+            ],
+        )
+
+    def defer_purge(self, names):
+        """
+        Queue cover files to be purged with ``purge_deferred_covers``.
+
+        Arguments:
+            names (list): Storage names of cover files.
+        """
+        self._purged_covers.extend([name for name in names if name])
+
+    def purge_deferred_covers(self):
+        """
+        Purge the queued cover files once the current transaction has been
+        committed, unless they are used by any directory.
+
+        Covers are stored under a name computed from their content, so a cover
+        replaced or stored by a chunk may be reused by another chunk which is not
+        committed yet. This is why purge only happens once every chunk has been
+        written.
+        """
+        names = self._purged_covers
+        self._purged_covers = []
+
+        if names:
+            transaction.on_commit(lambda: purge_covers(Directory, names))
+
+    def add_counters(self, counters, **values):
+        """
+        Increment counters from a dictionnary.
+
+        Arguments:
+            counters (dict): Counters to increment.
+            **values: Value to add to each counter name.
+        """
+        for name, value in values.items():
+            counters[name] = counters.get(name, 0) + value
+
+    def commit_chunk(self, position, device, chunk, covers_basepath, existing,
+                     index=None):
+        """
+        Process a chunk of directory entries, writing it inside its own transaction.
+
+        If anything goes wrong, only the chunk is rolled back, the cover files stored
+        for it are queued to be purged, the error is output and chunk position is
+        added to ``failed_chunks``. Chunk counters are
+        added to the load report only once it has been committed.
+
+        Arguments:
+            position (integer): Chunk position, only used in output messages.
+            device (django_deovi.models.Device): Device object to assign all the files.
+            chunk (list): List of tuples ``(key, payload)`` for dumped directories.
+            covers_basepath (pathlib.Path): Base directory path used to resolve
+                cover relative path.
+            existing (dict): The map of existing directories from
+                ``preload_directories``.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files to use
+                for file distribution.
+
+        Returns:
+            list: List of tuple for each saved directory, see ``write_chunk``. It is
+            empty if chunk has been rolled back.
+        """
+        start = time.perf_counter()
+        prepared = None
+        committed = False
+        counters = {}
+
+        try:
+            prepared = self.prepare_chunk(
+                device, chunk, covers_basepath, existing, index, counters=counters
+            )
+
+            entries, to_create, to_update = prepared
+            # A chunk of unchanged directories has nothing to write
+            atomic = (
+                transaction.atomic() if to_create or to_update else nullcontext()
+            )
+
+            with self._write_lock, atomic:
+                saved = self.write_chunk(
+                    device, prepared, index=index, counters=counters
+                )
+            committed = True
+
+            if self.checkpoint_checksum:
+                self.record_checkpoint(device, position, chunk[-1][0])
+
+            self.report.add(**counters)
+        except Exception as e:
+            self.failed_chunks.append(position)
+
+            # A chunk which failed after its commit keeps its covers
+            if committed:
+                self.log.error(
+                    "- Chunk {} has failed after commit: {}".format(position, e)
+                )
+            else:
+                if prepared is not None:
+                    self.purge_prepared_covers(prepared)
+                self.log.error(
+                    "- Chunk {} has been rolled back: {}".format(position, e)
+                )
+
+            return []
+
+        self.log.debug("- Chunk {} committed with {} directories in {:.3f}s".format(
+            position,
+            len(chunk),
+            time.perf_counter() - start,
+        ))
+
+        return saved
+
+    def start_checkpoints(self, checksum):
+        """
+        Start recording checkpoints for the given dump.
+
+        Arguments:
+            checksum (string): Dump file checksum, if empty no checkpoint is
+                recorded.
+        """
+        self.checkpoint_checksum = checksum
+        self._checkpoint_position = 1
+        self._committed = {}
+
+    def record_checkpoint(self, device, position, key):
+        """
+        Record a committed chunk as a device checkpoint.
+
+        Chunks may be committed in any order with workers, so checkpoint only moves
+        forward to the last key of contiguous committed chunks. It never moves past
+        a rolled back chunk.
+
+        This does not use the Device save method to not trigger the
+        ``Device.last_update`` date change.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to update.
+            position (integer): Committed chunk position.
+            key (string): Registry key of the last chunk directory.
+        """
+        with self._checkpoint_lock:
+            self._committed[position] = key
+
+            last_key = None
+            while self._checkpoint_position in self._committed:
+                last_key = self._committed.pop(self._checkpoint_position)
+                self._checkpoint_position += 1
+
+            if last_key is None:
+                return
+
+            device.checkpoint_checksum = self.checkpoint_checksum
+            device.checkpoint_key = last_key
+
+            with self._write_lock:
+                Device.objects.filter(pk=device.pk).update(
+                    checkpoint_checksum=self.checkpoint_checksum,
+                    checkpoint_key=last_key,
+                )
+
+    def commit_chunks(self, device, chunks, covers_basepath, existing, index=None):
+        """
+        Commit chunks with a pool of worker threads.
+
+        Each worker has its own database connection which is closed once there is no
+        chunk left. Chunks are queued as they come, the queue is limited so there is
+        never much more chunks held in memory than there is workers.
+
+        With SQLite, chunks are prepared concurrently (this is where cover files are
+        read and stored) but written one at a time since it does not support
+        concurrent writes.
+
+        A failing chunk is handled by ``commit_chunk``. Any other error in a worker
+        does not stop it from taking the next chunks, so the queue never stays full,
+        and the first error is raised again once every worker has finished.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to assign all the files.
+            chunks (iterator): Iterator of tuples with position and chunk.
+            covers_basepath (pathlib.Path): Base directory path used to resolve
+                cover relative path.
+            existing (dict): The map of existing directories from
+                ``preload_directories``.
+
+        Keyword Arguments:
+            index (django_deovi.index.MediaFileIndex): Index of device files to use
+                for file distribution.
+
+        Returns:
+            dict: Results from ``commit_chunk`` indexed on chunk position.
+        """
+        tasks = queue.Queue(maxsize=self.workers * 2)
+        results = {}
+        errors = []
+
+        def worker():
+            try:
+                # Queries are counted per connection and so per thread
+                with self.report.count_queries():
+                    while True:
+                        task = tasks.get()
+                        if task is None:
+                            return
+
+                        position, chunk = task
+                        try:
+                            results[position] = self.commit_chunk(
+                                position, device, chunk, covers_basepath, existing,
+                                index
+                            )
+                        except Exception as e:
+                            errors.append(e)
+                            self.failed_chunks.append(position)
+                            results[position] = []
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        def put(task):
+            # Queue may stay full if every worker has stopped
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    tasks.put(task, timeout=self.QUEUE_TIMEOUT)
+                except queue.Full:
+                    continue
+                return True
+
+            return False
+
+        threads = [
+            threading.Thread(target=worker, daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        stopped = False
+        try:
+            for task in chunks:
+                if not put(task):
+                    stopped = True
+                    break
+        finally:
+            for thread in threads:
+                put(None)
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+
+        if stopped:
+            raise DjangoDeoviError("All workers have stopped before the last chunk.")
+
+        return results
+
+    def process_directory(self, device, directories, covers_basepath, existing=None,
+                          index=None):
         """
-        Process a directory entry from a dump to create Directory and process its
-        children files.
+        Process directory entries from a dump to create or update Directory objects
+        and process their children files.
+
+        Existing directories of the device are fetched at once, then dumped
+        directories are processed by chunks so new and changed directories are
+        written with a bulk operation per chunk. Each chunk is committed in its own
+        transaction, the position of rolled back chunks are stored in
+        ``failed_chunks``. Replaced cover files and the ones stored for rolled back
+        chunks are purged once every chunk has been written.
 
         .. NOTE::
             Deovi provide a checksum for the cover file itself but we don't implement
@@ -279,8 +1285,18 @@ class DumpLoader:
 
         Arguments:
             device (django_deovi.models.Device): Device object to assign all the files.
-            directories (dict): Dictionnary of dumped directories.
-            covers_basepath (pathlib.Path):
+            directories (dict or iterator): Dictionnary of dumped directories or
+                an iterator of tuples ``(key, payload)`` for each dumped directory.
+            covers_basepath (pathlib.Path): Base directory path used to resolve
+                cover relative path.
+
+        Keyword Arguments:
+            existing (dict): The map of existing directories as returned from
+                ``preload_directories``. If not given, it will be fetched. Processed
+                directories are removed from it so at the end it only contains the
+                directories which were not in the dump.
+            index (django_deovi.index.MediaFileIndex): Index of device files. If not
+                given and option ``file_index`` is enabled, it will be built.
 
         Returns:
             list: List of tuple for each saved directory. Tuple has two elements, the
@@ -288,62 +1304,198 @@ class DumpLoader:
         """
         saved = []
 
-        for dump_dir_name, dump_dir_data in directories.items():
-            batch_date = timezone.now()
+        if isinstance(directories, dict):
+            directories = directories.items()
 
-            self.log.info("📂 Working on directory: {}".format(dump_dir_data["path"]))
-            directory, created = Directory.objects.update_or_create(
-                device=device,
-                path=dump_dir_data["path"],
-            )
+        if existing is None:
+            existing = self.preload_directories(device)
 
-            # Don't process directory (and its mediafiles) if not elligible
-            if not self._is_directory_elligible(
-                directory.checksum, dump_dir_data.get("checksum"), created=None
-            ):
-                continue
+        if index is None and self.file_index:
+            index = MediaFileIndex.from_device(device)
+            self.log.debug("- Indexed {} existing MediaFile objects".format(len(index)))
 
-            # Save additional directory data
-            if created:
-                self.log.debug("- New directory created")
-                directory.title = dump_dir_data.get("title", "")
-                directory.checksum = dump_dir_data.get("checksum", "")
-                directory.cover = self.get_attached_file(
-                    dump_dir_data.get("cover"),
-                    basepath=covers_basepath,
+        self.failed_chunks = []
+        self.skipped_directories = []
+        self._purged_covers = []
+        chunks = enumerate(self.iter_chunks(directories), start=1)
+
+        try:
+            if self.workers > 1:
+                self._write_lock = (
+                    threading.Lock() if connection.vendor == "sqlite"
+                    else nullcontext()
+                )
+                results = self.commit_chunks(
+                    device, chunks, covers_basepath, existing, index
                 )
-                # TODO: Payload should not include everything, only what has not been
-                # filled in model fields
-                directory.payload = json.dumps(dump_dir_data)
-                directory.save()
             else:
-                self.log.debug("- Got an existing directory")
-                if directory.checksum != dump_dir_data.get("checksum", ""):
-                    directory.title = dump_dir_data.get("title", "")
-                    directory.checksum = dump_dir_data.get("checksum", "")
-                    directory.cover = self.get_attached_file(
-                        dump_dir_data.get("cover"),
-                        basepath=covers_basepath,
+                self._write_lock = nullcontext()
+                results = {
+                    position: self.commit_chunk(
+                        position, device, chunk, covers_basepath, existing, index
                     )
-                    directory.payload = json.dumps(dump_dir_data)
-                    directory.save()
-
-            # Distribute file to bulk chains
-            to_create, to_edit = self.file_distribution(
-                directory, dump_dir_data["children_files"]
-            )
+                    for position, chunk in chunks
+                }
+        finally:
+            self.purge_deferred_covers()
 
-            if len(to_create) > 0:
-                self.create_files(directory, to_create, batch_date=batch_date)
+        for position in sorted(results):
+            saved.extend(results[position])
 
-            if len(to_edit) > 0:
-                self.edit_files(to_edit, batch_date=batch_date)
+        msg = "💾 {} chunks committed".format(
+            len(results) - len(self.failed_chunks)
+        )
+        if self.failed_chunks:
+            msg += ", {} rolled back".format(len(self.failed_chunks))
+        self.log.info(msg)
 
-            if len(to_create) > 0 or len(to_edit) > 0:
-                saved.append((directory, created))
+        if self.skipped_directories:
+            self.log.info("⏩ {} unchanged directories skipped".format(
+                len(self.skipped_directories)
+            ))
 
         return saved
 
+    def prune(self, directories, index):
+        """
+        Delete directories and files which were not in the dump.
+
+        Deletions are performed by batches with the bulk deletion from querysets, so
+        there is no deletion signals but cover files are still removed.
+
+        Arguments:
+            directories (dict): Remaining map of existing directories after
+                processing, these are the directories to delete with their files.
+            index (django_deovi.index.MediaFileIndex): Remaining files index after
+                processing, these are the files to delete.
+
+        Returns:
+            dict: Pruning report with the deleted directory paths in item
+            ``directories`` and the number of deleted files in item ``files``.
+        """
+        with self.report.stage("prune"):
+            pruned = self._prune(directories, index)
+
+        self.report.add(
+            directories_deleted=len(pruned["directories"]),
+            files_deleted=pruned["files"],
+        )
+
+        return pruned
+
+    def _prune(self, directories, index):
+        """
+        Perform deletions for ``prune`` which times them and counts them in report.
+        """
+        batch_size = self.batch_limit or self.DELETE_BATCH
+
+        directory_pks = set()
+        for path, directory in sorted(directories.items()):
+            self.log.debug("- Prune directory: {}".format(path))
+            directory_pks.add(directory.pk)
+
+        # Files from pruned directories will be removed with them
+        file_pks = []
+        for directory_id, files in index.directories.items():
+            if directory_id in directory_pks:
+                continue
+
+            for path, row in sorted(files.items()):
+                self.log.debug("- Prune file: {}".format(path))
+                file_pks.append(row.pk)
+
+        for start in range(0, len(file_pks), batch_size):
+            MediaFile.objects.filter(
+                pk__in=file_pks[start:start + batch_size]
+            ).bulk_delete(batch_size=batch_size)
+
+        directory_pks = sorted(directory_pks)
+        for start in range(0, len(directory_pks), batch_size):
+            Directory.objects.filter(
+                pk__in=directory_pks[start:start + batch_size]
+            ).bulk_delete(batch_size=batch_size)
+
+        if directory_pks or file_pks:
+            self.log.info("🧹 Pruned {} directories and {} files".format(
+                len(directory_pks),
+                len(file_pks),
+            ))
+
+        return {
+            "directories": sorted(directories.keys()),
+            "files": len(file_pks),
+        }
+
+    def get_dump_fingerprint(self, device, path, force=False, store_mtime=True):
+        """
+        Compute the fingerprint of a dump file unless it has not changed since the
+        last device load.
+
+        Fingerprint size is checked first since a different size means a different
+        content. Then if size and modification date are the same than the stored
+        ones, the dump is assumed to be unchanged without hashing it. Finally the
+        dump content is hashed to be compared to the stored checksum.
+
+        If only the modification date has changed, the new one is stored without
+        touching the device last update date.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object.
+            path (pathlib.Path): Dump file path.
+
+        Keyword Arguments:
+            force (boolean): If enabled, the fingerprint is always returned even if
+                the dump has not changed.
+            store_mtime (boolean): If disabled, a changed modification date is not
+                stored.
+
+        Returns:
+            django_deovi.utils.fingerprint.DumpFingerprint: Dump fingerprint if dump
+            has changed or if forced, else ``None``.
+        """
+        size, mtime = file_stat(path)
+        known = bool(device.dump_checksum) and device.dump_size == size
+
+        if known and not force and device.dump_mtime == mtime:
+            return None
+
+        checksum = hash_file(path)
+
+        if known and not force and device.dump_checksum == checksum:
+            if store_mtime:
+                device.dump_mtime = mtime
+                Device.objects.filter(pk=device.pk).update(dump_mtime=mtime)
+            return None
+
+        return DumpFingerprint(checksum, size, mtime)
+
+    def set_dump_fingerprint(self, device, fingerprint):
+        """
+        Store dump fingerprint on device and clear its checkpoint since the load is
+        finished.
+
+        This does not use the Device save method to not trigger the
+        ``Device.last_update`` date change.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to update.
+            fingerprint (django_deovi.utils.fingerprint.DumpFingerprint): Dump
+                fingerprint to store.
+        """
+        device.dump_checksum = fingerprint.checksum
+        device.dump_size = fingerprint.size
+        device.dump_mtime = fingerprint.mtime
+        device.checkpoint_checksum = ""
+        device.checkpoint_key = ""
+
+        Device.objects.filter(pk=device.pk).update(
+            dump_checksum=fingerprint.checksum,
+            dump_size=fingerprint.size,
+            dump_mtime=fingerprint.mtime,
+            checkpoint_checksum="",
+            checkpoint_key="",
+        )
+
     def set_device_stats(self, device, stats):
         """
         Set device disk usage values.
@@ -377,7 +1529,135 @@ class DumpLoader:
 
         return changed
 
-    def load(self, device_slug, dump, covers_basepath=None):
+    def plan_directory(self, plan, data, covers_basepath, existing, index):
+        """
+        Count what loading a dumped directory would do, without writing anything.
+
+        Arguments:
+            plan (django_deovi.plan.LoadPlan): Plan to fill.
+            data (dict): Dumped directory data.
+            covers_basepath (pathlib.Path): Base directory path used to resolve cover
+                relative path.
+            existing (dict): The map of existing directories from
+                ``preload_directories``. Planned directories are removed from it.
+            index (django_deovi.index.MediaFileIndex): Index of device files. Planned
+                files are removed from it.
+        """
+        row = existing.pop(data["path"], None)
+
+        if row is not None and not self._is_directory_elligible(
+            row.checksum, data.get("checksum"), created=False
+        ):
+            index.discard(row.pk)
+            plan.directories["skipped"] += 1
+            return
+
+        try:
+            files = DumpedFileBatch.from_payloads(data["children_files"])
+        except DjangoDeoviError:
+            plan.directories["invalid"] += 1
+            return
+
+        plan.directories["created" if row is None else "updated"] += 1
+        plan.payload_size += len(json.dumps(data))
+
+        if not self.defer_covers:
+            cover = self.get_cover_path(data.get("cover"), basepath=covers_basepath)
+            if cover and cover.exists():
+                plan.covers["copied"] += 1
+                plan.cover_size += cover.stat().st_size
+            elif cover:
+                plan.covers["missing"] += 1
+
+        for position, path in enumerate(files.paths):
+            indexed = index.pop(row.pk, path) if row is not None else None
+
+            if indexed is None:
+                plan.files["created"] += 1
+                continue
+
+            item = files.view(
+                position, mediafile=index.get_mediafile(row.pk, path, indexed)
+            )
+            if self.get_file_changes(item):
+                plan.files["updated"] += 1
+            else:
+                plan.files["unchanged"] += 1
+
+    def plan(self, device_slug, dump, covers_basepath=None, sync=False, force=False):
+        """
+        Plan what a load would do without writing anything to database or storage.
+
+        This performs the same distribution than a load but only with read queries,
+        existing directories and files are fetched at once.
+
+        Arguments:
+            device_slug (string): Slug name for the Device object.
+            dump (pathlib.Path or dict): The path object for the dump file to plan or
+                directly the dump dictionnary.
+
+        Keyword Arguments:
+            covers_basepath (pathlib.Path): A path object to use to resolve cover
+                filepath. If empty, the current working directory is used.
+            sync (boolean): Plan the pruning of directories and files which are not
+                in the dump.
+            force (boolean): Plan the load even if the dump has not changed since the
+                last load.
+
+        Returns:
+            django_deovi.plan.LoadPlan: The load plan.
+        """
+        try:
+            validate_slug(device_slug)
+        except ValidationError as e:
+            self.log.critical("Invalid device slug: {}".format("; ".join(e)))
+
+        plan = LoadPlan(device_slug)
+        covers_basepath = covers_basepath or Path.cwd()
+
+        device = Device.objects.filter(slug=device_slug).first()
+        existing = {}
+        index = MediaFileIndex()
+
+        if device is None:
+            plan.new_device = True
+        else:
+            if not isinstance(dump, dict) and self.get_dump_fingerprint(
+                device, dump, force=force, store_mtime=False
+            ) is None:
+                plan.unchanged_dump = True
+                return plan
+
+            existing = self.preload_directories(device)
+            index = MediaFileIndex.from_device(device)
+
+        sections = set()
+        for section, key, value in self.iter_dump(dump):
+            sections.add(section)
+
+            if section == "registry" and key is not None:
+                if "device" not in sections:
+                    self.invalid_structure()
+
+                self.plan_directory(plan, value, covers_basepath, existing, index)
+
+        if not {"device", "registry"}.issubset(sections):
+            self.invalid_structure()
+
+        # Like with a load, pruning does not happen if any chunk would fail
+        if sync and not plan.directories["invalid"]:
+            pruned = set([row.pk for row in existing.values()])
+            plan.directories["pruned"] = len(pruned)
+            plan.files["pruned"] = sum([
+                len(files)
+                for directory_id, files in index.directories.items()
+                if directory_id not in pruned
+            ])
+
+        return plan
+
+    def load(self, device_slug, dump, covers_basepath=None, sync=False,
+             force=False, resume=False):
         """
         Load a Deovi dump to create and update MediaFile objects for the dump directory
         and files.
@@ -385,12 +1665,53 @@ class DumpLoader:
         Arguments:
             device_slug (string): Slug name for the Device object to attach all the
                 directories and files.
-            dump (pathlib.Path): The path object for the dump file to load.
+            dump (pathlib.Path or dict): The path object for the dump file to load or
+                directly the dump dictionnary. A dump file is streamed so only a
+                directory at once is held in memory.
 
         Keyword Arguments:
             covers_basepath (pathlib.Path): A path object to use to resolve cover
                 filepath. If empty, the current working directory is used. Finally
                 every cover files paths are resolved from this base dir.
+            sync (boolean): If enabled, the device directories and files which are
+                not in the dump are deleted once the dump has been loaded. This
+                implies the files index. Pruning is skipped if any chunk has been
+                rolled back. Default to False.
+            force (boolean): If enabled, a dump file is loaded even if it has not
+                changed since the last device load. Default to False.
+            resume (boolean): If enabled and the device has a checkpoint from an
+                unfinished load of the same dump file, the load continues after the
+                checkpoint key instead of processing every directories. A
+                checkpoint is recorded after each committed chunk of a dump file.
+                Default to False.
+
+        A delta document is applied with ``load_delta`` instead, options ``sync``,
+        ``force`` and ``resume`` have no effect on it.
+
+        Returns:
+            django_deovi.report.LoadReport: Report of load counters, stage timings
+            and number of queries. Its ``pruned`` attribute holds the pruning report
+            from ``prune`` if sync is enabled and has been performed.
+        """
+        if is_delta(dump):
+            return self.load_delta(
+                device_slug, dump, covers_basepath=covers_basepath
+            )
+
+        self.report = LoadReport(device_slug)
+
+        with self.report.total(), self.report.count_queries():
+            self._load(
+                device_slug, dump, covers_basepath=covers_basepath, sync=sync,
+                force=force, resume=resume,
+            )
+
+        return self.report
+
+    def _load(self, device_slug, dump, covers_basepath=None, sync=False,
+              force=False, resume=False):
+        """
+        Perform the load for ``load`` which times it and counts its queries.
         """
         self.log.info("🏷️Using device slug: {}".format(device_slug))
 
@@ -412,21 +1733,245 @@ class DumpLoader:
             msg = "- Got an existing device for given slug"
         self.log.debug(msg)
 
+        # Dump file is fingerprinted to avoid loading it again if it has not changed
+        fingerprint = None
+        if not isinstance(dump, dict):
+            fingerprint = self.get_dump_fingerprint(device, dump, force=force)
+            if fingerprint is None:
+                self.log.info("⏭️ Dump has not changed since the last load")
+                self.report.unchanged_dump = True
+                return
+
         covers_basepath = covers_basepath or Path.cwd()
         self.log.info("🏷️Using cover basepath: {}".format(covers_basepath))
 
-        dump_payload = self.open_dump(dump)
+        existing = self.preload_directories(device)
+        index = None
+        if sync:
+            index = MediaFileIndex.from_device(device)
+
+        directories = self.iter_registry(
+            device, self.report.iterate("parse", self.iter_dump(dump))
+        )
+
+        # Checkpoints are only recorded for a dump file since they need its checksum
+        self.start_checkpoints(fingerprint.checksum if fingerprint else None)
+        if resume and device.checkpoint_key:
+            if fingerprint and device.checkpoint_checksum == fingerprint.checksum:
+                directories = self.resume_registry(
+                    device, directories, existing, index=index
+                )
+            else:
+                self.log.warning(
+                    "Checkpoint does not belong to this dump, loading from start"
+                )
+
+        # Go collecting into device directories as they are read from dump
+        try:
+            self.process_directory(
+                device,
+                directories,
+                covers_basepath,
+                existing=existing,
+                index=index,
+            )
+        finally:
+            self.start_checkpoints(None)
+
+        if not {"device", "registry"}.issubset(self._sections):
+            self.invalid_structure()
+
+        self.report.failed_chunks = list(self.failed_chunks)
+
+        if sync:
+            if self.failed_chunks:
+                self.log.warning(
+                    "Pruning has been skipped since some chunks have been rolled back"
+                )
+            else:
+                self.report.pruned = self.prune(existing, index)
+
+        # Dump is not fingerprinted when some chunks failed so it will be loaded again
+        if fingerprint and not self.failed_chunks:
+            self.set_dump_fingerprint(device, fingerprint)
+
+    def write_delta_files(self, device, files, counters):
+        """
+        Create or update files from a delta document.
+
+        Only the directories of the given files and the files themselves are
+        fetched from database.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object of the files.
+            files (list): List of file payloads.
+            counters (dict): Counters to fill with the number of created and updated
+                files.
+        """
+        grouped = {}
+        for item in files:
+            grouped.setdefault(item["absolute_dir"], []).append(item)
+
+        directories = {
+            directory.path: directory
+            for directory in Directory.objects.filter(
+                device=device, path__in=list(grouped)
+            ).only("id", "device_id", "path")
+        }
+
+        missing = sorted(set(grouped) - set(directories))
+        if missing:
+            raise DjangoDeoviError(
+                "Delta files are related to unknown directories: {}".format(
+                    ", ".join(missing)
+                )
+            )
+
+        for path, items in grouped.items():
+            self.write_files(directories[path], items, counters=counters)
+
+    def apply_delta(self, device, delta, covers_basepath):
+        """
+        Apply a delta document changes on a device in a single transaction.
+
+        Removals are performed first, then added and changed directories are
+        written like a dump chunk and finally added and changed files.
+
+        Arguments:
+            device (django_deovi.models.Device): Device object to apply changes on.
+            delta (dict): Validated delta document.
+            covers_basepath (pathlib.Path): Base directory path used to resolve
+                cover relative path.
+        """
+        directories = delta["directories"]
+        files = delta["files"]
+        batch_size = self.batch_limit or self.DELETE_BATCH
+        counters = {}
+
+        entries = [
+            (key, dict(data, children_files=data.get("children_files") or []))
+            for key, data in list(directories["added"].items()) +
+            list(directories["changed"].items())
+        ]
+        existing = index_directories(
+            device, paths=[data["path"] for key, data in entries]
+        )
+
+        prepared = self.prepare_chunk(
+            device, entries, covers_basepath, existing, counters=counters
+        )
+
         try:
-            device_stats = dump_payload["device"]
-            registry = dump_payload["registry"]
-        except KeyError:
-            self.log.critical(
-                "The JSON dump structure does not fit to Deovi>=0.7.0, it must "
-                "have a 'device' and 'registry'."
+            with transaction.atomic():
+                with self.report.stage("prune"):
+                    # Removed paths are filtered by batches like in ``prune``
+                    removed = files["removed"]
+                    for start in range(0, len(removed), batch_size):
+                        self.add_counters(
+                            counters,
+                            files_deleted=MediaFile.objects.filter(
+                                directory__device=device,
+                                path__in=removed[start:start + batch_size],
+                            ).bulk_delete(batch_size=batch_size)["mediafiles"],
+                        )
+
+                    removed = directories["removed"]
+                    for start in range(0, len(removed), batch_size):
+                        self.add_counters(
+                            counters,
+                            directories_deleted=Directory.objects.filter(
+                                device=device,
+                                path__in=removed[start:start + batch_size],
+                            ).bulk_delete(batch_size=batch_size)["directories"],
+                        )
+
+                self.write_chunk(device, prepared, counters=counters)
+                self.write_delta_files(
+                    device, files["added"] + files["changed"], counters
+                )
+        except Exception:
+            self.purge_prepared_covers(prepared)
+            raise
+        finally:
+            self.purge_deferred_covers()
+
+        self.report.add(**counters)
+
+    def load_delta(self, device_slug, dump, covers_basepath=None):
+        """
+        Load a delta document to apply its changes on a device.
+
+        Contrary to a full dump, the device directories and files are not compared,
+        only the ones from the delta are fetched and written. Once applied, the
+        delta checksum is stored as the device dump fingerprint so the next delta or
+        dump can be compared to it.
+
+        Arguments:
+            device_slug (string): Slug name of the existing Device object to apply
+                changes on.
+            dump (pathlib.Path or dict): The path object for the delta document file
+                or directly the delta dictionnary. See ``django_deovi.delta`` for
+                the document structure.
+
+        Keyword Arguments:
+            covers_basepath (pathlib.Path): A path object to use to resolve cover
+                filepath. If empty, the current working directory is used.
+
+        Returns:
+            django_deovi.report.LoadReport: Report of load counters, stage timings
+            and number of queries.
+        """
+        self.report = LoadReport(device_slug)
+
+        with self.report.total(), self.report.count_queries():
+            with self.report.stage("parse"):
+                delta = validate_delta(self.open_dump(dump))
+
+            self.log.info("🏷️Using device slug: {}".format(device_slug))
+
+            try:
+                device = Device.objects.get(slug=device_slug)
+            except Device.DoesNotExist:
+                raise DjangoDeoviError(
+                    "A delta can only be applied on an existing device: {}".format(
+                        device_slug
+                    )
+                )
+
+            if device.dump_checksum == delta["delta"]["checksum"]:
+                self.log.info("⏭️ Delta has already been applied")
+                self.report.unchanged_dump = True
+                return self.report
+
+            if device.dump_checksum != delta["delta"]["base"]:
+                raise DjangoDeoviError(
+                    "Delta base does not match the last loaded dump of device: "
+                    "{}".format(device_slug)
+                )
+
+            if delta["device"]:
+                self.set_device_stats(device, delta["device"])
+
+            covers_basepath = covers_basepath or Path.cwd()
+            self.apply_delta(device, delta, covers_basepath)
+
+            self.set_dump_fingerprint(
+                device,
+                DumpFingerprint(
+                    delta["delta"]["checksum"], delta["delta"]["size"], None
+                ),
             )
 
-        # Update device with disk usage
-        self.set_device_stats(device, device_stats)
+            self.log.info(
+                "🧩 Delta applied: {} directories and {} files written, {} "
+                "directories and {} files removed".format(
+                    self.report.counters["directories_created"] +
+                    self.report.counters["directories_updated"],
+                    self.report.counters["files_created"] +
+                    self.report.counters["files_updated"],
+                    self.report.counters["directories_deleted"],
+                    self.report.counters["files_deleted"],
+                )
+            )
 
-        # Go collecting into device directories
-        self.process_directory(device, registry, covers_basepath)
+        return self.report
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...converter import get_converter
+from ...exceptions import DjangoDeoviError
+from ...reader import DUMP_FORMATS, get_dump_format
+
+
+class Command(BaseCommand):
+    """
+    Deovi dump converter
+    """
+    help = (
+        "Convert a Deovi dump to another format. Binary formats 'msgpack' and 'cbor' "
+        "are faster to load and smaller than JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source",
+            type=Path,
+            help="Path to the Deovi dump to convert, it may be compressed.",
+        )
+        parser.add_argument(
+            "destination",
+            type=Path,
+            help="Path to the file to write.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=DUMP_FORMATS,
+            default="msgpack",
+            help="Format to convert to. Default to 'msgpack'.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["source"].exists():
+            msg = "Given dump path does not exists: {}".format(
+                str(options["source"])
+            )
+            raise CommandError(msg)
+
+        if options["source"].resolve() == options["destination"].resolve():
+            raise CommandError("Destination can not be the source dump.")
+
+        self.stdout.write("Converting dump from '{}' to '{}'".format(
+            get_dump_format(options["source"]),
+            options["format"],
+        ))
+
+        try:
+            converted = get_converter(options["format"]).convert(
+                options["source"], options["destination"]
+            )
+        except DjangoDeoviError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Converted {} directories to: {}".format(
+                converted, options["destination"]
+            )
+        ))
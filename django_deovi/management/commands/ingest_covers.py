@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...ingest import CoverIngester
+from ...models import Device, Directory
+from ...outputs import DjangoCommandOutput
+
+
+class Command(BaseCommand):
+    """
+    Pending covers ingestion
+    """
+    help = (
+        "Copy the pending cover files recorded by 'load_medias' with argument "
+        "'--defer-covers' and attach them to their directories."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--device",
+            action="append",
+            default=[],
+            help=(
+                "Device slug to ingest covers from. Can be given many times. Default "
+                "to every devices."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help=(
+                "Number of threads to copy cover files concurrently. Default to "
+                "{}.".format(CoverIngester.WORKERS)
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help=(
+                "Number of directories to update at once. Default to "
+                "{}.".format(CoverIngester.BATCH_SIZE)
+            ),
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS("=== Starting covers ingestion ===")
+        )
+
+        queryset = Directory.objects.all()
+
+        if options["device"]:
+            devices = Device.objects.filter(slug__in=options["device"])
+            unknown = set(options["device"]) - set(
+                devices.values_list("slug", flat=True)
+            )
+            if unknown:
+                msg = "Unknown device slug(s): {}".format(", ".join(sorted(unknown)))
+                raise CommandError(msg)
+
+            queryset = queryset.filter(device__in=devices)
+
+        ingester = CoverIngester(
+            output_interface=DjangoCommandOutput(command=self),
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+        )
+        ingester.ingest(queryset)
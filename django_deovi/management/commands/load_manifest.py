@@ -0,0 +1,115 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import CommandError
+
+from ...batch import load_manifest, read_manifest
+from ...exceptions import DjangoDeoviError
+from .load_medias import Command as LoadMediasCommand
+
+
+class Command(LoadMediasCommand):
+    """
+    Deovi batch dump loader
+    """
+    help = (
+        "Load many Deovi device dumps listed in a manifest into database. Each "
+        "dump is loaded in its own process and a failure on a device does not stop "
+        "the other ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "manifest",
+            type=Path,
+            default=None,
+            help=(
+                "Path to a JSON manifest which list entries of device slug, dump "
+                "path and optional covers basepath."
+            ),
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help=(
+                "Number of processes to load dumps concurrently. Default to the "
+                "number of processors. A single process loads dumps one after "
+                "another."
+            ),
+        )
+        self.add_loader_arguments(parser)
+
+    def write_summary(self, results, elapsed):
+        """
+        Output the combined summary of all loads.
+
+        Returns:
+            list: Failed results.
+        """
+        self.stdout.write(
+            self.style.SUCCESS("=== Summary ===")
+        )
+
+        failures = []
+
+        for result in results:
+            if result.error:
+                failures.append(result)
+                self.stdout.write(self.style.ERROR(
+                    "✖ {} failed after {:.3f}s: {}".format(
+                        result.entry.device, result.elapsed, result.error
+                    )
+                ))
+                continue
+
+            msg = "✔ {} loaded in {:.3f}s".format(
+                result.entry.device, result.elapsed
+            )
+            pruned = result.report["pruned"]
+            if pruned:
+                msg += " (pruned {} directories and {} files)".format(
+                    len(pruned["directories"]), pruned["files"]
+                )
+            self.stdout.write(self.style.SUCCESS(msg))
+
+        self.stdout.write(
+            "Loaded {} of {} devices in {:.3f}s".format(
+                len(results) - len(failures), len(results), elapsed
+            )
+        )
+
+        return failures
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.SUCCESS("=== Starting loading manifest ===")
+        )
+
+        if not options["manifest"].exists():
+            msg = "Given manifest path does not exists: {}".format(
+                str(options["manifest"])
+            )
+            raise CommandError(msg)
+
+        try:
+            entries = read_manifest(options["manifest"])
+        except DjangoDeoviError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+        results = load_manifest(
+            entries,
+            processes=options["processes"],
+            options=self.get_loader_options(options),
+        )
+
+        failures = self.write_summary(results, time.perf_counter() - start)
+
+        if failures:
+            raise CommandError(
+                "Failed to load {} device(s): {}".format(
+                    len(failures),
+                    ", ".join([item.entry.device for item in failures]),
+                )
+            )
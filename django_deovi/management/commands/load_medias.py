@@ -2,7 +2,10 @@ from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
 
+from ...batch import failed_chunks_message
+from ...delta import is_delta
 from ...loader import DumpLoader
+from ...writers import WRITERS
 from ...outputs import DjangoCommandOutput
 
 
@@ -33,19 +36,191 @@ class Command(BaseCommand):
             default=None,
             help="Path to the Deovi collection dump",
         )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=(
+                "Only output what would be created, updated, skipped or pruned "
+                "without writing anything."
+            ),
+        )
+        parser.add_argument(
+            "--report",
+            type=Path,
+            default=None,
+            help=(
+                "Path to a file where to write the load report as JSON, with the "
+                "counters of written objects, timings of each stage and number of "
+                "queries."
+            ),
+        )
+        self.add_loader_arguments(parser)
+
+    def add_loader_arguments(self, parser):
+        """
+        Add arguments for loader options.
+        """
+        parser.add_argument(
+            "--chunk-limit",
+            type=int,
+            default=None,
+            help=(
+                "Number of directories to process and commit together. Default to "
+                "{}.".format(DumpLoader.CHUNK_LIMIT)
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help=(
+                "Number of threads to process chunks of directories concurrently. "
+                "Default to a single one."
+            ),
+        )
+        parser.add_argument(
+            "--file-index",
+            action="store_true",
+            help=(
+                "Index every existing files of the device in memory with a single "
+                "query instead of querying them for each directory. This is faster "
+                "but needs more memory."
+            ),
+        )
+        parser.add_argument(
+            "--defer-covers",
+            action="store_true",
+            help=(
+                "Do not copy cover files during load, only record them so they can "
+                "be ingested afterwards with command 'ingest_covers'."
+            ),
+        )
+        parser.add_argument(
+            "--writer",
+            choices=["auto"] + list(WRITERS),
+            default="auto",
+            help=(
+                "Writer used to create files. Default to 'auto' which choose the "
+                "fastest one for the database."
+            ),
+        )
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help=(
+                "Write the files of each directory with a single upsert statement "
+                "instead of reading the existing ones first. Only available for "
+                "SQLite and PostgreSQL."
+            ),
+        )
+        parser.add_argument(
+            "--diff-engine",
+            choices=DumpLoader.DIFF_ENGINES,
+            default="python",
+            help=(
+                "Engine to compare dumped files to existing ones. 'pandas' compares "
+                "the files of a whole chunk at once, this is faster for devices "
+                "with a lot of files. Default to 'python'."
+            ),
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help=(
+                "Delete the device directories and files which are not in the dump "
+                "anymore."
+            ),
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help=(
+                "Load the dump even if it has not changed since the last load of "
+                "the device."
+            ),
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help=(
+                "Continue an unfinished load of the same dump file from its last "
+                "committed directory instead of processing every directories."
+            ),
+        )
 
-    def collect_dump(self, device, filepath):
+    def get_loader_options(self, options):
+        """
+        Get loader options from command options.
+        """
+        return {
+            "chunk_limit": options["chunk_limit"],
+            "workers": options["workers"],
+            "file_index": options["file_index"],
+            "defer_covers": options["defer_covers"],
+            "writer": options["writer"],
+            "upsert": options["upsert"],
+            "diff_engine": options["diff_engine"],
+            "sync": options["sync"],
+            "force": options["force"],
+            "resume": options["resume"],
+        }
+
+    def collect_dump(self, device, filepath, chunk_limit=None, workers=None,
+                     file_index=False, defer_covers=False, writer=None,
+                     upsert=False, diff_engine=None, sync=False, force=False,
+                     resume=False):
         """
         Load the dump contents into database.
+
+        Returns:
+            django_deovi.report.LoadReport: Load report.
         """
         self.stdout.write(
             self.style.SUCCESS("Opening dump: {}".format(filepath))
         )
         logger = DjangoCommandOutput(command=self)
-        loader = DumpLoader(output_interface=logger)
+        loader = DumpLoader(
+            output_interface=logger,
+            chunk_limit=chunk_limit,
+            workers=workers,
+            file_index=file_index,
+            defer_covers=defer_covers,
+            writer=writer,
+            upsert=upsert,
+            diff_engine=diff_engine,
+        )
 
         # Give the basepath computed from the dump path
-        loader.load(device, filepath, covers_basepath=filepath.parent.resolve())
+        return loader.load(
+            device,
+            filepath,
+            covers_basepath=filepath.parent.resolve(),
+            sync=sync,
+            force=force,
+            resume=resume,
+        )
+
+    def plan_dump(self, device, filepath, chunk_limit=None, workers=None,
+                  file_index=False, defer_covers=False, writer=None, upsert=False,
+                  diff_engine=None, sync=False, force=False, resume=False):
+        """
+        Output the plan of the dump load.
+        """
+        loader = DumpLoader(
+            output_interface=DjangoCommandOutput(command=self),
+            defer_covers=defer_covers,
+        )
+
+        plan = loader.plan(
+            device,
+            filepath,
+            covers_basepath=filepath.parent.resolve(),
+            sync=sync,
+            force=force,
+        )
+
+        for line in plan.summary():
+            self.stdout.write(line)
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -58,4 +233,26 @@ class Command(BaseCommand):
             )
             raise CommandError(msg)
 
-        self.collect_dump(options["device"], options["source"])
+        if options["dry_run"]:
+            if is_delta(options["source"]):
+                raise CommandError("Dry run is not available for a delta document")
+
+            self.plan_dump(
+                options["device"],
+                options["source"],
+                **self.get_loader_options(options)
+            )
+            return
+
+        report = self.collect_dump(
+            options["device"],
+            options["source"],
+            **self.get_loader_options(options)
+        )
+
+        if options["report"]:
+            options["report"].write_text(report.to_json())
+            self.stdout.write("Report written to: {}".format(options["report"]))
+
+        if report.failed_chunks:
+            raise CommandError(failed_chunks_message(report.failed_chunks))
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.10 on 2026-10-16 23:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_deovi', '0004_add_device_disk_usage_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='dump_checksum',
+            field=models.CharField(blank=True, default='', help_text='Checksum of the last loaded dump file content.', max_length=128, verbose_name='dump checksum'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='dump_mtime',
+            field=models.DateTimeField(blank=True, default=None, help_text='Modification date of the last loaded dump file.', null=True, verbose_name='dump modification date'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='dump_size',
+            field=models.BigIntegerField(blank=True, default=0, help_text='Size of the last loaded dump file.', validators=[django.core.validators.MinValueValidator(0)], verbose_name='dump size'),
+        ),
+    ]
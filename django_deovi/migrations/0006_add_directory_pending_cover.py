@@ -0,0 +1,18 @@
+# Generated by Django 4.0.10 on 2026-10-17 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_deovi', '0005_add_device_dump_fingerprint_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directory',
+            name='pending_cover',
+            field=models.TextField(blank=True, default='', help_text='Path to a cover file waiting to be ingested as the directory cover.', verbose_name='pending cover'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_deovi', '0006_add_directory_pending_cover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='device',
+            name='checkpoint_checksum',
+            field=models.CharField(blank=True, default='', help_text='Checksum of the dump file content from an unfinished load.', max_length=128, verbose_name='checkpoint checksum'),
+        ),
+        migrations.AddField(
+            model_name='device',
+            name='checkpoint_key',
+            field=models.TextField(blank=True, default='', help_text='Registry key of the last directory committed from an unfinished load.', verbose_name='checkpoint key'),
+        ),
+    ]
@@ -7,6 +7,7 @@ from django.urls import reverse
 from bigtree import dict_to_tree, tree_to_nested_dict
 
 from ..utils.tree import DirectoryInfosNode
+from .querysets import DeviceQuerySet
 
 
 class Device(models.Model):
@@ -99,6 +100,72 @@ class Device(models.Model):
     Last device change date.
     """
 
+    dump_checksum = models.CharField(
+        _("dump checksum"),
+        max_length=128,
+        blank=True,
+        default="",
+        help_text=_(
+            "Checksum of the last loaded dump file content."
+        ),
+    )
+    """
+    Optional checksum string of the last loaded dump.
+    """
+
+    dump_size = models.BigIntegerField(
+        _("dump size"),
+        blank=True,
+        default=0,
+        validators=[MinValueValidator(0)],
+        help_text=_(
+            "Size of the last loaded dump file."
+        ),
+    )
+    """
+    Optional file size integer of the last loaded dump.
+    """
+
+    dump_mtime = models.DateTimeField(
+        _("dump modification date"),
+        blank=True,
+        null=True,
+        default=None,
+        help_text=_(
+            "Modification date of the last loaded dump file."
+        ),
+    )
+    """
+    Optional modification datetime of the last loaded dump.
+    """
+
+    checkpoint_checksum = models.CharField(
+        _("checkpoint checksum"),
+        max_length=128,
+        blank=True,
+        default="",
+        help_text=_(
+            "Checksum of the dump file content from an unfinished load."
+        ),
+    )
+    """
+    Optional checksum string of the dump which checkpoint belongs to.
+    """
+
+    checkpoint_key = models.TextField(
+        _("checkpoint key"),
+        blank=True,
+        default="",
+        help_text=_(
+            "Registry key of the last directory committed from an unfinished load."
+        ),
+    )
+    """
+    Optional registry key where an unfinished load can be resumed after.
+    """
+
+    objects = DeviceQuerySet.as_manager()
+
     COMMON_ORDER_BY = ["title"]
     """
     List of field order commonly used in frontend view/api
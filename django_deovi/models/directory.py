@@ -10,7 +10,8 @@ from django.urls import reverse
 
 from smart_media.modelfields import SmartMediaField
 from smart_media.mixins import SmartFormatMixin
-from smart_media.signals import auto_purge_files_on_change, auto_purge_files_on_delete
+
+from .querysets import DirectoryQuerySet, purge_covers
 
 
 class Directory(SmartFormatMixin, models.Model):
@@ -96,6 +97,18 @@ class Directory(SmartFormatMixin, models.Model):
     Optional cover image.
     """
 
+    pending_cover = models.TextField(
+        _("pending cover"),
+        blank=True,
+        default="",
+        help_text=_(
+            "Path to a cover file waiting to be ingested as the directory cover."
+        ),
+    )
+    """
+    Optional cover file path to ingest.
+    """
+
     payload = models.TextField(
         _("JSON payload"),
         blank=True,
@@ -148,6 +161,8 @@ class Directory(SmartFormatMixin, models.Model):
     Optional release date.
     """
 
+    objects = DirectoryQuerySet.as_manager()
+
     COMMON_ORDER_BY = ["path"]
     """
     List of field order commonly used in frontend view/api
@@ -269,15 +284,48 @@ class Directory(SmartFormatMixin, models.Model):
         super().save(*args, **kwargs)
 
 
+def purge_cover_on_delete(sender, instance, **kwargs):
+    """
+    Remove the cover file of a deleted directory if no other directory use it.
+
+    Directory covers can be shared between directories so the receivers from
+    ``smart_media.signals`` can not be used.
+    """
+    if instance.cover:
+        purge_covers(sender, [instance.cover.name], using=instance._state.db)
+
+
+def purge_cover_on_change(sender, instance, **kwargs):
+    """
+    Remove the previous cover file of a changed directory if no other directory
+    use it.
+    """
+    if not instance.pk:
+        return
+
+    previous = sender._base_manager.using(instance._state.db).filter(
+        pk=instance.pk
+    ).values_list("cover", flat=True).first()
+
+    if previous and previous != instance.cover.name:
+        # Exclude directory itself since it still references the previous cover
+        shared = sender._base_manager.using(instance._state.db).filter(
+            cover=previous
+        ).exclude(pk=instance.pk).exists()
+
+        if not shared:
+            instance.cover.storage.delete(previous)
+
+
 # Connect signals for automatic media purge
 post_delete.connect(
-    auto_purge_files_on_delete(["cover"]),
+    purge_cover_on_delete,
     dispatch_uid="directory_medias_on_delete",
     sender=Directory,
     weak=False,
 )
 pre_save.connect(
-    auto_purge_files_on_change(["cover"]),
+    purge_cover_on_change,
     dispatch_uid="directory_medias_on_change",
     sender=Directory,
     weak=False,
@@ -9,6 +9,8 @@ from smart_media.modelfields import SmartMediaField
 from smart_media.mixins import SmartFormatMixin
 from smart_media.signals import auto_purge_files_on_change, auto_purge_files_on_delete
 
+from .querysets import MediaFileQuerySet
+
 
 class MediaFile(SmartFormatMixin, models.Model):
     """
@@ -145,6 +147,8 @@ class MediaFile(SmartFormatMixin, models.Model):
     Required datetime for when the file has been loaded.
     """
 
+    objects = MediaFileQuerySet.as_manager()
+
     COMMON_ORDER_BY = ["path"]
     """
     List of field order commonly used in frontend view/api
@@ -0,0 +1,294 @@
+"""
+Model querysets with a bulk deletion which does not load objects.
+
+Django deletion collects every object to delete, including the cascaded ones, to send
+their deletion signals. This is very slow on large devices or directories. Bulk
+deletion get the cover file names with a single query for each model, delete rows
+with raw deletions by batches and finally remove cover files from storage which are
+not referenced anymore.
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+
+
+DELETE_BATCH = 500
+"""
+Default number of primary keys to delete in a single batch.
+"""
+
+PURGE_WORKERS = 4
+"""
+Default number of threads to remove cover files from storage.
+"""
+
+
+def purge_files(storage, names, workers=None):
+    """
+    Remove files from storage using a pool of threads.
+
+    Arguments:
+        storage (django.core.files.storage.Storage): Storage where files are stored.
+        names (list): File names to remove. Empty names are ignored.
+
+    Keyword Arguments:
+        workers (integer): Number of threads to use. Default to ``PURGE_WORKERS``.
+
+    Returns:
+        integer: Number of removed files.
+    """
+    names = sorted(set([name for name in names if name]))
+
+    if names:
+        with ThreadPoolExecutor(max_workers=workers or PURGE_WORKERS) as executor:
+            list(executor.map(storage.delete, names))
+
+    return len(names)
+
+
+def unreferenced_files(model, names, using=None, fieldname="cover",
+                       batch_size=None):
+    """
+    Filter file names which are not referenced anymore by any object.
+
+    A stored file may be shared by many objects so it can only be removed once no
+    object references it.
+
+    Arguments:
+        model (django.db.models.Model): Model to search for references.
+        names (list): File names to filter. Empty names are ignored.
+
+    Keyword Arguments:
+        using (string): Database alias.
+        fieldname (string): Name of the file field to search for references.
+        batch_size (integer): Number of names to search in a single query. Default
+            to ``DELETE_BATCH``.
+
+    Returns:
+        list: File names which are not referenced.
+    """
+    batch_size = batch_size or DELETE_BATCH
+    names = sorted(set([name for name in names if name]))
+    referenced = set()
+
+    for start in range(0, len(names), batch_size):
+        referenced.update(
+            model._base_manager.using(using).filter(**{
+                fieldname + "__in": names[start:start + batch_size]
+            }).order_by().values_list(fieldname, flat=True)
+        )
+
+    return [name for name in names if name not in referenced]
+
+
+def purge_covers(model, names, using=None, workers=None):
+    """
+    Remove cover files from storage which are not referenced anymore.
+
+    Arguments:
+        model (django.db.models.Model): Model with a ``cover`` field.
+        names (list): Cover file names to remove.
+
+    Keyword Arguments:
+        using (string): Database alias.
+        workers (integer): Number of threads to use. Default to ``PURGE_WORKERS``.
+
+    Returns:
+        integer: Number of removed files.
+    """
+    return purge_files(
+        model._meta.get_field("cover").storage,
+        unreferenced_files(model, names, using=using),
+        workers=workers,
+    )
+
+
+def raw_delete(model, lookup, values, using, batch_size=None):
+    """
+    Delete rows by batches without collecting objects and sending signals.
+
+    Arguments:
+        model (django.db.models.Model): Model to delete rows from.
+        lookup (string): Field lookup to filter rows, it is completed with ``__in``.
+        values (list): Values to filter rows on.
+        using (string): Database alias.
+
+    Keyword Arguments:
+        batch_size (integer): Number of values for a single batch. Default to
+            ``DELETE_BATCH``.
+
+    Returns:
+        integer: Number of deleted rows.
+    """
+    batch_size = batch_size or DELETE_BATCH
+    deleted = 0
+
+    for start in range(0, len(values), batch_size):
+        deleted += model._base_manager.using(using).filter(**{
+            lookup + "__in": values[start:start + batch_size]
+        })._raw_delete(using)
+
+    return deleted
+
+
+class BulkDeleteQuerySet(models.QuerySet):
+    """
+    Base queryset for bulk deletion.
+
+    Related objects declared in ``bulk_relations`` are deleted first, then the
+    queryset objects. Cover files of every deleted model which have a ``cover``
+    field are removed once deletion has been committed.
+
+    Attributes:
+        bulk_name (string): Name of the queryset model in deletion counts.
+        bulk_relations (list): Related objects to delete before queryset objects,
+            each one is a tuple with the name in deletion counts, the relation path
+            from queryset model to the related model and the field lookup from the
+            related model to the queryset object primary keys.
+    """
+    bulk_name = None
+    bulk_relations = []
+
+    def _get_related_model(self, path):
+        """
+        Get the model at the end of a relation path.
+
+        Arguments:
+            path (string): Relation names separated with ``__``.
+
+        Returns:
+            django.db.models.Model: Related model.
+        """
+        model = self.model
+
+        for name in path.split("__"):
+            model = model._meta.get_field(name).related_model
+
+        return model
+
+    def _cover_names(self, model, lookup, values, batch_size=None):
+        """
+        Get the cover file names of rows to delete, by batches.
+
+        Arguments:
+            model (django.db.models.Model): Model to get cover names from.
+            lookup (string): Field lookup to filter rows, it is completed with
+                ``__in``.
+            values (list): Values to filter rows on.
+
+        Keyword Arguments:
+            batch_size (integer): Number of values for a single batch. Default to
+                ``DELETE_BATCH``.
+
+        Returns:
+            list: Cover file names, empty if model does not have a ``cover`` field.
+        """
+        try:
+            model._meta.get_field("cover")
+        except FieldDoesNotExist:
+            return []
+
+        batch_size = batch_size or DELETE_BATCH
+        names = []
+
+        for start in range(0, len(values), batch_size):
+            names.extend(
+                model._base_manager.using(self.db).filter(**{
+                    lookup + "__in": values[start:start + batch_size]
+                }).exclude(cover__isnull=True).exclude(
+                    cover=""
+                ).order_by().values_list("cover", flat=True)
+            )
+
+        return names
+
+    def _bulk_delete(self, batch_size):
+        """
+        Perform raw deletions.
+
+        Arguments:
+            batch_size (integer): Number of values for a single batch.
+
+        Returns:
+            tuple: A dictionnary of deleted rows per model name and a dictionnary of
+            cover file names to remove per model.
+        """
+        pks = list(self.order_by().values_list("pk", flat=True))
+        targets = [
+            (name, self._get_related_model(path), lookup)
+            for name, path, lookup in self.bulk_relations
+        ] + [(self.bulk_name, self.model, "pk")]
+
+        deleted = {}
+        covers = {}
+
+        for name, model, lookup in targets:
+            names = self._cover_names(model, lookup, pks, batch_size)
+            if names:
+                covers[model] = names
+
+            deleted[name] = raw_delete(model, lookup, pks, self.db, batch_size)
+
+        return deleted, covers
+
+    def bulk_delete(self, batch_size=None, workers=None):
+        """
+        Delete queryset objects and their related objects without loading them and
+        without sending signals.
+
+        Deletions are performed in a transaction and cover files which are not
+        referenced anymore are removed once it has been committed.
+
+        Keyword Arguments:
+            batch_size (integer): Number of objects for a single deletion batch.
+                Default to ``DELETE_BATCH``.
+            workers (integer): Number of threads to remove cover files. Default to
+                ``PURGE_WORKERS``.
+
+        Returns:
+            dict: Number of deleted rows per model name.
+        """
+        with transaction.atomic(using=self.db):
+            deleted, covers = self._bulk_delete(batch_size)
+
+            transaction.on_commit(
+                lambda: [
+                    purge_covers(model, names, using=self.db, workers=workers)
+                    for model, names in covers.items()
+                ],
+                using=self.db,
+            )
+
+        return deleted
+
+
+class MediaFileQuerySet(BulkDeleteQuerySet):
+    """
+    MediaFile queryset.
+    """
+    bulk_name = "mediafiles"
+
+
+class DirectoryQuerySet(BulkDeleteQuerySet):
+    """
+    Directory queryset.
+    """
+    bulk_name = "directories"
+    bulk_relations = [
+        ("mediafiles", "mediafiles", "directory_id"),
+    ]
+
+
+class DeviceQuerySet(BulkDeleteQuerySet):
+    """
+    Device queryset.
+
+    Device does not have any cover but its directories and their files do.
+    """
+    bulk_name = "devices"
+    bulk_relations = [
+        ("mediafiles", "directories__mediafiles", "directory__device_id"),
+        ("directories", "directories", "device_id"),
+    ]
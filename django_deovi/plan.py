@@ -0,0 +1,126 @@
+"""
+=========
+Load plan
+=========
+
+Result of a dry run from ``DumpLoader.plan`` which tells what a load would write
+without writing anything.
+
+"""
+
+
+class LoadPlan:
+    """
+    Counters of what a dump load would do.
+
+    Arguments:
+        device (string): Device slug.
+
+    Attributes:
+        device (string): Device slug.
+        new_device (boolean): True if device does not exist yet.
+        unchanged_dump (boolean): True if dump has not changed since the last load
+            so nothing would be done.
+        directories (dict): Number of directories which would be ``created``,
+            ``updated``, ``skipped`` (unchanged), ``pruned`` and ``invalid`` (their
+            chunk would be rolled back).
+        files (dict): Number of files which would be ``created``, ``updated``,
+            ``pruned`` or left ``unchanged``.
+        covers (dict): Number of cover files which would be ``copied`` and number of
+            ``missing`` ones.
+        payload_size (integer): Size in bytes of the written directory payloads.
+        cover_size (integer): Size in bytes of the copied cover files. This is an
+            upper estimation since covers which are already stored are not copied
+            again.
+    """
+    def __init__(self, device):
+        self.device = device
+        self.new_device = False
+        self.unchanged_dump = False
+        self.directories = dict.fromkeys(
+            ["created", "updated", "skipped", "pruned", "invalid"], 0
+        )
+        self.files = dict.fromkeys(["created", "updated", "unchanged", "pruned"], 0)
+        self.covers = dict.fromkeys(["copied", "missing"], 0)
+        self.payload_size = 0
+        self.cover_size = 0
+
+    @property
+    def written_rows(self):
+        """
+        Number of rows which would be written (created, updated or deleted).
+
+        Returns:
+            integer: Number of rows.
+        """
+        return sum([
+            self.directories["created"],
+            self.directories["updated"],
+            self.directories["pruned"],
+            self.files["created"],
+            self.files["updated"],
+            self.files["pruned"],
+        ])
+
+    @property
+    def written_size(self):
+        """
+        Estimated size in bytes of written data, only directory payloads and cover
+        files are accounted since they are the large ones.
+
+        Returns:
+            integer: Size in bytes.
+        """
+        return self.payload_size + self.cover_size
+
+    def as_dict(self):
+        """
+        Returns plan values as a dictionnary.
+
+        Returns:
+            dict: Plan values.
+        """
+        return {
+            "device": self.device,
+            "new_device": self.new_device,
+            "unchanged_dump": self.unchanged_dump,
+            "directories": dict(self.directories),
+            "files": dict(self.files),
+            "covers": dict(self.covers),
+            "payload_size": self.payload_size,
+            "cover_size": self.cover_size,
+            "written_rows": self.written_rows,
+            "written_size": self.written_size,
+        }
+
+    def summary(self):
+        """
+        Build a human readable summary of plan.
+
+        Returns:
+            list: Summary lines.
+        """
+        lines = ["Plan for device: {}{}".format(
+            self.device, " (new)" if self.new_device else ""
+        )]
+
+        if self.unchanged_dump:
+            lines.append("- Dump has not changed since the last load")
+            return lines
+
+        lines.extend([
+            "- Directories: {}".format(", ".join([
+                "{} {}".format(v, k) for k, v in self.directories.items()
+            ])),
+            "- Files: {}".format(", ".join([
+                "{} {}".format(v, k) for k, v in self.files.items()
+            ])),
+            "- Covers: {} to copy ({} bytes), {} missing".format(
+                self.covers["copied"], self.cover_size, self.covers["missing"]
+            ),
+            "- Estimated writes: {} rows, {} bytes".format(
+                self.written_rows, self.written_size
+            ),
+        ])
+
+        return lines
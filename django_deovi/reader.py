@@ -0,0 +1,749 @@
+"""
+=================
+Deovi dump reader
+=================
+
+Read a Deovi dump without loading it entirely in memory.
+
+A dump is a JSON object with a ``device`` item for disk usage and a ``registry``
+item which is a mapping of directories. The registry is the large part, so instead
+of decoding the whole document at once the reader walks through the top level
+structure and decode each registry entry one after another.
+
+A dump file may be compressed with gzip, bzip2 or xz, it is detected from its first
+bytes and decompressed on the fly while being read.
+
+An uncompressed JSON dump file is memory mapped instead of being read, each
+registry entry is decoded from its own slice of the mapped file. This way there is
+no private copy of the file content and many processes reading the same dump share
+the system page cache.
+
+Besides JSON, a dump file may be encoded with MessagePack or CBOR for the same
+structure, which is faster to decode and smaller on disk. Format is detected from
+the first bytes of the decompressed content. These formats need the optional
+packages ``msgpack`` and ``cbor2``.
+
+"""
+import bz2
+import codecs
+import gzip
+import json
+import lzma
+import mmap
+import re
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .exceptions import DjangoDeoviError
+
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+"""
+Pattern to skip whitespaces between JSON tokens, as defined from JSON specification.
+"""
+
+MAPPED_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+"""
+Same pattern than ``WHITESPACE`` for a mapped file.
+"""
+
+CHUNK_SIZE = 65536
+"""
+Default size of each chunk read from a dump file.
+"""
+
+COMPRESSIONS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+"""
+Magic bytes and the function to open a file compressed with the related format.
+"""
+
+STREAMED_SECTIONS = ("registry",)
+"""
+Top level section names which are mappings read item per item instead of being
+decoded in a single run.
+"""
+
+DUMP_FORMATS = ("json", "msgpack", "cbor")
+"""
+Available dump formats, JSON is the default one.
+"""
+
+FORMAT_PACKAGES = {
+    "msgpack": "msgpack",
+    "cbor": "cbor2",
+}
+"""
+Optional package name needed for each binary dump format.
+"""
+
+CBOR_SELF_DESCRIBE = b"\xd9\xd9\xf7"
+"""
+Optional CBOR tag which may start a CBOR document to identify it.
+"""
+
+
+def require_format_package(dump_format):
+    """
+    Ensure the package needed for a binary dump format is installed.
+
+    Arguments:
+        dump_format (string): Dump format name.
+    """
+    modules = {"msgpack": msgpack, "cbor": cbor2}
+
+    if dump_format in modules and modules[dump_format] is None:
+        raise DjangoDeoviError(
+            "Dump format '{}' needs the optional package '{}'.".format(
+                dump_format, FORMAT_PACKAGES[dump_format]
+            )
+        )
+
+
+class JSONDumpReader:
+    """
+    Iterate over a JSON dump, decoding registry directories one at a time.
+
+    Iterating over the reader yields tuples of three items ``(section, key, value)``:
+
+    * For a streamed section (like ``registry``), a first tuple announces the
+      section with ``key`` and ``value`` set to ``None``, then there is a tuple for
+      each section item where ``key`` is the item key and ``value`` the decoded
+      item;
+    * For any other section (like ``device``), there is a single tuple where ``key``
+      is ``None`` and ``value`` is the whole decoded section.
+
+    Sections are yielded in the order they are written in the dump.
+
+    This is also the base of readers for other formats which only have to
+    override ``_iter_object`` and ``_decode``.
+
+    Arguments:
+        fp (io.TextIOBase): Opened text file object to read from.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each read from file object.
+    """
+    def __init__(self, fp, chunk_size=None):
+        self.fp = fp
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """
+        Read more content from file object and append it to the buffer.
+
+        Consumed buffer part is dropped. Read size is at least the chunk size but
+        follows the pending buffer length so a large value will be fully buffered in a
+        few reads.
+
+        Returns:
+            bool: False if the end of file has been reached, else True.
+        """
+        if self.eof:
+            return False
+
+        pending = self.buffer[self.pos:]
+        chunk = self.fp.read(max(self.chunk_size, len(pending)))
+
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = pending + chunk
+        self.pos = 0
+
+        return True
+
+    def _peek(self):
+        """
+        Skip whitespaces and return the next character without consuming it.
+
+        Returns:
+            string: The next character or ``None`` if end of file has been reached.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self._fill():
+                return None
+
+    def _expect(self, characters):
+        """
+        Consume the next character which must be one of the given ones.
+
+        Arguments:
+            characters (string): Allowed characters.
+
+        Returns:
+            string: The consumed character.
+        """
+        char = self._peek()
+
+        if char is None or char not in characters:
+            msg = "Invalid JSON dump, expected one of '{}' but got '{}'."
+            raise DjangoDeoviError(msg.format(characters, char or "EOF"))
+
+        self.pos += 1
+
+        return char
+
+    def _decode(self):
+        """
+        Decode the next JSON value.
+
+        Buffer is filled until the value can be fully decoded.
+
+        Returns:
+            object: Decoded value.
+        """
+        self._peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if not self._fill():
+                    raise DjangoDeoviError("Invalid JSON dump: {}".format(e))
+                continue
+
+            # A scalar value touching the buffer end may be truncated
+            if (
+                end == len(self.buffer) and
+                not isinstance(value, (dict, list, str)) and
+                self._fill()
+            ):
+                continue
+
+            self.pos = end
+
+            return value
+
+    def _decode_key(self):
+        """
+        Decode the next object key.
+
+        Returns:
+            string: Decoded key.
+        """
+        key = self._decode()
+
+        if not isinstance(key, str):
+            raise DjangoDeoviError("Invalid JSON dump, object key must be a string.")
+
+        self._expect(":")
+
+        return key
+
+    def _iter_object(self):
+        """
+        Iterate over the next JSON object items without decoding their values.
+
+        Each value must be consumed before asking for the next item.
+
+        Yields:
+            string: Item key.
+        """
+        self._expect("{")
+
+        if self._peek() == "}":
+            self.pos += 1
+            return
+
+        while True:
+            yield self._decode_key()
+
+            if self._expect(",}") == "}":
+                return
+
+    def __iter__(self):
+        for section in self._iter_object():
+            if section in STREAMED_SECTIONS:
+                yield section, None, None
+
+                for key in self._iter_object():
+                    yield section, key, self._decode()
+            else:
+                yield section, None, self._decode()
+
+
+class MappedJSONDumpReader(JSONDumpReader):
+    """
+    Iterate over a memory mapped JSON dump, decoding registry directories one at a
+    time.
+
+    Each value is decoded from a slice of the mapped file starting at the value,
+    the slice is extended until the value is complete and only the added bytes are
+    decoded to text. Keys are decoded from a small slice and values from a slice
+    sized from the last decoded value, so most values are decoded at once. Nothing
+    else is copied from the mapped file.
+
+    See ``JSONDumpReader`` for yielded items.
+
+    Arguments:
+        mapped (mmap.mmap): Mapped dump file.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each decoded slice for values.
+
+    Attributes:
+        KEY_SIZE (integer): Size of the first decoded slice for keys.
+        SLICE_SIZE (integer): Default minimal size of decoded slices for values.
+        SLICE_GROWTH (integer): Factor to enlarge a slice which does not hold a
+            complete value.
+    """
+    KEY_SIZE = 256
+    SLICE_SIZE = 4096
+    SLICE_GROWTH = 8
+
+    def __init__(self, mapped, chunk_size=None):
+        super().__init__(None, chunk_size=chunk_size or self.SLICE_SIZE)
+        self.buffer = mapped
+        self.eof = True
+        self.value_size = self.chunk_size
+
+    def _fill(self):
+        # Mapped file is always fully available
+        return False
+
+    def _peek(self):
+        self.pos = MAPPED_WHITESPACE.match(self.buffer, self.pos).end()
+
+        if self.pos < len(self.buffer):
+            return chr(self.buffer[self.pos])
+
+        return None
+
+    def _raise_error(self):
+        """
+        Raise the error for an invalid value at current position.
+
+        Value is decoded again from the whole document text so the error is the
+        same than from ``JSONDumpReader``. This is expensive but only happens once.
+        """
+        document = self.buffer[:].decode("utf-8", "replace")
+        start = len(self.buffer[:self.pos].decode("utf-8", "replace"))
+
+        try:
+            self.decoder.raw_decode(document, start)
+        except json.JSONDecodeError as e:
+            raise DjangoDeoviError("Invalid JSON dump: {}".format(e))
+
+        raise DjangoDeoviError("Invalid JSON dump, invalid encoding.")
+
+    def _decode_slice(self, size):
+        """
+        Decode the next JSON value from a slice of the mapped file.
+
+        Slice is enlarged from its end until the value is complete. The text decoded
+        from previous attempts is kept, so every byte is decoded to text only once.
+        Each failed attempt parses the whole slice while a successful one stops at
+        the value end, this is why slice grows a lot at once.
+
+        Arguments:
+            size (integer): Size of the first slice.
+
+        Returns:
+            tuple: Decoded value and its size in bytes.
+        """
+        self._peek()
+        # A multibyte character cut at slice end is kept for the next slice
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        text = ""
+        end = self.pos
+
+        while True:
+            start, end = end, min(self.pos + size, len(self.buffer))
+            final = end == len(self.buffer)
+            size *= self.SLICE_GROWTH
+
+            try:
+                text += utf8.decode(self.buffer[start:end], final=final)
+            except UnicodeDecodeError:
+                self._raise_error()
+
+            try:
+                value, length = self.decoder.raw_decode(text)
+            except ValueError:
+                if final:
+                    self._raise_error()
+                continue
+
+            # A scalar value touching the slice end may be truncated
+            if (
+                length == len(text) and
+                not final and
+                not isinstance(value, (dict, list, str))
+            ):
+                continue
+
+            if not text.isascii():
+                length = len(text[:length].encode("utf-8"))
+
+            self.pos += length
+
+            return value, length
+
+    def _decode(self):
+        value, length = self._decode_slice(self.value_size)
+        self.value_size = max(self.chunk_size, length * 2)
+
+        return value
+
+    def _decode_key(self):
+        key, length = self._decode_slice(self.KEY_SIZE)
+
+        if not isinstance(key, str):
+            raise DjangoDeoviError("Invalid JSON dump, object key must be a string.")
+
+        self._expect(":")
+
+        return key
+
+
+class BinaryDumpReader(JSONDumpReader):
+    """
+    Base reader for binary dump formats.
+
+    Decoding errors from format package are raised as ``DjangoDeoviError``.
+
+    Arguments:
+        fp (io.BufferedIOBase): Opened binary file object to read from.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each read from file object.
+    """
+    format_name = None
+    label = None
+
+    def __init__(self, fp, chunk_size=None):
+        require_format_package(self.format_name)
+        self.fp = fp
+        self.chunk_size = chunk_size or CHUNK_SIZE
+
+    def get_errors(self):
+        """
+        Returns:
+            tuple: Exception classes from format package for invalid content.
+        """
+        return (ValueError,)
+
+    def _check_key(self, key):
+        """
+        Ensure an object key is a string.
+
+        Arguments:
+            key (object): Decoded key.
+
+        Returns:
+            string: The key.
+        """
+        if not isinstance(key, str):
+            raise DjangoDeoviError(
+                "Invalid {} dump, object key must be a string.".format(self.label)
+            )
+
+        return key
+
+    def __iter__(self):
+        try:
+            yield from super().__iter__()
+        except self.get_errors() as e:
+            raise DjangoDeoviError("Invalid {} dump: {}".format(self.label, e))
+
+
+class MessagePackDumpReader(BinaryDumpReader):
+    """
+    Iterate over a MessagePack dump, decoding registry directories one at a time.
+
+    See ``JSONDumpReader`` for yielded items.
+    """
+    format_name = "msgpack"
+    label = "MessagePack"
+
+    def __init__(self, fp, chunk_size=None):
+        super().__init__(fp, chunk_size=chunk_size)
+        self.unpacker = msgpack.Unpacker(
+            fp, raw=False, read_size=self.chunk_size
+        )
+
+    def get_errors(self):
+        return (ValueError, msgpack.UnpackException)
+
+    def _iter_object(self):
+        for i in range(self.unpacker.read_map_header()):
+            yield self._check_key(self.unpacker.unpack())
+
+    def _decode(self):
+        return self.unpacker.unpack()
+
+
+class CBORDumpReader(BinaryDumpReader):
+    """
+    Iterate over a CBOR dump, decoding registry directories one at a time.
+
+    Maps headers are read directly from file object since decoder does not expose
+    them, maps may have a definite or an indefinite length. Decoder reads exactly
+    what it needs from file object so both can share it.
+
+    See ``JSONDumpReader`` for yielded items.
+    """
+    format_name = "cbor"
+    label = "CBOR"
+    MAP_TYPE = 5
+    LENGTH_SIZES = {24: 1, 25: 2, 26: 4, 27: 8}
+    INDEFINITE = 31
+    BREAK = b"\xff"
+
+    def __init__(self, fp, chunk_size=None):
+        super().__init__(fp, chunk_size=chunk_size)
+        self.decoder = cbor2.CBORDecoder(fp)
+
+    def get_errors(self):
+        return (ValueError, cbor2.CBORDecodeError)
+
+    def _read_map_length(self):
+        """
+        Read the header of the next map.
+
+        Returns:
+            integer: Number of map items or ``None`` for an indefinite length.
+        """
+        head = self.fp.read(1)
+        if not head or head[0] >> 5 != self.MAP_TYPE:
+            raise DjangoDeoviError("Invalid CBOR dump, expected a map.")
+
+        info = head[0] & 0x1f
+        if info < 24:
+            return info
+        elif info == self.INDEFINITE:
+            return None
+        elif info not in self.LENGTH_SIZES:
+            raise DjangoDeoviError("Invalid CBOR dump, invalid map length.")
+
+        return int.from_bytes(self.fp.read(self.LENGTH_SIZES[info]), "big")
+
+    def _iter_object(self):
+        length = self._read_map_length()
+        position = 0
+
+        while length is None or position < length:
+            if length is None and self.fp.peek(1)[:1] == self.BREAK:
+                self.fp.read(1)
+                return
+
+            yield self._check_key(self.decoder.decode())
+            position += 1
+
+    def _decode(self):
+        return self.decoder.decode()
+
+    def __iter__(self):
+        if self.fp.peek(3)[:3] == CBOR_SELF_DESCRIBE:
+            self.fp.read(3)
+
+        yield from super().__iter__()
+
+
+DUMP_READERS = {
+    "json": JSONDumpReader,
+    "msgpack": MessagePackDumpReader,
+    "cbor": CBORDumpReader,
+}
+"""
+Reader class for each dump format.
+"""
+
+
+def get_compression_opener(path):
+    """
+    Detect the compression of a dump file from its magic bytes, so file extension
+    does not matter.
+
+    Arguments:
+        path (pathlib.Path): Dump file path.
+
+    Returns:
+        callable: Function to open the file from ``COMPRESSIONS`` or ``None`` if
+        file is not compressed.
+    """
+    with path.open("rb") as fp:
+        magic = fp.read(6)
+
+    for signature, opener in COMPRESSIONS:
+        if magic.startswith(signature):
+            return opener
+
+    return None
+
+
+def open_dump_file(path, binary=False):
+    """
+    Open a dump file for reading, decompressing it on the fly if needed.
+
+    Arguments:
+        path (pathlib.Path): Dump file path.
+
+    Keyword Arguments:
+        binary (boolean): Open file in binary mode instead of text mode.
+
+    Returns:
+        io.IOBase: Opened text file object or binary file object.
+    """
+    opener = get_compression_opener(path)
+
+    if opener is not None:
+        if binary:
+            return opener(path, "rb")
+        return opener(path, "rt", encoding="utf-8")
+
+    if binary:
+        return path.open("rb")
+
+    return path.open("r", encoding="utf-8")
+
+
+def get_dump_format(path):
+    """
+    Detect the format of a dump file from its first bytes once decompressed.
+
+    A dump is a map, MessagePack and CBOR maps start with bytes which can not start
+    a JSON document. Anything else is assumed to be JSON, so invalid content is
+    reported from JSON reader.
+
+    Arguments:
+        path (pathlib.Path): Dump file path.
+
+    Returns:
+        string: Format name from ``DUMP_FORMATS``.
+    """
+    with open_dump_file(path, binary=True) as fp:
+        head = fp.read(3)
+
+    if not head:
+        return "json"
+
+    if 0x80 <= head[0] <= 0x8f or head[0] in (0xde, 0xdf):
+        return "msgpack"
+
+    if 0xa0 <= head[0] <= 0xbb or head[0] == 0xbf or head == CBOR_SELF_DESCRIBE:
+        return "cbor"
+
+    return "json"
+
+
+def read_dump_file(path):
+    """
+    Decode a whole dump file, whatever its format and compression are.
+
+    Arguments:
+        path (pathlib.Path): Dump file path.
+
+    Returns:
+        object: Decoded dump.
+    """
+    dump_format = get_dump_format(path)
+    require_format_package(dump_format)
+
+    if dump_format == "json":
+        with open_dump_file(path) as fp:
+            return json.load(fp)
+
+    with open_dump_file(path, binary=True) as fp:
+        if dump_format == "msgpack":
+            return msgpack.unpack(fp, raw=False)
+
+        return cbor2.load(fp)
+
+
+def iter_payload(payload):
+    """
+    Iterate over an already decoded dump payload the same way ``JSONDumpReader``
+    does.
+
+    Arguments:
+        payload (dict): Decoded dump.
+
+    Yields:
+        tuple: Section name, item key and item value.
+    """
+    for section, value in payload.items():
+        if section in STREAMED_SECTIONS:
+            yield section, None, None
+
+            for key, item in value.items():
+                yield section, key, item
+        else:
+            yield section, None, value
+
+
+def iter_mapped_dump(path, chunk_size=None):
+    """
+    Iterate over an uncompressed JSON dump file with a memory map.
+
+    Arguments:
+        path (pathlib.Path): Dump file path.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each decoded slice.
+
+    Yields:
+        tuple: Section name, item key and item value.
+    """
+    with path.open("rb") as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from MappedJSONDumpReader(mapped, chunk_size=chunk_size)
+
+
+def iter_dump(dump, chunk_size=None, mapped=True):
+    """
+    Iterate over a dump from a decoded payload or a file path.
+
+    Arguments:
+        dump (pathlib.Path or dict): Either directly the dump dictionnary or a path
+            object for the dump file to read, it may be compressed and in any format
+            from ``DUMP_FORMATS``.
+
+    Keyword Arguments:
+        chunk_size (integer): Minimal size of each read from a dump file, or of each
+            decoded slice from a mapped one.
+        mapped (boolean): If enabled, an uncompressed and non empty JSON dump file
+            is memory mapped instead of being read by chunks. Default to True.
+
+    Yields:
+        tuple: Section name, item key and item value.
+    """
+    if isinstance(dump, dict):
+        yield from iter_payload(dump)
+        return
+
+    dump_format = get_dump_format(dump)
+
+    if (
+        mapped and
+        dump_format == "json" and
+        dump.stat().st_size > 0 and
+        get_compression_opener(dump) is None
+    ):
+        yield from iter_mapped_dump(dump, chunk_size=chunk_size)
+        return
+
+    with open_dump_file(dump, binary=dump_format != "json") as fp:
+        yield from DUMP_READERS[dump_format](fp, chunk_size=chunk_size)
@@ -0,0 +1,199 @@
+"""
+===========
+Load report
+===========
+
+Counters and timings collected during a dump load.
+
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+COUNTERS = [
+    "directories_created",
+    "directories_updated",
+    "directories_skipped",
+    "directories_deleted",
+    "files_created",
+    "files_updated",
+    "files_deleted",
+    "files_upserted",
+    "covers_copied",
+]
+"""
+Names of report counters.
+"""
+
+STAGES = ["parse", "distribution", "create", "edit", "upsert", "covers", "prune"]
+"""
+Names of timed load stages.
+"""
+
+
+class LoadReport:
+    """
+    Report of a dump load.
+
+    Report can be filled from many threads. Stage timings are summed from every
+    threads so with workers their total can be greater than the load wall time.
+
+    Keyword Arguments:
+        device (string): Device slug.
+
+    Attributes:
+        device (string): Device slug.
+        counters (dict): Number of written objects for each name from ``COUNTERS``.
+        timings (dict): Wall time and CPU time in seconds for each stage from
+            ``STAGES``.
+        queries (integer): Number of executed database queries.
+        wall_time (float): Load wall time in seconds.
+        cpu_time (float): Load CPU time in seconds for the whole process.
+        unchanged_dump (boolean): True if load has been skipped since dump has not
+            changed.
+        failed_chunks (list): Positions of chunks which have been rolled back.
+        pruned (dict): Pruning report from ``DumpLoader.prune`` if pruning has been
+            performed, else ``None``.
+    """
+    def __init__(self, device=None):
+        self.device = device
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.timings = {name: {"wall": 0.0, "cpu": 0.0} for name in STAGES}
+        self.queries = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.unchanged_dump = False
+        self.failed_chunks = []
+        self.pruned = None
+        self._lock = threading.Lock()
+
+    def add(self, **counters):
+        """
+        Increment counters.
+
+        Arguments:
+            **counters: Value to add to each counter name.
+        """
+        with self._lock:
+            for name, value in counters.items():
+                self.counters[name] += value
+
+    def add_timing(self, name, wall, cpu):
+        """
+        Add times to a stage.
+
+        Arguments:
+            name (string): Stage name.
+            wall (float): Wall time in seconds.
+            cpu (float): CPU time in seconds.
+        """
+        with self._lock:
+            self.timings[name]["wall"] += wall
+            self.timings[name]["cpu"] += cpu
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager to time a stage from the current thread.
+
+        Arguments:
+            name (string): Stage name.
+        """
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+
+        try:
+            yield
+        finally:
+            self.add_timing(
+                name,
+                time.perf_counter() - wall,
+                time.thread_time() - cpu,
+            )
+
+    def iterate(self, name, iterable):
+        """
+        Time an iterable as a stage, only the time to get each item is accounted.
+
+        Arguments:
+            name (string): Stage name.
+            iterable (iterable): Iterable to time.
+
+        Yields:
+            object: Items from iterable.
+        """
+        iterator = iter(iterable)
+
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+
+            yield item
+
+    @contextmanager
+    def total(self):
+        """
+        Context manager to time the whole load.
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+
+        try:
+            yield
+        finally:
+            self.wall_time += time.perf_counter() - wall
+            self.cpu_time += time.process_time() - cpu
+
+    def _count_query(self, execute, sql, params, many, context):
+        with self._lock:
+            self.queries += 1
+
+        return execute(sql, params, many, context)
+
+    def count_queries(self):
+        """
+        Context manager to count queries executed from the current thread
+        connection.
+
+        Returns:
+            contextmanager: The connection execute wrapper.
+        """
+        return connection.execute_wrapper(self._count_query)
+
+    def as_dict(self):
+        """
+        Returns report values as a dictionnary.
+
+        Returns:
+            dict: Report values.
+        """
+        return {
+            "device": self.device,
+            "unchanged_dump": self.unchanged_dump,
+            "counters": dict(self.counters),
+            "timings": {name: dict(value) for name, value in self.timings.items()},
+            "queries": self.queries,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "failed_chunks": list(self.failed_chunks),
+            "pruned": self.pruned,
+        }
+
+    def to_json(self, indent=4):
+        """
+        Serialize report to JSON.
+
+        Keyword Arguments:
+            indent (integer): JSON indentation.
+
+        Returns:
+            string: JSON report.
+        """
+        return json.dumps(self.as_dict(), indent=indent)
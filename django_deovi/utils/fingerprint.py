@@ -0,0 +1,55 @@
+import hashlib
+from collections import namedtuple
+from datetime import datetime, timezone
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+"""
+Size of each read when hashing a file.
+"""
+
+DumpFingerprint = namedtuple("DumpFingerprint", ["checksum", "size", "mtime"])
+"""
+Fingerprint of a dump file with its content checksum, its size in bytes and its
+modification datetime.
+"""
+
+
+def hash_file(path, chunk_size=None):
+    """
+    Compute a BLAKE2b checksum of a file content, reading it by chunks.
+
+    Arguments:
+        path (pathlib.Path): File to hash.
+
+    Keyword Arguments:
+        chunk_size (integer): Size of each read. Default to ``HASH_CHUNK_SIZE``.
+
+    Returns:
+        string: Hexadecimal digest.
+    """
+    checksum = hashlib.blake2b()
+
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size or HASH_CHUNK_SIZE), b""):
+            checksum.update(chunk)
+
+    return checksum.hexdigest()
+
+
+def file_stat(path):
+    """
+    Get the size and modification datetime of a file.
+
+    Arguments:
+        path (pathlib.Path): File to get informations from.
+
+    Returns:
+        tuple: File size in bytes and its modification datetime in UTC.
+    """
+    stat = path.stat()
+
+    return (
+        stat.st_size,
+        datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+    )
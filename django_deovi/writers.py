@@ -0,0 +1,450 @@
+"""
+============
+File writers
+============
+
+Writers create the new MediaFile rows of a directory. The ORM writer builds model
+objects for a bulk creation, the other ones send the field values directly with a
+database specific fast path:
+
+* ``executemany`` use a single prepared INSERT statement executed for every rows, it
+  is the default one for SQLite;
+* ``copy`` use PostgreSQL ``COPY FROM STDIN`` to stream rows, it is never chosen
+  by default and must be selected explicitly;
+* ``orm`` use ``bulk_create`` and is the default one for any other database.
+
+Rows are built from the same values than the ORM would save, so every writers
+produce the same rows.
+
+``UpsertWriter`` is not a file creation writer, it writes the files of a directory
+whatever they exist or not with a single ``INSERT ... ON CONFLICT`` statement.
+
+"""
+import io
+from itertools import repeat
+
+from django.db import connections, router, transaction
+from django.db.models import FileField
+
+from .dump import DumpedFileBatch
+from .exceptions import DjangoDeoviError
+from .models import MediaFile
+
+
+class OrmWriter:
+    """
+    Create files with the ORM bulk creation.
+
+    Keyword Arguments:
+        batch_size (integer): Number of objects for a single creation query. Default
+            to a single query for every objects if backend supports it.
+        using (string): Database alias. Default to the one for MediaFile writes.
+    """
+    name = "orm"
+
+    def __init__(self, batch_size=None, using=None):
+        self.batch_size = batch_size
+        self.using = using or router.db_for_write(MediaFile)
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def create(self, directory, files, batch_date):
+        """
+        Create files.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Directory object to assign all
+                the files.
+            files (django_deovi.dump.DumpedFileBatch or list): Batch or list of
+                DumpedFile objects for directory children files.
+            batch_date (datetime.datetime): Value for ``MediaFile.loaded_date``.
+        """
+        MediaFile.objects.using(self.using).bulk_create([
+            MediaFile(
+                **values,
+                loaded_date=batch_date,
+                directory=directory,
+            )
+            for values in DumpedFileBatch.from_objects(files).iter_orm_fields()
+        ], batch_size=self.batch_size)
+
+
+class RawWriter(OrmWriter):
+    """
+    Base for writers which send field values without building model objects.
+
+    Rows are written with a single prepared INSERT statement executed for every
+    rows of a batch, writers for other statements override ``get_statement`` and
+    ``write_batch``.
+    """
+    BATCH_SIZE = 2000
+
+    def get_fields(self):
+        """
+        Returns the written MediaFile fields, every concrete fields except the
+        primary key.
+
+        Returns:
+            list: Model field objects.
+        """
+        return [
+            field for field in MediaFile._meta.concrete_fields
+            if not field.primary_key
+        ]
+
+    def iter_rows(self, directory, files, batch_date):
+        """
+        Build database values for each file.
+
+        Values are prepared column per column, field defaults are used for values
+        which are not in the dump.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Related directory.
+            files (django_deovi.dump.DumpedFileBatch or list): Batch or list of
+                DumpedFile objects.
+            batch_date (datetime.datetime): Value for ``MediaFile.loaded_date``.
+
+        Returns:
+            iterator: Tuples of database values in the same order than
+            ``get_fields``.
+        """
+        batch = DumpedFileBatch.from_objects(files)
+        columns = dict(
+            batch.convert_to_orm_columns(),
+            loaded_date=batch_date,
+            directory_id=directory.pk,
+        )
+
+        prepared = []
+        for field in self.get_fields():
+            if field.attname in columns:
+                values = columns[field.attname]
+            else:
+                values = field.get_default()
+                # ORM saves an empty file field as an empty string
+                if isinstance(field, FileField) and values is None:
+                    values = ""
+
+            # A single value is the same for every rows
+            if isinstance(values, list):
+                prepared.append([
+                    field.get_db_prep_save(value, self.connection)
+                    for value in values
+                ])
+            else:
+                prepared.append(repeat(
+                    field.get_db_prep_save(values, self.connection), len(batch)
+                ))
+
+        return zip(*prepared)
+
+    def iter_batches(self, rows):
+        """
+        Group rows into lists of ``batch_size`` rows at most.
+
+        Arguments:
+            rows (iterator): Rows to group.
+
+        Yields:
+            list: A batch of rows.
+        """
+        size = self.batch_size or self.BATCH_SIZE
+        batch = []
+
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def get_statement(self):
+        """
+        Build the INSERT statement.
+
+        Returns:
+            string: SQL statement with a placeholder for each field.
+        """
+        quote = self.connection.ops.quote_name
+        fields = self.get_fields()
+
+        return "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(MediaFile._meta.db_table),
+            ", ".join([quote(field.column) for field in fields]),
+            ", ".join(["%s"] * len(fields)),
+        )
+
+    def write_batch(self, cursor, batch):
+        """
+        Write a batch of rows.
+
+        Arguments:
+            cursor (django.db.backends.utils.CursorWrapper): Database cursor.
+            batch (list): Rows to write.
+
+        Returns:
+            integer: Number of written rows as reported by the cursor.
+        """
+        cursor.executemany(self.get_statement(), batch)
+
+        return cursor.rowcount
+
+    def create(self, directory, files, batch_date):
+        """
+        Create files by batches.
+
+        Like the ORM bulk creation, batches are written in a transaction so a
+        failure does not let any row from a previous batch.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Directory object to assign all
+                the files.
+            files (django_deovi.dump.DumpedFileBatch or list): Batch or list of
+                DumpedFile objects for directory children files.
+            batch_date (datetime.datetime): Value for ``MediaFile.loaded_date``.
+        """
+        rows = self.iter_rows(directory, files, batch_date)
+
+        with transaction.atomic(using=self.using, savepoint=False):
+            with self.connection.cursor() as cursor:
+                for batch in self.iter_batches(rows):
+                    self.write_batch(cursor, batch)
+
+
+class ExecutemanyWriter(RawWriter):
+    """
+    Create files with a single INSERT statement executed for every rows.
+    """
+    name = "executemany"
+
+
+class CopyWriter(RawWriter):
+    """
+    Create files with PostgreSQL ``COPY FROM STDIN`` in text format.
+
+    This needs the ``psycopg2`` driver. It is not chosen by default for PostgreSQL
+    and must be selected with its name.
+    """
+    name = "copy"
+
+    def format_value(self, value):
+        """
+        Format a value for the COPY text format.
+
+        Arguments:
+            value (object): Database value.
+
+        Returns:
+            string: Formatted value.
+        """
+        if value is None:
+            return "\\N"
+
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+
+        return (
+            str(value)
+            .replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+        )
+
+    def get_buffer(self, rows):
+        """
+        Write rows into a buffer for the COPY text format.
+
+        Arguments:
+            rows (list): Rows to write.
+
+        Returns:
+            io.StringIO: Buffer set at its start.
+        """
+        buffer = io.StringIO()
+
+        for row in rows:
+            buffer.write("\t".join([self.format_value(value) for value in row]))
+            buffer.write("\n")
+
+        buffer.seek(0)
+
+        return buffer
+
+    def get_statement(self):
+        """
+        Build the COPY statement.
+
+        Returns:
+            string: SQL statement.
+        """
+        quote = self.connection.ops.quote_name
+
+        return "COPY {} ({}) FROM STDIN".format(
+            quote(MediaFile._meta.db_table),
+            ", ".join([quote(field.column) for field in self.get_fields()]),
+        )
+
+    def write_batch(self, cursor, batch):
+        # Driver cursor since the Django one does not expose COPY
+        cursor.cursor.copy_expert(self.get_statement(), self.get_buffer(batch))
+
+
+class UpsertWriter(ExecutemanyWriter):
+    """
+    Create or update files with ``INSERT ... ON CONFLICT DO UPDATE`` executed for
+    every rows, without reading existing files first.
+
+    Conflicts are detected on the MediaFile directory and path unique constraint.
+    A conflicting row is only updated if any of the compared fields value differs,
+    its loaded date is then updated too.
+
+    This is only supported with SQLite (3.24 or later) and PostgreSQL.
+
+    Keyword Arguments:
+        batch_size (integer): Number of rows for a single ``executemany``.
+        using (string): Database alias. Default to the one for MediaFile writes.
+        fields (list): Names of the fields to compare and update on conflict.
+    """
+    name = "upsert"
+    CONSTRAINT = "deovi_mediafile_directory_path"
+    DISTINCT_OPERATORS = {
+        "sqlite": "IS NOT",
+        "postgresql": "IS DISTINCT FROM",
+    }
+
+    def __init__(self, batch_size=None, using=None, fields=None):
+        super().__init__(batch_size=batch_size, using=using)
+        self.fields = fields or []
+
+        if self.connection.vendor not in self.DISTINCT_OPERATORS:
+            raise DjangoDeoviError(
+                "Upsert is not supported for database vendor: {}".format(
+                    self.connection.vendor
+                )
+            )
+
+    def get_conflict_columns(self):
+        """
+        Get the columns of the directory and path unique constraint.
+
+        Returns:
+            list: Column names.
+        """
+        constraint = [
+            item for item in MediaFile._meta.constraints
+            if item.name == self.CONSTRAINT
+        ][0]
+
+        return [
+            MediaFile._meta.get_field(name).column for name in constraint.fields
+        ]
+
+    def get_statement(self):
+        """
+        Build the upsert statement.
+
+        Returns:
+            string: SQL statement with a placeholder for each field.
+        """
+        quote = self.connection.ops.quote_name
+        table = quote(MediaFile._meta.db_table)
+        distinct = self.DISTINCT_OPERATORS[self.connection.vendor]
+        compared = [
+            quote(MediaFile._meta.get_field(name).column) for name in self.fields
+        ]
+        updated = compared + [
+            quote(MediaFile._meta.get_field("loaded_date").column)
+        ]
+
+        return "{} ON CONFLICT ({}) DO UPDATE SET {} WHERE {}".format(
+            super().get_statement(),
+            ", ".join([quote(column) for column in self.get_conflict_columns()]),
+            ", ".join([
+                "{column} = excluded.{column}".format(column=column)
+                for column in updated
+            ]),
+            " OR ".join([
+                "{table}.{column} {distinct} excluded.{column}".format(
+                    table=table, column=column, distinct=distinct
+                )
+                for column in compared
+            ]),
+        )
+
+    def create(self, directory, files, batch_date):
+        """
+        Create or update files.
+
+        Arguments:
+            directory (django_deovi.models.Directory): Directory object to assign all
+                the files.
+            files (django_deovi.dump.DumpedFileBatch or list): Batch or list of
+                DumpedFile objects for directory children files.
+            batch_date (datetime.datetime): Value for ``MediaFile.loaded_date`` of
+                created and updated files.
+
+        Returns:
+            integer: Number of created or updated files, unchanged files are not
+            counted.
+        """
+        rows = self.iter_rows(directory, files, batch_date)
+        written = 0
+
+        with transaction.atomic(using=self.using, savepoint=False):
+            with self.connection.cursor() as cursor:
+                for batch in self.iter_batches(rows):
+                    written += self.write_batch(cursor, batch)
+
+        return written
+
+
+WRITERS = {
+    OrmWriter.name: OrmWriter,
+    ExecutemanyWriter.name: ExecutemanyWriter,
+    CopyWriter.name: CopyWriter,
+}
+"""
+Available writers per name.
+"""
+
+VENDOR_WRITERS = {
+    "sqlite": ExecutemanyWriter.name,
+}
+"""
+Default writer name per database vendor, any other vendor use the ORM writer.
+The ``copy`` writer is opt-in only.
+"""
+
+
+def get_writer(writer=None, batch_size=None, using=None):
+    """
+    Get a file writer.
+
+    Keyword Arguments:
+        writer (string or object): A writer name from ``WRITERS`` or directly a
+            writer object which is returned as is. If empty or ``auto``, writer is
+            chosen from the database vendor.
+        batch_size (integer): Number of rows for a single write.
+        using (string): Database alias. Default to the one for MediaFile writes.
+
+    Returns:
+        object: Writer object.
+    """
+    if writer is not None and not isinstance(writer, str):
+        return writer
+
+    using = using or router.db_for_write(MediaFile)
+
+    if not writer or writer == "auto":
+        writer = VENDOR_WRITERS.get(connections[using].vendor, OrmWriter.name)
+
+    if writer not in WRITERS:
+        raise DjangoDeoviError("Unknown file writer: {}".format(writer))
+
+    return WRITERS[writer](batch_size=batch_size, using=using)
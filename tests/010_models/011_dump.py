@@ -1,11 +1,15 @@
 import datetime
+import gc
+import json
+import tracemalloc
 
 from django.utils import timezone
 
 import pytest
 
-from django_deovi.dump import DumpedFile
+from django_deovi.dump import DumpedFile, DumpedFileBatch
 from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.factories import DumpedFileFactory
 
 
 def test_dumpedfile_basic(db):
@@ -86,3 +90,168 @@ def test_dumpedfile_mtime_vaidation(db):
     assert str(excinfo.value) == (
         "DumpedFile.mtime must be a string in ISO format."
     )
+
+
+def test_dumpedfile_batch(db):
+    """
+    Batch should validate and convert files column per column with the same
+    results than DumpedFile.
+    """
+    files = [
+        DumpedFileFactory(path="/videos/foo.mkv", mtime="2022-08-11T12:00:35"),
+        DumpedFileFactory(path="/videos/bar.mkv", mtime="2022-08-11T12:00:35"),
+        DumpedFileFactory(
+            path="/videos/ping.mkv", mtime="2022-08-11T12:00:35+02:00"
+        ),
+    ]
+
+    batch = DumpedFileBatch.from_payloads([item.to_dict() for item in files])
+
+    assert len(batch) == 3
+    assert repr(batch) == "<DumpedFileBatch: 3 files>"
+    assert batch.paths == ["/videos/foo.mkv", "/videos/bar.mkv", "/videos/ping.mkv"]
+    assert list(batch.iter_orm_fields()) == [
+        item.convert_to_orm_fields() for item in files
+    ]
+    assert DumpedFileBatch.from_objects(files).columns == batch.columns
+
+    # Views are DumpedFile objects
+    view = batch.view(1, mediafile="foo")
+    assert isinstance(view, DumpedFile)
+    assert view.to_dict() == files[1].to_dict()
+    assert view._mediafile == "foo"
+    assert [item.path for item in batch] == batch.paths
+
+    selected = batch.select([2, 0])
+    assert selected.paths == ["/videos/ping.mkv", "/videos/foo.mkv"]
+    assert selected[0].to_dict() == files[2].to_dict()
+
+
+def test_dumpedfile_equality(db):
+    """
+    Files and batches should be equal only with the same values.
+    """
+    foo = DumpedFileFactory(path="/videos/foo.mkv")
+    bar = DumpedFileFactory(path="/videos/bar.mkv")
+
+    assert foo == DumpedFile(**foo.to_dict(), mediafile="foo")
+    assert foo != bar
+    assert foo != foo.to_dict()
+
+    batch = DumpedFileBatch.from_objects([foo, bar])
+    assert batch == DumpedFileBatch.from_objects([foo, bar])
+    assert batch == [foo, bar]
+    assert batch != DumpedFileBatch.from_objects([bar, foo])
+    assert batch != [bar, foo]
+    assert batch != [foo, foo]
+    assert batch.select([0]) != DumpedFileBatch.from_objects([bar])
+
+
+def test_dumpedfile_batch_validation(db):
+    """
+    Batch should raise the same errors than DumpedFile for the whole batch.
+    """
+    valid = DumpedFileFactory().to_dict()
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        DumpedFileBatch.from_payloads([valid, {"path": "/home/plop.mp4"}])
+
+    assert str(excinfo.value) == (
+        "DumpedFile missed some required arguments: name, absolute_dir, "
+        "relative_dir, directory, extension, container, size, mtime"
+    )
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        DumpedFileBatch.from_payloads([valid, dict(valid, mtime=42)])
+
+    assert str(excinfo.value) == (
+        "DumpedFile.mtime must be a string in ISO format."
+    )
+
+
+def test_dumpedfile_dict_roundtrip(db):
+    """
+    Slotted object should be built from a dict and return the same dict, without
+    any instance dictionnary.
+    """
+    payload = DumpedFileFactory().to_dict()
+
+    dumpedfile = DumpedFile.from_dict(**payload)
+
+    assert dumpedfile.to_dict() == payload
+    assert DumpedFile.from_dict(**dumpedfile.to_dict()).to_dict() == payload
+    assert not hasattr(dumpedfile, "__dict__")
+
+    with pytest.raises(AttributeError):
+        dumpedfile.foo = "bar"
+
+
+def test_dumpedfile_interned_values(db):
+    """
+    Values shared between sibling files should be interned, either from DumpedFile
+    or from a batch.
+    """
+    # Decoded JSON strings are distinct objects even if they are equal
+    payloads = json.loads(json.dumps([
+        DumpedFileFactory(path="/videos/foo/{}.mkv".format(i)).to_dict()
+        for i in range(2)
+    ]))
+    assert payloads[0]["absolute_dir"] is not payloads[1]["absolute_dir"]
+
+    first, second = [DumpedFile.from_dict(**item) for item in payloads]
+    batch = DumpedFileBatch.from_payloads(payloads)
+
+    for name in DumpedFile.INTERNED_FIELDS:
+        assert getattr(first, name) is getattr(second, name)
+        assert batch.columns[name][0] is batch.columns[name][1]
+        assert batch.columns[name][0] is getattr(first, name)
+
+
+def test_dumpedfile_memory(db):
+    """
+    Slotted and interned files should need a lot less memory than objects with an
+    instance dictionnary which keep the decoded strings.
+
+    Memory is measured on less files to keep the test fast since tracing is
+    expensive, then scaled to 100k files.
+    """
+    class DictFile:
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    length = 10000
+    content = json.dumps([
+        {
+            "path": "/videos/foo/{}.mkv".format(i),
+            "name": "{}.mkv".format(i),
+            "absolute_dir": "/videos/foo",
+            "relative_dir": "foo",
+            "directory": "foo",
+            "extension": "mkv",
+            "container": "Matroska",
+            "size": 42,
+            "mtime": "2022-08-11T12:00:35",
+        }
+        for i in range(length)
+    ])
+
+    def measure(klass):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            files = [klass(**item) for item in json.loads(content)]
+            gc.collect()
+            size = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+        assert len(files) == length
+
+        return size * 100000 // length
+
+    dict_size = measure(DictFile)
+    slotted_size = measure(DumpedFile)
+
+    # Around 50MB are saved for 100k files
+    assert dict_size - slotted_size > 20 * 1024 * 1024
+    assert slotted_size < dict_size * 0.6
@@ -1,5 +1,6 @@
 import json
 import datetime
+from pathlib import Path
 
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
@@ -179,3 +180,25 @@ def test_directory_resume(db):
         "filesize": 555,
         "last_media_update": banana_last.loaded_date,
     }
+
+
+def test_directory_shared_cover_purge(db):
+    """
+    A cover shared between directories should only be removed from storage when no
+    directory use it anymore.
+    """
+    foo = DirectoryFactory()
+    bar = DirectoryFactory(cover=foo.cover.name)
+    ping = DirectoryFactory(cover=foo.cover.name)
+    shared = Path(foo.cover.path)
+
+    foo.delete()
+    assert shared.exists() is True
+
+    bar.cover = None
+    bar.save()
+    assert shared.exists() is True
+
+    ping.cover = None
+    ping.save()
+    assert shared.exists() is False
@@ -0,0 +1,139 @@
+from pathlib import Path
+
+from django.db.models.signals import post_delete
+
+from django_deovi.factories import (
+    DeviceFactory, DirectoryFactory, MediaFileFactory
+)
+from django_deovi.models import Device, Directory, MediaFile
+from django_deovi.models.querysets import purge_files, unreferenced_files
+
+
+def test_purge_files(db):
+    """
+    Files should be removed from storage, empty and duplicate names are ignored.
+    """
+    foo = MediaFileFactory()
+    bar = MediaFileFactory()
+    storage = foo.cover.storage
+    foo_path = Path(foo.cover.path)
+    bar_path = Path(bar.cover.path)
+
+    removed = purge_files(storage, [foo.cover.name, "", None, foo.cover.name])
+
+    assert removed == 1
+    assert foo_path.exists() is False
+    assert bar_path.exists() is True
+
+
+def test_mediafile_bulk_delete(db, django_capture_on_commit_callbacks):
+    """
+    Bulk deletion should remove rows and cover files without any deletion signal.
+    """
+    received = []
+
+    def receiver(sender, instance, **kwargs):
+        received.append(instance)
+
+    post_delete.connect(receiver, sender=MediaFile, dispatch_uid="test_bulk_delete")
+
+    directory = DirectoryFactory()
+    foo = MediaFileFactory(directory=directory)
+    bar = MediaFileFactory(directory=directory)
+    kept = MediaFileFactory(directory=directory)
+    foo_cover = Path(foo.cover.path)
+
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            deleted = MediaFile.objects.filter(
+                pk__in=[foo.pk, bar.pk]
+            ).bulk_delete(batch_size=1)
+    finally:
+        post_delete.disconnect(dispatch_uid="test_bulk_delete", sender=MediaFile)
+
+    assert deleted == {"mediafiles": 2}
+    assert received == []
+    assert list(MediaFile.objects.values_list("pk", flat=True)) == [kept.pk]
+    assert foo_cover.exists() is False
+    assert Path(kept.cover.path).exists() is True
+
+
+def test_directory_bulk_delete(db, django_capture_on_commit_callbacks,
+                               django_assert_num_queries):
+    """
+    Directory bulk deletion should delete directories with their files and covers.
+    """
+    device = DeviceFactory()
+    foo = DirectoryFactory(device=device)
+    bar = DirectoryFactory(device=device)
+    foo_file = MediaFileFactory(directory=foo)
+    kept_file = MediaFileFactory(directory=bar)
+    covers = [Path(foo.cover.path), Path(foo_file.cover.path)]
+
+    # Pks, directory covers, file covers, a deletion for each model, the cover
+    # references check for each model and the savepoint queries since test is already
+    # running in a transaction
+    with django_assert_num_queries(9):
+        with django_capture_on_commit_callbacks(execute=True):
+            deleted = Directory.objects.filter(pk=foo.pk).bulk_delete()
+
+    assert deleted == {"directories": 1, "mediafiles": 1}
+    assert list(Directory.objects.values_list("pk", flat=True)) == [bar.pk]
+    assert list(MediaFile.objects.values_list("pk", flat=True)) == [kept_file.pk]
+    assert [item.exists() for item in covers] == [False, False]
+    assert Path(bar.cover.path).exists() is True
+
+
+def test_device_bulk_delete(db, django_capture_on_commit_callbacks):
+    """
+    Device bulk deletion should delete devices with their directories, files and
+    covers.
+    """
+    device = DeviceFactory()
+    directory = DirectoryFactory(device=device)
+    foo = MediaFileFactory(directory=directory)
+    MediaFileFactory(directory=directory)
+    kept = MediaFileFactory()
+    covers = [Path(directory.cover.path), Path(foo.cover.path)]
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        deleted = Device.objects.filter(pk=device.pk).bulk_delete()
+
+    assert len(callbacks) == 1
+    assert deleted == {"devices": 1, "directories": 1, "mediafiles": 2}
+    assert list(Device.objects.values_list("pk", flat=True)) == [
+        kept.directory.device.pk
+    ]
+    assert list(MediaFile.objects.values_list("pk", flat=True)) == [kept.pk]
+    assert [item.exists() for item in covers] == [False, False]
+    assert Path(kept.cover.path).exists() is True
+
+
+def test_unreferenced_files(db):
+    """
+    Only the file names which are not referenced by any object should be returned.
+    """
+    foo = DirectoryFactory()
+
+    assert unreferenced_files(
+        Directory, [foo.cover.name, "nope.png", "", None, "nope.png"], batch_size=1
+    ) == ["nope.png"]
+
+
+def test_bulk_delete_shared_cover(db, django_capture_on_commit_callbacks):
+    """
+    A cover file shared with an object which is not deleted should be kept.
+    """
+    foo = DirectoryFactory()
+    bar = DirectoryFactory(cover=foo.cover.name)
+    cover = Path(foo.cover.path)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Directory.objects.filter(pk=foo.pk).bulk_delete()
+
+    assert cover.exists() is True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Directory.objects.filter(pk=bar.pk).bulk_delete()
+
+    assert cover.exists() is False
@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.reader import JSONDumpReader, iter_dump, iter_payload
+
+
+def test_json_reader_sections(tests_settings):
+    """
+    Reader should yield the device section and each registry directory in the same
+    order than the dump.
+    """
+    dump_path = tests_settings.fixtures_path / "dump_directories.json"
+    payload = json.loads(dump_path.read_text())
+
+    with dump_path.open("r") as fp:
+        items = list(JSONDumpReader(fp))
+
+    assert items == list(iter_payload(payload))
+    assert [(section, key) for section, key, value in items] == [
+        ("device", None),
+        ("registry", None),
+        ("registry", "series/ZouipWorld"),
+        ("registry", "series/BillyBoy"),
+        ("registry", "theatre"),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 100000])
+def test_json_reader_chunk_size(tests_settings, chunk_size):
+    """
+    Reader should decode the same items whatever the read chunk size is, even when
+    values are split between many reads.
+    """
+    payload = {
+        "device": {"total": 1000, "used": 250, "free": 750, "percentage": 25.0},
+        "registry": {
+            "foo": {"path": "/foo", "size": 4096, "children_files": []},
+            "bär ü": {"path": "/bär ü", "title": "\"quoted\" \\o/", "size": 12},
+        },
+        "extra": 123456789,
+    }
+
+    items = list(
+        JSONDumpReader(io.StringIO(json.dumps(payload)), chunk_size=chunk_size)
+    )
+
+    assert items == list(iter_payload(payload))
+
+
+def test_json_reader_empty():
+    """
+    Empty document should not yield anything and empty registry is only announced.
+    """
+    assert list(JSONDumpReader(io.StringIO("{}"))) == []
+    assert list(JSONDumpReader(io.StringIO(' { "registry" : { } } '))) == [
+        ("registry", None, None),
+    ]
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "[]",
+    '{"registry": {"foo": {"path": "/foo"}',
+    '{"registry": {"foo" {"path": "/foo"}}}',
+    '{"registry": {"foo": {"path": }}}',
+    '{1: "foo"}',
+])
+def test_json_reader_invalid(content):
+    """
+    Invalid or truncated document should raise an error.
+    """
+    with pytest.raises(DjangoDeoviError):
+        list(JSONDumpReader(io.StringIO(content), chunk_size=4))
+
+
+def test_iter_dump(tests_settings):
+    """
+    Dump can be iterated either from a file path or a dictionnary.
+    """
+    dump_path = tests_settings.fixtures_path / "dump_directories.json"
+    payload = json.loads(dump_path.read_text())
+
+    assert list(iter_dump(dump_path)) == list(iter_dump(payload))
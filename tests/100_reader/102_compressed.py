@@ -0,0 +1,56 @@
+import bz2
+import gzip
+import io
+import json
+import lzma
+
+import pytest
+
+from django.core.management import call_command
+
+from django_deovi.loader import DumpLoader
+from django_deovi.models import MediaFile
+from django_deovi.reader import iter_dump, iter_payload, open_dump_file
+
+
+@pytest.mark.parametrize("compress,extension", [
+    (gzip.compress, ".gz"),
+    (bz2.compress, ".bz2"),
+    (lzma.compress, ".xz"),
+    (lambda content: content, ".json"),
+])
+def test_open_dump_file(tmp_path, tests_settings, compress, extension):
+    """
+    Dump file compression should be detected from its content, whatever its
+    extension is, and be decompressed on the fly.
+    """
+    content = (tests_settings.fixtures_path / "dump_directories.json").read_bytes()
+    payload = json.loads(content)
+
+    for name in ("dump" + extension, "dump"):
+        dump_path = tmp_path / name
+        dump_path.write_bytes(compress(content))
+
+        with open_dump_file(dump_path) as fp:
+            assert json.load(fp) == payload
+
+        assert list(iter_dump(dump_path, chunk_size=16)) == list(
+            iter_payload(payload)
+        )
+        assert DumpLoader().open_dump(dump_path) == payload
+
+
+def test_load_medias_compressed(db, tmp_path, tests_settings):
+    """
+    Command should load a compressed dump.
+    """
+    dump_path = tmp_path / "dump.json.gz"
+    dump_path.write_bytes(gzip.compress(
+        (tests_settings.fixtures_path / "dump_directories.json").read_bytes()
+    ))
+
+    call_command(
+        "load_medias", "donald", str(dump_path), stdout=io.StringIO()
+    )
+
+    assert MediaFile.objects.count() == 5
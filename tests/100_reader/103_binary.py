@@ -0,0 +1,143 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from django.core.management import call_command
+
+from django_deovi import reader
+from django_deovi.converter import get_converter
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.loader import DumpLoader
+from django_deovi.models import MediaFile
+from django_deovi.reader import (
+    CBOR_SELF_DESCRIBE, get_dump_format, iter_dump, iter_payload,
+)
+
+
+PACKAGES = {"msgpack": "msgpack", "cbor": "cbor2"}
+
+
+@pytest.mark.parametrize("dump_format", ["msgpack", "cbor"])
+def test_binary_dump(tmp_path, tests_settings, dump_format):
+    """
+    Binary dump should be detected, streamed and decoded to the same items than
+    the JSON one, even compressed, and be smaller.
+    """
+    pytest.importorskip(PACKAGES[dump_format])
+
+    source = tests_settings.fixtures_path / "dump_directories.json"
+    payload = json.loads(source.read_text())
+    dump_path = tmp_path / "dump.bin"
+
+    converted = get_converter(dump_format).convert(source, dump_path)
+
+    assert converted == len(payload["registry"])
+    assert dump_path.stat().st_size < source.stat().st_size
+    assert get_dump_format(dump_path) == dump_format
+    assert list(iter_dump(dump_path, chunk_size=16)) == list(iter_payload(payload))
+    assert DumpLoader().open_dump(dump_path) == payload
+
+    compressed_path = tmp_path / "dump.bin.gz"
+    compressed_path.write_bytes(gzip.compress(dump_path.read_bytes()))
+    assert get_dump_format(compressed_path) == dump_format
+    assert list(iter_dump(compressed_path)) == list(iter_payload(payload))
+
+    # Converted back to JSON
+    json_path = tmp_path / "dump.json"
+    get_converter("json").convert(dump_path, json_path)
+    assert get_dump_format(json_path) == "json"
+    assert json.loads(json_path.read_text()) == payload
+
+
+def test_cbor_indefinite_maps(tmp_path):
+    """
+    CBOR reader should support the self describe tag and maps with an indefinite
+    length.
+    """
+    cbor2 = pytest.importorskip("cbor2")
+
+    dump_path = tmp_path / "dump.cbor"
+    dump_path.write_bytes(
+        CBOR_SELF_DESCRIBE + b"\xbf" +
+        cbor2.dumps("registry") + b"\xbf" +
+        cbor2.dumps("foo") + cbor2.dumps({"path": "/foo"}) +
+        cbor2.dumps("bar") + cbor2.dumps({"path": "/bar"}) +
+        b"\xff" +
+        cbor2.dumps("device") + cbor2.dumps({"total": 1}) +
+        b"\xff"
+    )
+
+    assert get_dump_format(dump_path) == "cbor"
+    assert list(iter_dump(dump_path)) == [
+        ("registry", None, None),
+        ("registry", "foo", {"path": "/foo"}),
+        ("registry", "bar", {"path": "/bar"}),
+        ("device", None, {"total": 1}),
+    ]
+
+
+@pytest.mark.parametrize("dump_format,content,expected", [
+    ("msgpack", b"\x82\xa6device", "Invalid MessagePack dump: "),
+    ("msgpack", b"\x81\x01\x02", "Invalid MessagePack dump, object key must be "),
+    ("cbor", b"\xa1\x66device", "Invalid CBOR dump: "),
+    ("cbor", b"\xa1\x01\x02", "Invalid CBOR dump, object key must be "),
+])
+def test_binary_dump_invalid(tmp_path, dump_format, content, expected):
+    """
+    Invalid binary dump should raise a reader error.
+    """
+    pytest.importorskip(PACKAGES[dump_format])
+
+    dump_path = tmp_path / "dump.bin"
+    dump_path.write_bytes(content)
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        list(iter_dump(dump_path))
+
+    assert str(excinfo.value).startswith(expected)
+
+
+def test_binary_dump_missing_package(monkeypatch, tmp_path):
+    """
+    A binary dump should raise an error if its format package is not installed.
+    """
+    monkeypatch.setattr(reader, "msgpack", None)
+
+    dump_path = tmp_path / "dump.bin"
+    dump_path.write_bytes(b"\x80")
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        list(iter_dump(dump_path))
+
+    assert str(excinfo.value) == (
+        "Dump format 'msgpack' needs the optional package 'msgpack'."
+    )
+
+
+def test_convert_dump_command(db, tmp_path, tests_settings):
+    """
+    Command should convert a dump which can then be loaded.
+    """
+    pytest.importorskip("msgpack")
+
+    dump_path = tmp_path / "dump.msgpack"
+
+    out = io.StringIO()
+    call_command(
+        "convert_dump",
+        str(tests_settings.fixtures_path / "dump_directories.json"),
+        str(dump_path),
+        format="msgpack",
+        stdout=out,
+    )
+
+    assert out.getvalue().splitlines() == [
+        "Converting dump from 'json' to 'msgpack'",
+        "Converted 3 directories to: {}".format(dump_path),
+    ]
+
+    call_command("load_medias", "donald", str(dump_path), stdout=io.StringIO())
+
+    assert MediaFile.objects.count() == 5
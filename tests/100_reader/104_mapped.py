@@ -0,0 +1,164 @@
+import codecs
+import gzip
+import io
+import json
+
+import pytest
+
+from django_deovi import reader
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.reader import (
+    JSONDumpReader, iter_dump, iter_mapped_dump, iter_payload,
+)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 1, 3, 7])
+def test_mapped_reader(tmp_path, tests_settings, chunk_size):
+    """
+    Mapped reader should decode the same items than the streamed one, even with
+    delimiters, escaped quotes or multibyte characters inside strings and whatever
+    the size of decoded slices is.
+    """
+    payload = {
+        "device": {"total": 1000, "used": 250, "free": 750, "percentage": 25.0},
+        "registry": {
+            "foo": {"path": "/foo", "size": 4096, "children_files": []},
+            "bär ü": {
+                "path": "/bär ü",
+                "title": "\"quoted\" \\o/ {[}]",
+                "tags": [["a", "]"], {"b": "}"}],
+                "size": 12,
+            },
+            "empty": {},
+        },
+        "extra": 123456789,
+        "ümlaut": "ééé€€€",
+        "€" * 200: "long key with multibyte characters",
+        "flags": [True, False, None],
+        "name": "plop",
+        "nope": None,
+    }
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(
+        json.dumps(payload, indent=4, ensure_ascii=False), encoding="utf-8"
+    )
+
+    assert list(iter_mapped_dump(dump_path, chunk_size=chunk_size)) == list(
+        iter_payload(payload)
+    )
+
+    fixture_path = tests_settings.fixtures_path / "dump_directories.json"
+    assert list(iter_mapped_dump(fixture_path, chunk_size=chunk_size)) == list(
+        iter_payload(json.loads(fixture_path.read_text()))
+    )
+
+
+def test_iter_dump_mapped(monkeypatch, tmp_path, tests_settings):
+    """
+    Only uncompressed and non empty JSON dump files should be mapped, unless it
+    is disabled.
+    """
+    mapped = []
+
+    class SpyReader(reader.MappedJSONDumpReader):
+        def __init__(self, *args, **kwargs):
+            mapped.append(kwargs.get("chunk_size"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(reader, "MappedJSONDumpReader", SpyReader)
+
+    dump_path = tests_settings.fixtures_path / "dump_directories.json"
+    compressed_path = tmp_path / "dump.json.gz"
+    compressed_path.write_bytes(gzip.compress(dump_path.read_bytes()))
+    expected = list(iter_payload(json.loads(dump_path.read_text())))
+
+    assert list(iter_dump(compressed_path)) == expected
+    assert list(iter_dump(dump_path, mapped=False)) == expected
+    assert mapped == []
+
+    assert list(iter_dump(dump_path)) == expected
+    assert mapped == [None]
+
+    # Chunk size is given to the mapped reader
+    assert list(iter_dump(dump_path, chunk_size=16)) == expected
+    assert mapped == [None, 16]
+
+
+def test_mapped_reader_slices(monkeypatch, tmp_path):
+    """
+    Keys should be decoded from a small slice whatever the size of the previous
+    value is, and a large value should be decoded without decoding again the text
+    from its previous slices.
+    """
+    decoded = []
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")
+
+    class SpyDecoder:
+        def __init__(self):
+            self.decoder = utf8_decoder()
+
+        def decode(self, data, final=False):
+            decoded.append(len(data))
+            return self.decoder.decode(data, final=final)
+
+    monkeypatch.setattr(codecs, "getincrementaldecoder", lambda name: SpyDecoder)
+
+    payload = {
+        "registry": {
+            "big": {"path": "/big", "title": "é" * 100000},
+            "small": {"path": "/small"},
+        },
+    }
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+    assert list(iter_mapped_dump(dump_path)) == list(iter_payload(payload))
+
+    # Every byte has been decoded at most once, except the small overflow of the
+    # slices for keys and small values
+    assert sum(decoded) < dump_path.stat().st_size * 2
+    assert max(decoded) < dump_path.stat().st_size
+
+
+@pytest.mark.parametrize("content", [
+    "[]",
+    "{",
+    '{"registry": {"foo": {"path": "/foo"}',
+    '{"registry": {"foo" {"path": "/foo"}}}',
+    '{"registry": {"foo": {"path": }}}',
+    '{"registry": {"foo": {"path": "/foo]}}}',
+    '{"registry": {"foo": "bar',
+    '{"device": nope}',
+    '{1: "foo"}',
+])
+def test_mapped_reader_invalid(tmp_path, content):
+    """
+    Invalid or truncated document should raise the same error than from the
+    streamed reader when it holds the whole document in its buffer.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(content)
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        list(iter_mapped_dump(dump_path))
+
+    with pytest.raises(DjangoDeoviError) as expected:
+        list(JSONDumpReader(io.StringIO(content)))
+
+    assert str(excinfo.value) == str(expected.value)
+
+
+def test_mapped_reader_invalid_encoding(tmp_path):
+    """
+    A value with invalid UTF-8 bytes should raise an error, even when it is larger
+    than the first decoded slice.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_bytes(
+        b'{"registry": {"foo": "' + b"a" * 10000 + b'\xff"}}'
+    )
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        list(iter_mapped_dump(dump_path, chunk_size=16))
+
+    assert str(excinfo.value) == "Invalid JSON dump, invalid encoding."
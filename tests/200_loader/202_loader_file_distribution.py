@@ -1,6 +1,7 @@
 import logging
 
 from django_deovi import __pkgname__
+from django_deovi.dump import DumpedFileBatch
 from django_deovi.factories import (
     DirectoryFactory, DumpedFileFactory, MediaFileFactory
 )
@@ -52,8 +53,17 @@ def test_dumploader_file_distribution(db, caplog):
         dump_s01e04.to_dict(),
     ])
 
+    assert to_create.paths == ["/videos/BillyBoy_S01E04.mkv"]
     assert to_create == [dump_s01e04]
-    assert to_edit == [dump_s01e01, dump_s01e03]
+    assert to_create.columns == DumpedFileBatch.from_objects([dump_s01e04]).columns
+    assert [item.to_dict() for item in to_edit] == [
+        dump_s01e01.to_dict(),
+        dump_s01e03.to_dict(),
+    ]
+    assert [item._mediafile.path for item in to_edit] == [
+        "/videos/BillyBoy_S01E01.mkv",
+        "/videos/BillyBoy_S01E03.mkv",
+    ]
 
     assert caplog.record_tuples == [
         (
@@ -6,6 +6,7 @@ from django_deovi.models import MediaFile
 from django_deovi.factories import (
     DumpedFileFactory, MediaFileFactory
 )
+from django_deovi.index import MediaFileIndex
 from django_deovi.loader import DumpLoader
 
 
@@ -79,3 +80,109 @@ def test_dumploader_edit_files(db):
     fetched_s01e03 = MediaFile.objects.get(path=mediafile_s01e03.path)
     assert fetched_s01e03.filesize == 301
     assert fetched_s01e03.stored_date == tomorrow
+
+
+def test_dumploader_edit_files_unchanged(db, django_assert_num_queries):
+    """
+    Files without any change should not be edited at all.
+    """
+    yesterday = timezone.now() - datetime.timedelta(days=1)
+
+    loader = DumpLoader()
+
+    dump_s01e01 = DumpedFileFactory(path="/videos/BillyBoy_S01E01.mkv")
+    dump_s01e02 = DumpedFileFactory(path="/videos/BillyBoy_S01E02.mkv")
+
+    # Create MediaFile objects identical to dumped files
+    dump_s01e01._mediafile = MediaFileFactory(
+        **dump_s01e01.convert_to_orm_fields(),
+        loaded_date=yesterday,
+    )
+    dump_s01e02._mediafile = MediaFileFactory(
+        **dump_s01e02.convert_to_orm_fields(),
+        loaded_date=yesterday,
+    )
+
+    with django_assert_num_queries(0):
+        edited = loader.edit_files(
+            [dump_s01e01, dump_s01e02],
+            batch_date=timezone.now()
+        )
+
+    assert edited == 0
+    assert MediaFile.objects.filter(loaded_date=yesterday).count() == 2
+
+
+def test_dumploader_edit_files_grouped(db, django_assert_num_queries):
+    """
+    Changed files should be edited with a bulk edition for each group of changed
+    fields and only on these fields.
+    """
+    now = timezone.now()
+    tomorrow = now + datetime.timedelta(days=1)
+
+    loader = DumpLoader()
+
+    dumps = [
+        DumpedFileFactory(path="/videos/BillyBoy_S01E0{}.mkv".format(i))
+        for i in range(1, 6)
+    ]
+    for item in dumps:
+        item._mediafile = MediaFileFactory(**item.convert_to_orm_fields())
+
+    # Two files changed on size, one on size and date, one unchanged and the last
+    # one on date only
+    dumps[0].size = dumps[0].size + 1
+    dumps[1].size = dumps[1].size + 1
+    dumps[2].size = dumps[2].size + 1
+    dumps[2].mtime = tomorrow.isoformat()
+    dumps[4].mtime = tomorrow.isoformat()
+
+    # Change title from database which must not be overwritten
+    MediaFile.objects.filter(pk=dumps[0]._mediafile.pk).update(title="Foo")
+
+    with django_assert_num_queries(3):
+        edited = loader.edit_files(dumps, batch_date=now)
+
+    assert edited == 4
+    assert MediaFile.objects.filter(loaded_date=now).count() == 4
+
+    fetched = MediaFile.objects.get(pk=dumps[0]._mediafile.pk)
+    assert fetched.filesize == dumps[0].size
+    assert fetched.title == "Foo"
+
+    fetched = MediaFile.objects.get(pk=dumps[2]._mediafile.pk)
+    assert fetched.filesize == dumps[2].size
+    assert fetched.stored_date == tomorrow
+
+    fetched = MediaFile.objects.get(pk=dumps[4]._mediafile.pk)
+    assert fetched.stored_date == tomorrow
+
+
+def test_dumploader_edit_files_indexed(db):
+    """
+    Deferred fields from MediaFile built from index should be ignored from
+    comparison and edition.
+    """
+    now = timezone.now()
+
+    loader = DumpLoader()
+
+    dumped = DumpedFileFactory(path="/videos/BillyBoy_S01E01.mkv", extension="mp4")
+    mediafile = MediaFileFactory(**dumped.convert_to_orm_fields(), title="Foo")
+    MediaFile.objects.filter(pk=mediafile.pk).update(container="avi")
+
+    index = MediaFileIndex.from_device(mediafile.directory.device)
+    row = index.pop(mediafile.directory_id, mediafile.path)
+    dumped._mediafile = index.get_mediafile(mediafile.directory_id, dumped.path, row)
+
+    # Container from index is deferred so it is ignored
+    assert loader.edit_files([dumped], batch_date=now) == 0
+
+    dumped.size = dumped.size + 1
+    assert loader.edit_files([dumped], batch_date=now) == 1
+
+    fetched = MediaFile.objects.get(pk=mediafile.pk)
+    assert fetched.filesize == dumped.size
+    assert fetched.container == "avi"
+    assert fetched.title == "Foo"
@@ -1,14 +1,23 @@
+import json
 import logging
+import os
 from pathlib import Path
+from unittest import mock
 
 import pytest
+from freezegun import freeze_time
+
+from django.core.files import File
 
 from django_deovi import __pkgname__
+from django_deovi import loader as loader_module
+from django_deovi.covers import content_name
 from django_deovi.models import Directory, MediaFile
 from django_deovi.factories import (
-    DeviceFactory, DirectoryFactory, MediaFileFactory
+    DeviceFactory, DirectoryFactory, DumpedFileFactory, MediaFileFactory
 )
 from django_deovi.loader import DumpLoader
+from django_deovi.models.querysets import purge_covers
 from django_deovi.utils.tests import sum_file_object
 
 
@@ -73,6 +82,9 @@ def test_loader_get_attached_file(db, caplog, tests_settings):
     result = loader.get_attached_file(basepath / Path("blue.png"), basepath=basepath)
     assert result.name == basepath / Path("blue.png")
 
+    # File is only opened when read
+    assert result.closed is True
+
 
 def test_loader_process_directory_basic(db, caplog, tests_settings):
     """
@@ -117,7 +129,8 @@ def test_loader_process_directory_basic(db, caplog, tests_settings):
     payload = loader.open_dump(dump_path)
     device_stats = payload["device"]
     dump_content = payload["registry"]
-    loader.process_directory(device, dump_content, tests_settings.fixtures_path)
+    with freeze_time("2024-01-01 10:00:00"):
+        loader.process_directory(device, dump_content, tests_settings.fixtures_path)
 
     assert MediaFile.objects.count() == 6
 
@@ -216,7 +229,17 @@ def test_loader_process_directory_basic(db, caplog, tests_settings):
             __pkgname__,
             logging.DEBUG,
             "- Proceed to bulk edition"
-        )
+        ),
+        (
+            __pkgname__,
+            logging.DEBUG,
+            "- Chunk 1 committed with 3 directories in 0.000s"
+        ),
+        (
+            __pkgname__,
+            logging.INFO,
+            "💾 1 chunks committed"
+        ),
     ]
 
 
@@ -324,3 +347,477 @@ def test_loader_process_directory_checksum(db, caplog, tests_settings):
 
     with (covers_basepath / "yellow.png").open(mode="rb") as fp:
         assert sum_file_object(zouipworld_instance.cover.file) == sum_file_object(fp)
+
+
+def test_loader_process_directory_queries(db, django_assert_num_queries):
+    """
+    Existing directories should be fetched at once and new or changed ones should be
+    written with a single bulk operation.
+    """
+    device = DeviceFactory()
+
+    unchanged = DirectoryFactory(device=device, path="/videos/foo", checksum="001")
+    changed = DirectoryFactory(device=device, path="/videos/bar", checksum="010")
+
+    directories = {
+        "foo": {"path": "/videos/foo", "checksum": "001", "children_files": []},
+        "bar": {"path": "/videos/bar", "checksum": "011", "children_files": []},
+        "ping": {"path": "/videos/ping", "checksum": "100", "children_files": []},
+        "pong": {"path": "/videos/pong", "checksum": "101", "children_files": []},
+    }
+
+    loader = DumpLoader()
+
+    # Preload, bulk creation and bulk update, plus the chunk savepoint queries since
+    # test is already running in a transaction
+    with django_assert_num_queries(5):
+        loader.process_directory(device, directories, None)
+
+    assert sorted(
+        Directory.objects.filter(device=device).values_list("path", "checksum")
+    ) == [
+        ("/videos/bar", "011"),
+        ("/videos/foo", "001"),
+        ("/videos/ping", "100"),
+        ("/videos/pong", "101"),
+    ]
+    assert Directory.objects.get(pk=unchanged.pk).title == unchanged.title
+    assert Directory.objects.get(pk=changed.pk).title == ""
+
+    # Nothing changed anymore, only the preload query is needed since chunk without
+    # anything to write does not open a transaction
+    with django_assert_num_queries(1):
+        loader.process_directory(device, directories, None)
+
+    assert len(loader.skipped_directories) == 4
+
+
+def test_loader_process_directory_skip_unchanged(db, caplog,
+                                                 django_assert_num_queries):
+    """
+    Directories with an unchanged checksum should be skipped with their files
+    without any query and be counted.
+    """
+    caplog.set_level(logging.INFO, logger=__pkgname__)
+
+    device = DeviceFactory()
+
+    unchanged = DirectoryFactory(device=device, path="/videos/foo", checksum="001")
+    MediaFileFactory(directory=unchanged, path="/videos/foo/a.mkv", filesize=1)
+
+    directories = {
+        "foo": {
+            "path": "/videos/foo",
+            "checksum": "001",
+            "children_files": [
+                {"path": "/videos/foo/a.mkv", "size": 42},
+                {"path": "/videos/foo/b.mkv", "size": 42},
+            ],
+        },
+    }
+
+    loader = DumpLoader(file_index=True)
+
+    # Directories preload and files index
+    with django_assert_num_queries(2):
+        saved = loader.process_directory(device, directories, None)
+
+    assert saved == []
+    assert loader.skipped_directories == [unchanged.pk]
+    assert MediaFile.objects.filter(directory=unchanged).count() == 1
+    assert caplog.record_tuples[-1] == (
+        __pkgname__, logging.INFO, "⏩ 1 unchanged directories skipped"
+    )
+
+
+def test_loader_process_directory_chunks(db, django_assert_num_queries):
+    """
+    Directories should be processed by chunks with a bulk creation for each one.
+    """
+    device = DeviceFactory()
+
+    directories = {
+        "dir-{}".format(i): {
+            "path": "/videos/dir-{}".format(i),
+            "checksum": str(i),
+            "children_files": [],
+        }
+        for i in range(5)
+    }
+
+    loader = DumpLoader(chunk_limit=2)
+
+    # Preload and a bulk creation for each of the three chunks with their savepoint
+    # queries
+    with django_assert_num_queries(10):
+        loader.process_directory(device, directories, None)
+
+    assert Directory.objects.filter(device=device).count() == 5
+
+
+def test_loader_process_directory_purge_cover(db, tests_settings,
+                                              django_capture_on_commit_callbacks):
+    """
+    Previous cover file of an updated directory should be removed from storage once
+    chunk has been committed.
+    """
+    device = DeviceFactory()
+    directory = DirectoryFactory(device=device, path="/videos/foo", checksum="001")
+    previous_cover = Path(directory.cover.path)
+    assert previous_cover.exists() is True
+
+    loader = DumpLoader()
+    with django_capture_on_commit_callbacks(execute=True):
+        loader.process_directory(
+            device,
+            {
+                "foo": {
+                    "path": "/videos/foo",
+                    "checksum": "002",
+                    "cover": "covers/blue.png",
+                    "children_files": [],
+                },
+            },
+            tests_settings.fixtures_path,
+        )
+
+    directory = Directory.objects.get(pk=directory.pk)
+    assert previous_cover.exists() is False
+    assert Path(directory.cover.path).exists() is True
+
+
+def test_loader_process_directory_covers_file_limit(db, tests_settings):
+    """
+    Cover files of a chunk should be opened one at a time so a chunk may have more
+    covers than the limit of opened files.
+    """
+    resource = pytest.importorskip("resource")
+    if not Path("/proc/self/fd").exists():
+        pytest.skip("Opened files can not be counted")
+
+    device = DeviceFactory()
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    limit = len(os.listdir("/proc/self/fd")) + 64
+    if soft != resource.RLIM_INFINITY and soft < limit:
+        pytest.skip("Limit of opened files is already too low")
+
+    directories = {
+        "dir-{}".format(i): {
+            "path": "/videos/dir-{}".format(i),
+            "cover": "covers/blue.png",
+            "children_files": [],
+        }
+        for i in range(limit * 2)
+    }
+
+    loader = DumpLoader()
+    resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+    try:
+        loader.process_directory(device, directories, tests_settings.fixtures_path)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+    assert loader.failed_chunks == []
+    assert Directory.objects.filter(device=device).count() == limit * 2
+    assert Directory.objects.filter(device=device).values(
+        "cover"
+    ).distinct().count() == 1
+
+
+def test_loader_process_directory_chunk_rollback(db, caplog):
+    """
+    A broken directory should only rollback its own chunk.
+    """
+    caplog.set_level(logging.DEBUG, logger=__pkgname__)
+
+    device = DeviceFactory()
+
+    directories = {
+        "dir-{}".format(i): {
+            "path": "/videos/dir-{}".format(i),
+            "checksum": str(i),
+            "children_files": [],
+        }
+        for i in range(5)
+    }
+    # A file with missing fields will fail the third chunk
+    directories["dir-4"]["children_files"] = [{"path": "/videos/dir-4/foo.mkv"}]
+
+    loader = DumpLoader(chunk_limit=2)
+    loader.process_directory(device, directories, None)
+
+    assert loader.failed_chunks == [3]
+    assert sorted(
+        Directory.objects.filter(device=device).values_list("path", flat=True)
+    ) == [
+        "/videos/dir-0",
+        "/videos/dir-1",
+        "/videos/dir-2",
+        "/videos/dir-3",
+    ]
+
+    assert (
+        __pkgname__,
+        logging.INFO,
+        "💾 2 chunks committed, 1 rolled back"
+    ) in caplog.record_tuples
+
+
+def test_loader_process_directory_rollback_covers(db, settings, tmp_path,
+                                                  django_capture_on_commit_callbacks):
+    """
+    Cover files stored for a rolled back chunk should be removed once load has been
+    committed.
+    """
+    device = DeviceFactory()
+
+    # Unique cover content so it has never been stored before
+    (tmp_path / "cover.png").write_bytes(os.urandom(64))
+    with File((tmp_path / "cover.png").open("rb")) as fp:
+        stored_cover = Path(settings.MEDIA_ROOT) / content_name(fp)
+
+    loader = DumpLoader()
+    with django_capture_on_commit_callbacks(execute=True):
+        loader.process_directory(
+            device,
+            {
+                "foo": {
+                    "path": "/videos/foo",
+                    "cover": "cover.png",
+                    "children_files": [{"path": "/videos/foo/bar.mkv"}],
+                },
+            },
+            tmp_path,
+        )
+
+    assert loader.failed_chunks == [1]
+    assert Directory.objects.filter(device=device).count() == 0
+    assert stored_cover.exists() is False
+
+
+def test_loader_process_directory_deferred_purge(transactional_db, monkeypatch,
+                                                 settings, tmp_path):
+    """
+    Replaced covers and covers from rolled back chunks should be purged at once
+    when every chunk has been written, so a chunk can not purge a cover which is
+    reused by another chunk not committed yet.
+    """
+    device = DeviceFactory()
+    foo = DirectoryFactory(device=device, path="/videos/foo", checksum="001")
+    previous_cover = foo.cover.name
+
+    # A rolled back chunk and a committed one share the same new cover
+    (tmp_path / "cover.png").write_bytes(os.urandom(64))
+    with File((tmp_path / "cover.png").open("rb")) as fp:
+        shared_cover = content_name(fp)
+
+    calls = []
+
+    def spy_purge(model, names, **kwargs):
+        calls.append((
+            sorted(names),
+            sorted(
+                Directory.objects.filter(device=device).values_list("path", flat=True)
+            ),
+        ))
+        return purge_covers(model, names, **kwargs)
+
+    monkeypatch.setattr(loader_module, "purge_covers", spy_purge)
+
+    loader = DumpLoader(chunk_limit=1, workers=2)
+    loader.process_directory(
+        device,
+        {
+            "foo": {
+                "path": "/videos/foo",
+                "checksum": "002",
+                "cover": "cover.png",
+                "children_files": [],
+            },
+            "bar": {
+                "path": "/videos/bar",
+                "cover": "cover.png",
+                "children_files": [{"path": "/videos/bar/broken.mkv"}],
+            },
+        },
+        tmp_path,
+    )
+
+    assert loader.failed_chunks == [2]
+    assert calls == [
+        (sorted([previous_cover, shared_cover]), ["/videos/foo"]),
+    ]
+    assert Directory.objects.get(pk=foo.pk).cover.name == shared_cover
+    assert (Path(settings.MEDIA_ROOT) / shared_cover).exists() is True
+    assert (Path(settings.MEDIA_ROOT) / previous_cover).exists() is False
+
+
+def test_loader_process_directory_workers(transactional_db, tests_settings):
+    """
+    Chunks processed concurrently should give the same results than sequentially,
+    in the same order.
+    """
+    device = DeviceFactory()
+    billyserie_dir = DirectoryFactory(device=device, path="/videos/series/BillyBoy")
+    BillyBoy_S01E01 = MediaFileFactory(
+        path="/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+        directory=billyserie_dir,
+        filesize=100,
+    )
+
+    directories = json.loads(
+        (tests_settings.fixtures_path / "dump_directories.json").read_text()
+    )["registry"]
+    for i in range(10):
+        directories["extra-{}".format(i)] = {
+            "path": "/videos/extra-{}".format(i),
+            "checksum": str(i),
+            "cover": "covers/blue.png",
+            "children_files": [
+                DumpedFileFactory(
+                    path="/videos/extra-{}/foo-{}.mkv".format(i, n)
+                ).to_dict()
+                for n in range(3)
+            ],
+        }
+
+    loader = DumpLoader(chunk_limit=2, workers=3)
+    saved = loader.process_directory(
+        device,
+        directories,
+        tests_settings.fixtures_path,
+    )
+
+    assert loader.failed_chunks == []
+    assert [directory.path for directory, created in saved] == [
+        item["path"] for item in directories.values()
+    ]
+    assert Directory.objects.filter(device=device).count() == 13
+    assert MediaFile.objects.count() == 35
+    assert MediaFile.objects.get(pk=BillyBoy_S01E01.pk).filesize == 101
+    assert Directory.objects.filter(device=device, cover="").count() == 3
+
+
+def test_loader_process_directory_shared_covers(db, tests_settings,
+                                                django_capture_on_commit_callbacks):
+    """
+    Identical covers should be stored once and shared, an already stored cover
+    should not be copied again and a replaced cover should only be removed when no
+    other directory use it.
+    """
+    devices = [DeviceFactory(), DeviceFactory()]
+
+    def build_dump(checksum, cover):
+        return {
+            name: {
+                "path": "/videos/{}".format(name),
+                "checksum": checksum,
+                "cover": cover,
+                "children_files": [],
+            }
+            for name in ("foo", "bar")
+        }
+
+    loader = DumpLoader()
+    for device in devices:
+        loader.process_directory(
+            device, build_dump("1", "covers/blue.png"), tests_settings.fixtures_path
+        )
+
+    names = set(Directory.objects.values_list("cover", flat=True))
+    assert len(names) == 1
+    shared = Path(Directory.objects.first().cover.path)
+    assert shared.name.startswith(shared.parent.name)
+
+    # Changed directories with the same cover does not store it again
+    storage = Directory._meta.get_field("cover").storage
+    with mock.patch.object(storage, "save") as mocked:
+        loader.process_directory(
+            devices[0],
+            build_dump("2", "covers/blue.png"),
+            tests_settings.fixtures_path,
+        )
+    assert mocked.called is False
+    assert set(Directory.objects.values_list("cover", flat=True)) == names
+
+    # Replaced cover is kept since the other device still use it
+    with django_capture_on_commit_callbacks(execute=True):
+        loader.process_directory(
+            devices[0], build_dump("3", "covers/red.png"), tests_settings.fixtures_path
+        )
+    assert shared.exists() is True
+
+    # Replaced cover is removed once not used anymore
+    with django_capture_on_commit_callbacks(execute=True):
+        loader.process_directory(
+            devices[1], build_dump("3", "covers/red.png"), tests_settings.fixtures_path
+        )
+    assert shared.exists() is False
+    assert Directory.objects.values("cover").distinct().count() == 1
+
+
+def test_loader_process_directory_workers_checkpoint(transactional_db,
+                                                     monkeypatch):
+    """
+    An error after a chunk has been committed should mark it as failed instead of
+    stopping its worker.
+    """
+    device = DeviceFactory()
+
+    def broken_checkpoint(*args, **kwargs):
+        raise RuntimeError("Checkpoint is broken")
+
+    loader = DumpLoader(chunk_limit=1, workers=2)
+    loader.checkpoint_checksum = "001"
+    monkeypatch.setattr(loader, "record_checkpoint", broken_checkpoint)
+
+    loader.process_directory(
+        device,
+        {
+            "dir-{}".format(i): {
+                "path": "/videos/dir-{}".format(i),
+                "children_files": [],
+            }
+            for i in range(10)
+        },
+        None,
+    )
+
+    assert sorted(loader.failed_chunks) == list(range(1, 11))
+    assert loader.report.counters["directories_created"] == 0
+    assert Directory.objects.filter(device=device).count() == 10
+
+
+@pytest.mark.parametrize("broken", ["commit_chunk", "count_queries"])
+def test_loader_process_directory_workers_error(transactional_db, monkeypatch,
+                                                broken):
+    """
+    An unexpected error in workers should be raised once every workers have
+    finished, without blocking the chunks producer even if every workers have
+    stopped.
+    """
+    device = DeviceFactory()
+
+    def broken_method(*args, **kwargs):
+        raise RuntimeError("Worker is broken")
+
+    loader = DumpLoader(chunk_limit=1, workers=2)
+    target = loader if broken == "commit_chunk" else loader.report
+    monkeypatch.setattr(target, broken, broken_method)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        loader.process_directory(
+            device,
+            {
+                "dir-{}".format(i): {
+                    "path": "/videos/dir-{}".format(i),
+                    "children_files": [],
+                }
+                for i in range(10)
+            },
+            None,
+        )
+
+    assert str(excinfo.value) == "Worker is broken"
+    if broken == "commit_chunk":
+        assert sorted(loader.failed_chunks) == list(range(1, 11))
@@ -0,0 +1,140 @@
+import logging
+
+from django_deovi import __pkgname__
+from django_deovi.factories import (
+    DeviceFactory, DirectoryFactory, DumpedFileFactory, MediaFileFactory
+)
+from django_deovi.index import (
+    IndexedDirectory, IndexedFile, MediaFileIndex, get_directory, index_directories
+)
+from django_deovi.loader import DumpLoader
+from django_deovi.models import Directory, MediaFile
+
+
+def test_index_directories(db, django_assert_num_queries):
+    """
+    Directories index should contain every device directories from a single query
+    and allow to build Directory objects to update.
+    """
+    device = DeviceFactory()
+    foo = DirectoryFactory(device=device, path="/videos/foo", checksum="001")
+    DirectoryFactory(path="/videos/bar")
+
+    with django_assert_num_queries(1):
+        index = index_directories(device)
+
+    assert index == {
+        foo.path: IndexedDirectory(foo.pk, "001", foo.cover.name),
+    }
+
+    directory = get_directory(device, foo.path, index[foo.path])
+    assert directory.get_deferred_fields() == {
+        "title", "pending_cover", "payload", "created_date", "last_update",
+        "released",
+    }
+
+    directory.title = "Edited"
+    Directory.objects.bulk_update([directory], ["title"])
+    assert Directory.objects.get(pk=foo.pk).title == "Edited"
+
+
+def test_mediafile_index_from_device(db, django_assert_num_queries):
+    """
+    Index should contain every device files and only them from a single query.
+    """
+    device = DeviceFactory()
+    goods = DirectoryFactory(device=device, path="/videos/goods")
+    bads = DirectoryFactory(device=device, path="/videos/bads")
+    other = DirectoryFactory(path="/videos/goods")
+
+    picsou = MediaFileFactory(directory=goods, path="/videos/goods/picsou.mkv")
+    donald = MediaFileFactory(directory=goods, path="/videos/goods/donald.mkv")
+    gripsou = MediaFileFactory(directory=bads, path="/videos/bads/gripsou.mkv")
+    MediaFileFactory(directory=other, path="/videos/goods/picsou.mkv")
+
+    with django_assert_num_queries(1):
+        index = MediaFileIndex.from_device(device)
+
+    assert len(index) == 3
+    assert index.directories == {
+        goods.pk: {
+            picsou.path: IndexedFile(picsou.pk, picsou.filesize, picsou.stored_date),
+            donald.path: IndexedFile(donald.pk, donald.filesize, donald.stored_date),
+        },
+        bads.pk: {
+            gripsou.path: IndexedFile(
+                gripsou.pk, gripsou.filesize, gripsou.stored_date
+            ),
+        },
+    }
+    assert (goods.pk, picsou.path) in index
+    assert (other.pk, picsou.path) not in index
+
+    assert index.pop(goods.pk, picsou.path).pk == picsou.pk
+    assert index.pop(goods.pk, picsou.path) is None
+    assert index.pop(other.pk, picsou.path) is None
+    assert len(index) == 2
+
+
+def test_dumploader_file_distribution_index(db, caplog, django_assert_num_queries):
+    """
+    File distribution should find existing files from index without any query and
+    consume them from index.
+    """
+    caplog.set_level(logging.DEBUG, logger=__pkgname__)
+
+    directory = DirectoryFactory(path="/videos")
+    s01e01 = MediaFileFactory(directory=directory, path="/videos/BillyBoy_S01E01.mkv")
+    MediaFileFactory(directory=directory, path="/videos/BillyBoy_S01E02.mkv")
+
+    index = MediaFileIndex.from_device(directory.device)
+
+    dump_s01e01 = DumpedFileFactory(path="/videos/BillyBoy_S01E01.mkv")
+    dump_s01e03 = DumpedFileFactory(path="/videos/BillyBoy_S01E03.mkv")
+
+    loader = DumpLoader()
+
+    with django_assert_num_queries(0):
+        to_create, to_edit = loader.file_distribution(directory, [
+            dump_s01e01.to_dict(),
+            dump_s01e03.to_dict(),
+        ], index=index)
+
+    assert to_create.paths == ["/videos/BillyBoy_S01E03.mkv"]
+    assert to_create == [dump_s01e03]
+    assert [item.to_dict() for item in to_edit] == [dump_s01e01.to_dict()]
+    assert to_edit[0]._mediafile.pk == s01e01.pk
+
+    # Only the file missing from dump is left in index
+    assert list(index.directories[directory.pk].keys()) == [
+        "/videos/BillyBoy_S01E02.mkv"
+    ]
+
+
+def test_dumploader_process_directory_file_index(db, tests_settings):
+    """
+    Loader with file index enabled should give the same results than without.
+    """
+    device = DeviceFactory()
+    billyserie_dir = DirectoryFactory(device=device, path="/videos/series/BillyBoy")
+    theatre_dir = DirectoryFactory(device=device, path="/videos/theatre")
+
+    BillyBoy_S01E01 = MediaFileFactory(
+        path="/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+        directory=billyserie_dir,
+        filesize=100,
+    )
+    Coucou_1982 = MediaFileFactory(
+        path="/videos/theatre/Coucou_1982.avi",
+        directory=theatre_dir,
+        filesize=1982,
+    )
+
+    loader = DumpLoader(file_index=True)
+    payload = loader.open_dump(tests_settings.fixtures_path / "dump_directories.json")
+    loader.process_directory(device, payload["registry"], tests_settings.fixtures_path)
+
+    assert MediaFile.objects.count() == 5
+    assert MediaFile.objects.get(pk=BillyBoy_S01E01.pk).filesize == 101
+    assert MediaFile.objects.get(pk=Coucou_1982.pk).filesize == 2982
+    assert MediaFile.objects.get(pk=Coucou_1982.pk).filename == "Coucou_1982.avi"
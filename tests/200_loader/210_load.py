@@ -1,17 +1,23 @@
+import functools
 import logging
 import json
+import os
+from unittest import mock
 
 import pytest
+from freezegun import freeze_time
 
 from django.core.management.base import CommandError
 
 from django_deovi.exceptions import DjangoDeoviError
 from django_deovi import __pkgname__
-from django_deovi.models import MediaFile
+from django_deovi import loader as loader_module
+from django_deovi.models import Device, Directory, MediaFile
 from django_deovi.factories import (
     DeviceFactory, DirectoryFactory, MediaFileFactory
 )
 from django_deovi.loader import DumpLoader
+from django_deovi.reader import iter_dump
 
 
 def test_dumploader_load(db, caplog, tests_settings):
@@ -49,7 +55,8 @@ def test_dumploader_load(db, caplog, tests_settings):
 
     # Proceed to loading
     loader = DumpLoader()
-    loader.load(device.slug, dump_content)
+    with freeze_time("2024-01-01 10:00:00"):
+        loader.load(device.slug, dump_content)
 
     assert MediaFile.objects.count() == 3
 
@@ -108,6 +115,16 @@ def test_dumploader_load(db, caplog, tests_settings):
             logging.DEBUG,
             "- Proceed to bulk edition"
         ),
+        (
+            __pkgname__,
+            logging.DEBUG,
+            "- Chunk 1 committed with 1 directories in 0.000s"
+        ),
+        (
+            __pkgname__,
+            logging.INFO,
+            "💾 1 chunks committed"
+        ),
     ]
 
 
@@ -151,6 +168,11 @@ def test_dumploader_load_new_device_no_dirs(db, caplog, tests_settings):
             logging.INFO,
             "🏷️Using cover basepath: {}".format(tests_settings.fixtures_path)
         ),
+        (
+            __pkgname__,
+            logging.INFO,
+            "💾 0 chunks committed"
+        ),
     ]
 
 
@@ -165,3 +187,384 @@ def test_dumploader_load_wrong_slug(db, caplog, tests_settings):
 
     with pytest.raises((DjangoDeoviError, CommandError)):
         loader.load("L'éléctricté, yo.", {})
+
+
+@pytest.mark.parametrize("mapped", [True, False])
+def test_dumploader_load_from_file(db, monkeypatch, tests_settings, mapped):
+    """
+    Loader should stream dump file and apply device stats and directories, either
+    with a mapped or a streamed reader.
+    """
+    monkeypatch.setattr(
+        loader_module, "iter_dump", functools.partial(iter_dump, mapped=mapped)
+    )
+    dump_path = tests_settings.fixtures_path / "dump_directories.json"
+
+    loader = DumpLoader(read_size=16)
+    loader.load("donald", dump_path, covers_basepath=tests_settings.fixtures_path)
+
+    device = Device.objects.get(slug="donald")
+    assert device.disk_total == 1000
+    assert device.disk_used == 250
+    assert device.disk_free == 750
+
+    assert Directory.objects.filter(device=device).count() == 3
+    assert MediaFile.objects.count() == 5
+
+
+def test_dumploader_load_invalid_structure(db, caplog, tests_settings):
+    """
+    Dump without the expected sections should raise an error.
+    """
+    loader = DumpLoader()
+
+    with pytest.raises(DjangoDeoviError):
+        loader.load("donald", {"registry": {}})
+
+
+@pytest.mark.parametrize("payload", [
+    {
+        "registry": {
+            "foo": {"path": "/videos/foo", "children_files": []},
+        },
+    },
+    {
+        "registry": {
+            "foo": {"path": "/videos/foo", "children_files": []},
+        },
+        "device": {"total": 1000, "used": 250, "free": 750},
+    },
+])
+def test_dumploader_load_invalid_structure_nothing_written(db, tmp_path, payload):
+    """
+    Dump with registry directories before any device section should be rejected
+    before writing anything.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(json.dumps(payload))
+
+    for dump in (payload, dump_path):
+        with pytest.raises(DjangoDeoviError) as excinfo:
+            DumpLoader().load("donald", dump)
+
+        assert str(excinfo.value) == (
+            "The JSON dump structure does not fit to Deovi>=0.7.0, it must have "
+            "a 'device' and 'registry'."
+        )
+        assert Directory.objects.count() == 0
+
+    with pytest.raises(DjangoDeoviError):
+        DumpLoader().plan("donald", payload)
+
+
+def test_dumploader_load_sync(db, caplog, tests_settings):
+    """
+    With sync enabled, device directories and files missing from dump should be
+    deleted and the other ones should be left untouched.
+    """
+    caplog.set_level(logging.DEBUG, logger=__pkgname__)
+
+    dump_path = tests_settings.fixtures_path / "dump_directories.json"
+    payload = json.loads(dump_path.read_text())
+    # Theatre is unchanged so its files are not processed but they must be kept
+    payload["registry"]["theatre"]["checksum"] = "010"
+
+    device = DeviceFactory(slug="donald")
+    billyboy = DirectoryFactory(
+        device=device,
+        path="/videos/series/BillyBoy",
+    )
+    theatre = DirectoryFactory(
+        device=device,
+        path="/videos/theatre",
+        checksum="010",
+    )
+    removed = DirectoryFactory(
+        device=device,
+        path="/videos/removed",
+    )
+    # Same path for another device must not be pruned
+    other = DirectoryFactory(path="/videos/removed")
+
+    S01E01 = MediaFileFactory(
+        directory=billyboy,
+        path="/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+    )
+    MediaFileFactory(directory=billyboy, path="/videos/series/BillyBoy/gone.mkv")
+    coucou = MediaFileFactory(directory=theatre, path="/videos/theatre/foo.avi")
+    MediaFileFactory(directory=removed, path="/videos/removed/foo.mkv")
+    MediaFileFactory(directory=removed, path="/videos/removed/bar.mkv")
+    kept = MediaFileFactory(directory=other, path="/videos/removed/foo.mkv")
+
+    loader = DumpLoader()
+    report = loader.load(
+        device.slug,
+        payload,
+        covers_basepath=tests_settings.fixtures_path,
+        sync=True,
+    )
+
+    assert report.pruned == {
+        "directories": ["/videos/removed"],
+        "files": 1,
+    }
+    assert report.counters["directories_deleted"] == 1
+    assert report.counters["files_deleted"] == 1
+
+    assert sorted(
+        Directory.objects.filter(device=device).values_list("path", flat=True)
+    ) == [
+        "/videos/series/BillyBoy",
+        "/videos/series/ZouipWorld",
+        "/videos/theatre",
+    ]
+    assert Directory.objects.filter(pk=other.pk).exists() is True
+
+    assert sorted(
+        MediaFile.objects.filter(
+            directory__device=device
+        ).values_list("path", flat=True)
+    ) == [
+        "/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+        "/videos/series/BillyBoy/BillyBoy_S01E02.mkv",
+        "/videos/series/BillyBoy/BillyBoy_S01E03.mkv",
+        "/videos/series/ZouipWorld/ZouipWorld_S01E09.mkv",
+        coucou.path,
+    ]
+    assert MediaFile.objects.filter(pk=S01E01.pk).exists() is True
+    assert MediaFile.objects.filter(pk=kept.pk).exists() is True
+
+    assert (
+        __pkgname__,
+        logging.INFO,
+        "🧹 Pruned 1 directories and 1 files"
+    ) in caplog.record_tuples
+
+
+def test_dumploader_load_no_sync(db, tests_settings):
+    """
+    Without sync, nothing is deleted.
+    """
+    device = DeviceFactory(slug="donald")
+    removed = DirectoryFactory(device=device, path="/videos/removed")
+    MediaFileFactory(directory=removed, path="/videos/removed/foo.mkv")
+
+    loader = DumpLoader()
+    report = loader.load(
+        device.slug,
+        tests_settings.fixtures_path / "dump_directories.json",
+        covers_basepath=tests_settings.fixtures_path,
+    )
+
+    assert report.pruned is None
+    assert Directory.objects.filter(device=device).count() == 4
+    assert MediaFile.objects.count() == 6
+
+
+def test_dumploader_load_sync_failed_chunk(db, tests_settings):
+    """
+    Pruning should be skipped if any chunk has been rolled back.
+    """
+    device = DeviceFactory(slug="donald")
+    removed = DirectoryFactory(device=device, path="/videos/removed")
+
+    loader = DumpLoader()
+    report = loader.load(
+        device.slug,
+        {
+            "device": {"total": 1000, "used": 250, "free": 750},
+            "registry": {
+                "foo": {
+                    "path": "/videos/foo",
+                    "children_files": [{"path": "/videos/foo/bar.mkv"}],
+                },
+            },
+        },
+        sync=True,
+    )
+
+    assert report.pruned is None
+    assert report.failed_chunks == [1]
+    assert loader.failed_chunks == [1]
+    assert Directory.objects.filter(pk=removed.pk).exists() is True
+
+
+def test_dumploader_load_fingerprint(db, caplog, tmp_path, tests_settings,
+                                     django_assert_num_queries):
+    """
+    Dump file fingerprint should be stored after loading and an unchanged dump
+    should not be loaded again unless forced.
+    """
+    caplog.set_level(logging.INFO, logger=__pkgname__)
+
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_bytes(
+        (tests_settings.fixtures_path / "dump_directories.json").read_bytes()
+    )
+
+    loader = DumpLoader()
+    loader.load("donald", dump_path, covers_basepath=tests_settings.fixtures_path)
+
+    device = Device.objects.get(slug="donald")
+    assert len(device.dump_checksum) == 128
+    assert device.dump_size == dump_path.stat().st_size
+    assert device.dump_mtime is not None
+    last_update = device.last_update
+
+    # Unchanged dump is not loaded again, only the device is fetched
+    caplog.clear()
+    with django_assert_num_queries(1):
+        assert loader.load("donald", dump_path).unchanged_dump is True
+
+    assert caplog.record_tuples[-1] == (
+        __pkgname__, logging.INFO, "⏭️ Dump has not changed since the last load"
+    )
+
+    # Only the modification date changed, it is stored without device update
+    os.utime(dump_path, (1000000000, 1000000000))
+    caplog.clear()
+    loader.load("donald", dump_path)
+
+    device = Device.objects.get(slug="donald")
+    assert device.dump_mtime.timestamp() == 1000000000
+    assert device.last_update == last_update
+    assert caplog.record_tuples[-1][2] == "⏭️ Dump has not changed since the last load"
+
+    # Forced load process the dump
+    caplog.clear()
+    loader.load("donald", dump_path, force=True)
+    assert "⏭️ Dump has not changed since the last load" not in caplog.text
+
+    # Changed dump with the same size is hashed and loaded
+    content = dump_path.read_text().replace('"free": 750', '"free": 751')
+    dump_path.write_text(content)
+    previous_checksum = device.dump_checksum
+    loader.load("donald", dump_path)
+
+    device = Device.objects.get(slug="donald")
+    assert device.disk_free == 751
+    assert device.dump_checksum != previous_checksum
+
+
+def test_dumploader_load_fingerprint_failed_chunk(db, tmp_path, tests_settings):
+    """
+    Dump fingerprint should not be stored when a chunk has been rolled back so the
+    dump is loaded again on the next run.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(json.dumps({
+        "device": {"total": 1000, "used": 250, "free": 750},
+        "registry": {
+            "foo": {
+                "path": "/videos/foo",
+                "children_files": [{"path": "/videos/foo/bar.mkv"}],
+            },
+        },
+    }))
+
+    loader = DumpLoader()
+    loader.load("donald", dump_path)
+
+    assert loader.failed_chunks == [1]
+    assert Device.objects.get(slug="donald").dump_checksum == ""
+
+
+def test_dumploader_load_resume(db, caplog, tmp_path, tests_settings):
+    """
+    An interrupted load should record a checkpoint after each committed chunk and a
+    resumed load should continue after it, still pruning files which are not in
+    the dump anymore.
+    """
+    caplog.set_level(logging.INFO, logger=__pkgname__)
+
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_bytes(
+        (tests_settings.fixtures_path / "dump_directories.json").read_bytes()
+    )
+
+    device = DeviceFactory(slug="donald")
+    zouip = DirectoryFactory(device=device, path="/videos/series/ZouipWorld")
+    stale = MediaFileFactory(directory=zouip, path="/videos/series/ZouipWorld/gone.mkv")
+
+    loader = DumpLoader(chunk_limit=1)
+    commit_chunk = loader.commit_chunk
+
+    def interrupted(position, *args, **kwargs):
+        if position == 2:
+            raise KeyboardInterrupt
+        return commit_chunk(position, *args, **kwargs)
+
+    with mock.patch.object(loader, "commit_chunk", side_effect=interrupted):
+        with pytest.raises(KeyboardInterrupt):
+            loader.load("donald", dump_path, sync=True)
+
+    device = Device.objects.get(slug="donald")
+    assert device.checkpoint_key == "series/ZouipWorld"
+    assert len(device.checkpoint_checksum) == 128
+    assert device.dump_checksum == ""
+    assert Directory.objects.filter(device=device).count() == 1
+
+    caplog.clear()
+    report = DumpLoader(chunk_limit=1).load(
+        "donald", dump_path, sync=True, resume=True
+    )
+
+    assert (
+        __pkgname__, logging.INFO, "⏩ Resumed after 1 directories already loaded"
+    ) in caplog.record_tuples
+    assert report.counters["directories_created"] == 2
+    assert report.counters["directories_updated"] == 0
+    assert report.pruned == {"directories": [], "files": 1}
+    assert Directory.objects.filter(device=device).count() == 3
+    assert MediaFile.objects.filter(pk=stale.pk).exists() is False
+
+    # Finished load clears checkpoint
+    device = Device.objects.get(slug="donald")
+    assert device.checkpoint_key == ""
+    assert device.checkpoint_checksum == ""
+    assert device.dump_checksum != ""
+
+
+def test_dumploader_load_resume_mismatch(db, caplog, tmp_path, tests_settings):
+    """
+    A checkpoint from another dump should be ignored.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_bytes(
+        (tests_settings.fixtures_path / "dump_directories.json").read_bytes()
+    )
+
+    DeviceFactory(
+        slug="donald", checkpoint_checksum="nope", checkpoint_key="series/ZouipWorld"
+    )
+
+    report = DumpLoader().load("donald", dump_path, resume=True)
+
+    assert (
+        __pkgname__,
+        logging.WARNING,
+        "Checkpoint does not belong to this dump, loading from start",
+    ) in caplog.record_tuples
+    assert report.counters["directories_created"] == 3
+
+
+def test_dumploader_record_checkpoint(db):
+    """
+    Checkpoint should only move forward to the last key of contiguous committed
+    chunks.
+    """
+    device = DeviceFactory()
+
+    loader = DumpLoader()
+    loader.start_checkpoints("abc")
+
+    loader.record_checkpoint(device, 3, "c")
+    assert Device.objects.get(pk=device.pk).checkpoint_key == ""
+
+    loader.record_checkpoint(device, 1, "a")
+    assert Device.objects.get(pk=device.pk).checkpoint_key == "a"
+
+    loader.record_checkpoint(device, 2, "b")
+    device = Device.objects.get(pk=device.pk)
+    assert device.checkpoint_key == "c"
+    assert device.checkpoint_checksum == "abc"
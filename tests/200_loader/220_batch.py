@@ -0,0 +1,191 @@
+import io
+import json
+
+import pytest
+from freezegun import freeze_time
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django_deovi.batch import ManifestEntry, load_manifest, read_manifest
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.models import Device, Directory, MediaFile
+
+
+def build_dump(path, name, files=1):
+    """
+    Write a basic dump with a single directory and some files.
+    """
+    dirpath = "/videos/{}".format(name)
+    payload = {
+        "device": {"total": 1000, "used": 250, "free": 750},
+        "registry": {
+            name: {
+                "path": dirpath,
+                "name": name,
+                "absolute_dir": "/videos",
+                "relative_dir": name,
+                "size": 4096,
+                "mtime": "2022-08-20T23:26:49",
+                "children_files": [
+                    {
+                        "path": "{}/file_{}.mkv".format(dirpath, i),
+                        "name": "file_{}.mkv".format(i),
+                        "absolute_dir": dirpath,
+                        "relative_dir": name,
+                        "directory": name,
+                        "extension": "mkv",
+                        "container": "Matroska",
+                        "size": 42,
+                        "mtime": "2022-07-31T15:44:33",
+                    }
+                    for i in range(files)
+                ],
+            },
+        },
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload))
+
+    return path
+
+
+def test_read_manifest(tmp_path):
+    """
+    Manifest entries can be objects or lists and their relative paths are resolved
+    from manifest directory.
+    """
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([
+        {"device": "foo", "dump": "foo.json"},
+        ["bar", "bar/dump.json", "/covers/bar"],
+    ]))
+
+    assert read_manifest(manifest) == [
+        ManifestEntry("foo", tmp_path / "foo.json", tmp_path),
+        ManifestEntry("bar", tmp_path / "bar/dump.json", tmp_path / "/covers/bar"),
+    ]
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("nope", "Unable to read manifest"),
+    ('{"device": "foo"}', "Manifest must be a list of entries."),
+    ('[{"device": "foo"}]', "Manifest entry 0 must define"),
+    ('[["foo"]]', "Manifest entry 0 must define"),
+    (
+        '[["foo", "a.json"], ["foo", "b.json"]]',
+        "Manifest has many entries for the same device: foo",
+    ),
+])
+def test_read_manifest_invalid(tmp_path, content, expected):
+    """
+    Invalid manifest should raise an error.
+    """
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(content)
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        read_manifest(manifest)
+
+    assert str(excinfo.value).startswith(expected)
+
+
+def test_load_manifest_isolated_failures(db, tmp_path):
+    """
+    A failure on a device should not stop loading other devices.
+    """
+    entries = [
+        ManifestEntry("foo", build_dump(tmp_path / "foo.json", "foo", 2), tmp_path),
+        ManifestEntry("bar", tmp_path / "missing.json", tmp_path),
+        ManifestEntry("ping", build_dump(tmp_path / "ping.json", "ping"), tmp_path),
+    ]
+
+    results = load_manifest(entries, processes=1, options={"chunk_limit": 10})
+
+    assert [(item.entry.device, item.error) for item in results] == [
+        ("foo", None),
+        (
+            "bar",
+            "Given dump path does not exists: {}".format(tmp_path / "missing.json"),
+        ),
+        ("ping", None),
+    ]
+
+    assert sorted(Device.objects.values_list("slug", flat=True)) == ["foo", "ping"]
+    assert Directory.objects.count() == 2
+    assert MediaFile.objects.count() == 3
+
+
+def test_load_manifest_command(db, tmp_path):
+    """
+    Command should output a summary of every loads and fail if any load failed.
+    """
+    build_dump(tmp_path / "foo.json", "foo")
+    build_dump(tmp_path / "bar" / "dump.json", "bar")
+    (tmp_path / "broken.json").write_text("{")
+
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([
+        ["foo", "foo.json"],
+        ["bar", "bar/dump.json"],
+        ["ping", "broken.json"],
+    ]))
+
+    out = io.StringIO()
+
+    with pytest.raises(CommandError) as excinfo:
+        with freeze_time("2024-01-01 10:00:00"):
+            call_command(
+                "load_manifest", str(manifest), processes=1, sync=True,
+                stdout=out,
+            )
+
+    assert str(excinfo.value) == "Failed to load 1 device(s): ping"
+
+    assert out.getvalue().splitlines()[1:] == [
+        "=== Summary ===",
+        "✔ foo loaded in 0.000s (pruned 0 directories and 0 files)",
+        "✔ bar loaded in 0.000s (pruned 0 directories and 0 files)",
+        "✖ ping failed after 0.000s: Invalid JSON dump: Expecting value: line 1 "
+        "column 2 (char 1)",
+        "Loaded 2 of 3 devices in 0.000s",
+    ]
+
+    assert Directory.objects.filter(device__slug="bar").count() == 1
+
+
+def test_load_manifest_failed_chunks(db, tmp_path):
+    """
+    A device load with rolled back chunks should be a failure.
+    """
+    build_dump(tmp_path / "foo.json", "foo")
+    (tmp_path / "broken.json").write_text(json.dumps({
+        "device": {"total": 1000, "used": 250, "free": 750},
+        "registry": {
+            "bar": {
+                "path": "/videos/bar",
+                "children_files": [{"path": "/videos/bar/file.mkv"}],
+            },
+        },
+    }))
+
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps([
+        ["foo", "foo.json"],
+        ["bar", "broken.json"],
+    ]))
+
+    out = io.StringIO()
+
+    with pytest.raises(CommandError) as excinfo:
+        with freeze_time("2024-01-01 10:00:00"):
+            call_command("load_manifest", str(manifest), processes=1, stdout=out)
+
+    assert str(excinfo.value) == "Failed to load 1 device(s): bar"
+
+    assert out.getvalue().splitlines()[1:] == [
+        "=== Summary ===",
+        "✔ foo loaded in 0.000s",
+        "✖ bar failed after 0.000s: Failed to load 1 chunk(s): 1",
+        "Loaded 1 of 2 devices in 0.000s",
+    ]
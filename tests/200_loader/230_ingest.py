@@ -0,0 +1,131 @@
+import io
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django_deovi.covers import store_cover
+from django_deovi.factories import DeviceFactory, DirectoryFactory
+from django_deovi.ingest import CoverIngester
+from django_deovi.loader import DumpLoader
+from django_deovi.models import Directory
+
+
+def test_loader_defer_covers(db, tests_settings):
+    """
+    With deferred covers, loader should only record the resolved cover paths and
+    keep the current covers.
+    """
+    device = DeviceFactory()
+    foo = DirectoryFactory(device=device, path="/videos/foo", checksum="1")
+
+    storage = Directory._meta.get_field("cover").storage
+    loader = DumpLoader(defer_covers=True)
+
+    with mock.patch.object(storage, "save") as mocked:
+        loader.process_directory(
+            device,
+            {
+                "foo": {
+                    "path": "/videos/foo",
+                    "checksum": "2",
+                    "cover": "covers/blue.png",
+                    "children_files": [],
+                },
+                "bar": {
+                    "path": "/videos/bar",
+                    "checksum": "1",
+                    "children_files": [],
+                },
+            },
+            tests_settings.fixtures_path,
+        )
+
+    assert mocked.called is False
+
+    fetched = Directory.objects.get(pk=foo.pk)
+    assert fetched.cover.name == foo.cover.name
+    assert fetched.pending_cover == str(
+        (tests_settings.fixtures_path / "covers/blue.png").resolve()
+    )
+    assert Directory.objects.get(path="/videos/bar").pending_cover == ""
+
+
+def test_cover_ingester(db, tests_settings, django_capture_on_commit_callbacks):
+    """
+    Ingester should store pending covers once per content, attach them to their
+    directories and remove replaced covers.
+    """
+    covers = tests_settings.fixtures_path / "covers"
+
+    replaced = DirectoryFactory(pending_cover=str(covers / "blue.png"))
+    replaced_cover = Path(replaced.cover.path)
+    same = DirectoryFactory(cover=None, pending_cover=str(covers / "blue.png"))
+    missing = DirectoryFactory(pending_cover=str(covers / "nope.png"))
+    other = DirectoryFactory(cover=None, pending_cover=str(covers / "red.png"))
+    untouched = DirectoryFactory()
+
+    ingester = CoverIngester(batch_size=2, workers=2)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        report = ingester.ingest()
+
+    assert report == {"ingested": 3, "missing": 1}
+    assert Directory.objects.exclude(pending_cover="").count() == 0
+
+    replaced = Directory.objects.get(pk=replaced.pk)
+    same = Directory.objects.get(pk=same.pk)
+    assert replaced.cover.name == same.cover.name
+    assert replaced.cover.name.startswith("directory/cover/content/")
+    assert Path(replaced.cover.path).exists() is True
+    assert replaced_cover.exists() is False
+
+    assert not Directory.objects.get(pk=missing.pk).cover
+    assert Directory.objects.get(pk=other.pk).cover.name != same.cover.name
+    assert Directory.objects.get(pk=untouched.pk).cover == untouched.cover
+
+
+def test_cover_ingester_store_lock(db, tests_settings):
+    """
+    Ingester should store covers with the shared cover storing and its own lock.
+    """
+    covers = tests_settings.fixtures_path / "covers"
+    ingester = CoverIngester(workers=2)
+
+    with mock.patch(
+        "django_deovi.ingest.store_cover", wraps=store_cover
+    ) as mocked:
+        first = ingester.store(covers / "blue.png")
+        second = ingester.store(covers / "blue.png")
+
+    assert first == second
+    assert first.startswith("directory/cover/content/")
+    assert mocked.call_count == 2
+    assert all(
+        call.kwargs["lock"] is ingester._lock for call in mocked.call_args_list
+    )
+
+
+def test_ingest_covers_command(db, tests_settings):
+    """
+    Command should only ingest covers from the given devices.
+    """
+    covers = tests_settings.fixtures_path / "covers"
+
+    foo = DirectoryFactory(pending_cover=str(covers / "blue.png"))
+    bar = DirectoryFactory(pending_cover=str(covers / "red.png"))
+
+    out = io.StringIO()
+    call_command("ingest_covers", device=[foo.device.slug], stdout=out)
+
+    assert out.getvalue().splitlines()[-1] == "🖼️ Ingested 1 covers, 0 missing"
+    assert Directory.objects.get(pk=foo.pk).pending_cover == ""
+    assert Directory.objects.get(pk=bar.pk).pending_cover != ""
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command("ingest_covers", device=["nope"], stdout=out)
+
+    assert str(excinfo.value) == "Unknown device slug(s): nope"
@@ -0,0 +1,140 @@
+import io
+import json
+
+from django.core.management import call_command
+
+from django_deovi.factories import (
+    DeviceFactory, DirectoryFactory, DumpedFileFactory, MediaFileFactory
+)
+from django_deovi.loader import DumpLoader
+from django_deovi.models import Device, Directory, MediaFile
+
+
+def build_payload(tests_settings):
+    """
+    Build a dump payload from fixture where every directories have a checksum.
+    """
+    payload = json.loads(
+        (tests_settings.fixtures_path / "dump_directories.json").read_text()
+    )
+    payload["registry"]["series/BillyBoy"]["checksum"] = "002"
+    payload["registry"]["series/BillyBoy"]["cover"] = "covers/blue.png"
+    payload["registry"]["theatre"]["checksum"] = "010"
+    payload["registry"]["series/ZouipWorld"]["cover"] = "covers/nope.png"
+
+    return payload
+
+
+def test_loader_plan(db, tests_settings, django_assert_num_queries):
+    """
+    Plan should count what a load would do with only read queries.
+    """
+    device = DeviceFactory(slug="donald")
+    billyboy = DirectoryFactory(
+        device=device, path="/videos/series/BillyBoy", checksum="001"
+    )
+    theatre = DirectoryFactory(device=device, path="/videos/theatre", checksum="010")
+    removed = DirectoryFactory(device=device, path="/videos/removed")
+
+    payload = build_payload(tests_settings)
+    dumped = payload["registry"]["series/BillyBoy"]["children_files"]
+
+    # One unchanged file and one changed file, the other one is new
+    MediaFileFactory(
+        directory=billyboy,
+        **DumpedFileFactory(**dumped[0]).convert_to_orm_fields()
+    )
+    MediaFileFactory(
+        directory=billyboy,
+        **dict(DumpedFileFactory(**dumped[1]).convert_to_orm_fields(), filesize=1)
+    )
+    MediaFileFactory(directory=billyboy, path="/videos/series/BillyBoy/gone.mkv")
+    MediaFileFactory(directory=theatre, path="/videos/theatre/kept.mkv")
+    MediaFileFactory(directory=removed, path="/videos/removed/foo.mkv")
+
+    loader = DumpLoader()
+
+    # Device, directories and files index
+    with django_assert_num_queries(3):
+        plan = loader.plan(
+            "donald",
+            payload,
+            covers_basepath=tests_settings.fixtures_path,
+            sync=True,
+        )
+
+    cover_size = (tests_settings.fixtures_path / "covers/blue.png").stat().st_size
+
+    assert plan.as_dict() == {
+        "device": "donald",
+        "new_device": False,
+        "unchanged_dump": False,
+        "directories": {
+            "created": 1, "updated": 1, "skipped": 1, "pruned": 1, "invalid": 0,
+        },
+        "files": {"created": 2, "updated": 1, "unchanged": 1, "pruned": 1},
+        "covers": {"copied": 1, "missing": 1},
+        "payload_size": plan.payload_size,
+        "cover_size": cover_size,
+        "written_rows": 7,
+        "written_size": plan.payload_size + cover_size,
+    }
+    assert plan.payload_size > 0
+
+    # Nothing has been written
+    assert Directory.objects.filter(device=device).count() == 3
+    assert MediaFile.objects.count() == 5
+
+
+def test_loader_plan_new_device(db, tests_settings):
+    """
+    Plan for a new device should count everything as created and not create the
+    device.
+    """
+    payload = build_payload(tests_settings)
+    payload["registry"]["theatre"]["children_files"].append({"path": "/nope.mkv"})
+
+    plan = DumpLoader(defer_covers=True).plan("nope", payload, sync=True)
+
+    assert plan.new_device is True
+    assert plan.directories == {
+        "created": 2, "updated": 0, "skipped": 0, "pruned": 0, "invalid": 1,
+    }
+    assert plan.files["created"] == 4
+    assert plan.covers == {"copied": 0, "missing": 0}
+    assert Device.objects.filter(slug="nope").exists() is False
+
+
+def test_load_medias_dry_run(db, tests_settings):
+    """
+    Command with dry run should output the plan without loading anything, an
+    unchanged dump is reported as is.
+    """
+    dump_path = tests_settings.fixtures_path / "dump_directories.json"
+
+    out = io.StringIO()
+    call_command("load_medias", "donald", str(dump_path), dry_run=True, stdout=out)
+
+    assert out.getvalue().splitlines()[1:] == [
+        "Plan for device: donald (new)",
+        "- Directories: 3 created, 0 updated, 0 skipped, 0 pruned, 0 invalid",
+        "- Files: 5 created, 0 updated, 0 unchanged, 0 pruned",
+        "- Covers: 0 to copy (0 bytes), 0 missing",
+        "- Estimated writes: 8 rows, {} bytes".format(
+            sum([
+                len(json.dumps(item))
+                for item in json.loads(dump_path.read_text())["registry"].values()
+            ])
+        ),
+    ]
+    assert Device.objects.count() == 0
+
+    call_command("load_medias", "donald", str(dump_path), stdout=io.StringIO())
+
+    out = io.StringIO()
+    call_command("load_medias", "donald", str(dump_path), dry_run=True, stdout=out)
+
+    assert out.getvalue().splitlines()[1:] == [
+        "Plan for device: donald",
+        "- Dump has not changed since the last load",
+    ]
@@ -0,0 +1,175 @@
+import io
+import json
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django_deovi.factories import DeviceFactory, DirectoryFactory, MediaFileFactory
+from django_deovi.loader import DumpLoader
+from django_deovi.report import COUNTERS, STAGES, LoadReport
+
+
+def test_load_report_stages():
+    """
+    Report should sum stage timings and only time the items retrieval when
+    iterating.
+    """
+    report = LoadReport("donald")
+
+    with report.stage("create"):
+        pass
+    with report.stage("create"):
+        pass
+
+    assert list(report.iterate("parse", ["a", "b"])) == ["a", "b"]
+
+    report.add(files_created=2)
+    report.add(files_created=3, covers_copied=1)
+
+    data = json.loads(report.to_json())
+    assert data["device"] == "donald"
+    assert sorted(data["timings"]) == sorted(STAGES)
+    assert data["timings"]["create"]["wall"] >= 0
+    assert data["counters"] == dict(
+        dict.fromkeys(COUNTERS, 0), files_created=5, covers_copied=1
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_dumploader_load_report(transactional_db, tests_settings, workers):
+    """
+    Load should return a report with counters of written objects, stage timings
+    and number of executed queries, whatever the number of workers.
+
+    Database is not wrapped in a transaction since workers write from their own
+    connection.
+    """
+    payload = json.loads(
+        (tests_settings.fixtures_path / "dump_directories.json").read_text()
+    )
+    payload["registry"]["series/BillyBoy"]["cover"] = "covers/blue.png"
+    payload["registry"]["theatre"]["checksum"] = "010"
+
+    device = DeviceFactory(slug="donald")
+    billyboy = DirectoryFactory(device=device, path="/videos/series/BillyBoy")
+    DirectoryFactory(device=device, path="/videos/theatre", checksum="010")
+    removed = DirectoryFactory(device=device, path="/videos/removed")
+    MediaFileFactory(
+        directory=billyboy, path="/videos/series/BillyBoy/BillyBoy_S01E01.mkv"
+    )
+    MediaFileFactory(directory=billyboy, path="/videos/series/BillyBoy/gone.mkv")
+    MediaFileFactory(directory=removed, path="/videos/removed/foo.mkv")
+
+    loader = DumpLoader(chunk_limit=1, workers=workers)
+    report = loader.load(
+        device.slug,
+        payload,
+        covers_basepath=tests_settings.fixtures_path,
+        sync=True,
+    )
+
+    assert report.device == "donald"
+    assert report.unchanged_dump is False
+    assert report.failed_chunks == []
+    assert report.counters == {
+        "directories_created": 1,
+        "directories_updated": 1,
+        "directories_skipped": 1,
+        "directories_deleted": 1,
+        "files_created": 3,
+        "files_updated": 1,
+        "files_deleted": 1,
+        "files_upserted": 0,
+        "covers_copied": report.counters["covers_copied"],
+    }
+    # Cover may already be stored from a previous test run
+    assert report.counters["covers_copied"] in (0, 1)
+    assert report.queries > 0
+    assert report.wall_time > 0
+    assert report.timings["parse"]["wall"] > 0
+    assert report.timings["create"]["wall"] > 0
+    assert report.timings["prune"]["wall"] > 0
+
+
+def test_dumploader_load_report_failed_chunk(db):
+    """
+    Counters from a rolled back chunk should not be reported.
+    """
+    report = DumpLoader(chunk_limit=1).load(
+        "donald",
+        {
+            "device": {"total": 1000, "used": 250, "free": 750},
+            "registry": {
+                "foo": {
+                    "path": "/videos/foo",
+                    "children_files": [{"path": "/videos/foo/bar.mkv"}],
+                },
+                "bar": {
+                    "path": "/videos/bar",
+                    "children_files": [],
+                },
+            },
+        },
+    )
+
+    assert report.failed_chunks == [1]
+    assert report.counters["directories_created"] == 1
+    assert report.counters["files_created"] == 0
+
+
+def test_load_medias_report(db, tmp_path, tests_settings):
+    """
+    Command should write the load report to the given JSON file.
+    """
+    report_path = tmp_path / "report.json"
+
+    out = io.StringIO()
+    call_command(
+        "load_medias",
+        "donald",
+        str(tests_settings.fixtures_path / "dump_directories.json"),
+        report=report_path,
+        stdout=out,
+    )
+
+    assert out.getvalue().splitlines()[-1] == "Report written to: {}".format(
+        report_path
+    )
+
+    report = json.loads(report_path.read_text())
+    assert report["device"] == "donald"
+    assert report["counters"]["directories_created"] == 3
+    assert report["counters"]["files_created"] == 5
+    assert report["queries"] > 0
+
+
+def test_load_medias_failed_chunks(db, tmp_path):
+    """
+    Command should write the report and then fail if some chunks have been rolled
+    back.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_text(json.dumps({
+        "device": {"total": 1000, "used": 250, "free": 750},
+        "registry": {
+            "foo": {
+                "path": "/videos/foo",
+                "children_files": [{"path": "/videos/foo/bar.mkv"}],
+            },
+        },
+    }))
+    report_path = tmp_path / "report.json"
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command(
+            "load_medias",
+            "donald",
+            str(dump_path),
+            report=report_path,
+            stdout=io.StringIO(),
+        )
+
+    assert str(excinfo.value) == "Failed to load 1 chunk(s): 1"
+    assert json.loads(report_path.read_text())["failed_chunks"] == [1]
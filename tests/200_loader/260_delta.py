@@ -0,0 +1,276 @@
+import io
+import json
+import logging
+
+import pytest
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from django_deovi import __pkgname__
+from django_deovi.delta import is_delta, validate_delta
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.factories import DumpedFileFactory
+from django_deovi.loader import DumpLoader
+from django_deovi.models import Device, Directory, MediaFile
+from django_deovi.models.querysets import DirectoryQuerySet, MediaFileQuerySet
+
+
+def build_delta(base, checksum="new", **kwargs):
+    """
+    Build a delta document for the directories fixture dump.
+    """
+    return dict({"delta": {"base": base, "checksum": checksum, "size": 42}}, **kwargs)
+
+
+@pytest.fixture
+def loaded(db, tmp_path, tests_settings):
+    """
+    Load the directories fixture dump file and return its device.
+    """
+    dump_path = tmp_path / "dump.json"
+    dump_path.write_bytes(
+        (tests_settings.fixtures_path / "dump_directories.json").read_bytes()
+    )
+    DumpLoader().load("donald", dump_path, covers_basepath=tests_settings.fixtures_path)
+
+    return Device.objects.get(slug="donald")
+
+
+def test_is_delta(tmp_path, tests_settings):
+    """
+    Delta documents should be detected from their first item.
+    """
+    assert is_delta(tests_settings.fixtures_path / "dump_directories.json") is False
+    assert is_delta({"delta": {}}) is True
+    assert is_delta({"registry": {}}) is False
+
+    delta_path = tmp_path / "delta.json"
+    delta_path.write_text(json.dumps(build_delta("abc")))
+    assert is_delta(delta_path) is True
+
+    delta_path.write_text("nope")
+    assert is_delta(delta_path) is False
+
+
+def test_validate_delta():
+    """
+    Delta should have a base and a checksum, every other items are optional.
+    """
+    assert validate_delta(build_delta("abc")) == {
+        "delta": {"base": "abc", "checksum": "new", "size": 42},
+        "device": None,
+        "directories": {"added": {}, "changed": {}, "removed": []},
+        "files": {"added": [], "changed": [], "removed": []},
+    }
+
+    with pytest.raises(DjangoDeoviError):
+        validate_delta({"delta": {"checksum": "new"}})
+
+
+def test_load_delta(loaded, caplog, tests_settings, django_assert_max_num_queries):
+    """
+    Delta changes should be applied without reading the whole device and its
+    checksum stored as the device dump fingerprint.
+    """
+    caplog.set_level(logging.INFO, logger=__pkgname__)
+
+    changed_file = DumpedFileFactory(
+        path="/videos/series/BillyBoy/BillyBoy_S01E02.mkv",
+        absolute_dir="/videos/series/BillyBoy",
+        size=1234,
+    ).to_dict()
+    added_file = DumpedFileFactory(
+        path="/videos/series/BillyBoy/BillyBoy_S01E04.mkv",
+        absolute_dir="/videos/series/BillyBoy",
+    ).to_dict()
+
+    delta = build_delta(
+        loaded.dump_checksum,
+        device={"total": 1000, "used": 300, "free": 700},
+        directories={
+            "added": {
+                "news": {
+                    "path": "/videos/news",
+                    "checksum": "1",
+                    "children_files": [
+                        DumpedFileFactory(path="/videos/news/foo.mkv").to_dict(),
+                    ],
+                },
+            },
+            "changed": {
+                "theatre": {
+                    "path": "/videos/theatre",
+                    "title": "Theatre",
+                    "checksum": "2",
+                },
+            },
+            "removed": ["/videos/series/ZouipWorld"],
+        },
+        files={
+            "added": [added_file],
+            "changed": [changed_file],
+            "removed": ["/videos/series/BillyBoy/BillyBoy_S01E03.mkv"],
+        },
+    )
+
+    with django_assert_max_num_queries(30):
+        report = DumpLoader().load(
+            "donald", delta, covers_basepath=tests_settings.fixtures_path
+        )
+
+    assert report.counters == {
+        "directories_created": 1,
+        "directories_updated": 1,
+        "directories_skipped": 0,
+        "directories_deleted": 1,
+        "files_created": 2,
+        "files_updated": 1,
+        "files_deleted": 1,
+        "files_upserted": 0,
+        "covers_copied": 0,
+    }
+    assert caplog.record_tuples[-1] == (
+        __pkgname__,
+        logging.INFO,
+        "🧩 Delta applied: 2 directories and 3 files written, 1 directories and 1 "
+        "files removed",
+    )
+
+    device = Device.objects.get(slug="donald")
+    assert device.dump_checksum == "new"
+    assert device.dump_size == 42
+    assert device.dump_mtime is None
+    assert device.disk_used == 300
+
+    assert sorted(
+        Directory.objects.filter(device=device).values_list("path", flat=True)
+    ) == ["/videos/news", "/videos/series/BillyBoy", "/videos/theatre"]
+    assert Directory.objects.get(path="/videos/theatre").title == "Theatre"
+    assert sorted(
+        MediaFile.objects.filter(directory__device=device).values_list(
+            "path", flat=True
+        )
+    ) == [
+        "/videos/news/foo.mkv",
+        "/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+        "/videos/series/BillyBoy/BillyBoy_S01E02.mkv",
+        "/videos/series/BillyBoy/BillyBoy_S01E04.mkv",
+        "/videos/theatre/Coucou_1982.avi",
+    ]
+    assert MediaFile.objects.get(
+        path="/videos/series/BillyBoy/BillyBoy_S01E02.mkv"
+    ).filesize == 1234
+
+    # Delta is not applied twice
+    report = DumpLoader().load("donald", delta)
+    assert report.unchanged_dump is True
+    assert caplog.record_tuples[-1] == (
+        __pkgname__, logging.INFO, "⏭️ Delta has already been applied"
+    )
+
+
+def test_load_delta_removed_batches(loaded, monkeypatch):
+    """
+    Removed files and directories should be deleted by batches of the loader batch
+    limit.
+    """
+    batches = []
+    original = MediaFileQuerySet.bulk_delete
+
+    def spy(queryset, *args, **kwargs):
+        batches.append(queryset.model.__name__)
+        return original(queryset, *args, **kwargs)
+
+    monkeypatch.setattr(MediaFileQuerySet, "bulk_delete", spy)
+    monkeypatch.setattr(DirectoryQuerySet, "bulk_delete", spy)
+
+    delta = build_delta(
+        loaded.dump_checksum,
+        directories={
+            "removed": ["/videos/series/ZouipWorld", "/videos/theatre"],
+        },
+        files={
+            "removed": [
+                "/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+                "/videos/series/BillyBoy/BillyBoy_S01E02.mkv",
+                "/videos/series/BillyBoy/BillyBoy_S01E03.mkv",
+            ],
+        },
+    )
+
+    report = DumpLoader(batch_limit=2).load("donald", delta)
+
+    assert batches == ["MediaFile", "MediaFile", "Directory"]
+    assert report.counters["files_deleted"] == 3
+    assert report.counters["directories_deleted"] == 2
+    assert list(
+        Directory.objects.filter(device=loaded).values_list("path", flat=True)
+    ) == ["/videos/series/BillyBoy"]
+    assert MediaFile.objects.filter(directory__device=loaded).count() == 0
+
+
+def test_load_delta_errors(loaded):
+    """
+    Delta should not be applied on another base, on an unknown device and should be
+    fully rolled back if any change fails.
+    """
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        DumpLoader().load("donald", build_delta("nope"))
+
+    assert str(excinfo.value) == (
+        "Delta base does not match the last loaded dump of device: donald"
+    )
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        DumpLoader().load("nope", build_delta("nope"))
+
+    assert str(excinfo.value) == (
+        "A delta can only be applied on an existing device: nope"
+    )
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        DumpLoader().load(
+            "donald",
+            build_delta(
+                loaded.dump_checksum,
+                directories={"removed": ["/videos/theatre"]},
+                files={
+                    "added": [
+                        DumpedFileFactory(
+                            path="/videos/nope/foo.mkv", absolute_dir="/videos/nope"
+                        ).to_dict()
+                    ],
+                },
+            ),
+        )
+
+    assert str(excinfo.value) == (
+        "Delta files are related to unknown directories: /videos/nope"
+    )
+    assert Directory.objects.filter(path="/videos/theatre").exists() is True
+    assert Device.objects.get(slug="donald").dump_checksum == loaded.dump_checksum
+
+
+def test_load_medias_delta(loaded, tmp_path):
+    """
+    Command should apply a delta document file and refuse a dry run for it.
+    """
+    delta_path = tmp_path / "delta.json"
+    delta_path.write_text(json.dumps(build_delta(
+        loaded.dump_checksum,
+        directories={"removed": ["/videos/theatre"]},
+    )))
+
+    with pytest.raises(CommandError) as excinfo:
+        call_command(
+            "load_medias", "donald", str(delta_path), dry_run=True,
+            stdout=io.StringIO(),
+        )
+
+    assert str(excinfo.value) == "Dry run is not available for a delta document"
+
+    call_command("load_medias", "donald", str(delta_path), stdout=io.StringIO())
+
+    assert Directory.objects.filter(path="/videos/theatre").exists() is False
+    assert Device.objects.get(slug="donald").dump_checksum == "new"
@@ -0,0 +1,92 @@
+import datetime
+
+import pytest
+
+from django.db import connections
+from django.utils import timezone
+
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.factories import DirectoryFactory, DumpedFileFactory
+from django_deovi.loader import DumpLoader
+from django_deovi.models import MediaFile
+from django_deovi.writers import (
+    CopyWriter, ExecutemanyWriter, OrmWriter, get_writer
+)
+
+
+def test_get_writer(db):
+    """
+    Writer should be chosen from database vendor unless a name or an object is
+    given.
+    """
+    assert isinstance(get_writer(), ExecutemanyWriter)
+    assert isinstance(get_writer("auto"), ExecutemanyWriter)
+    assert isinstance(get_writer("orm"), OrmWriter)
+    assert get_writer("copy", batch_size=42).batch_size == 42
+
+    writer = OrmWriter()
+    assert get_writer(writer) is writer
+    assert DumpLoader(writer=writer).writer is writer
+
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        get_writer("nope")
+
+    assert str(excinfo.value) == "Unknown file writer: nope"
+
+
+def test_get_writer_copy_opt_in(db, monkeypatch):
+    """
+    COPY writer should never be chosen from the database vendor.
+    """
+    monkeypatch.setattr(connections["default"], "vendor", "postgresql")
+
+    assert isinstance(get_writer(), OrmWriter)
+    assert isinstance(get_writer("copy"), CopyWriter)
+
+
+@pytest.mark.parametrize("batch_size", [None, 2])
+def test_writers_same_rows(db, batch_size):
+    """
+    Raw writers should create the same rows than the ORM writer.
+    """
+    batch_date = timezone.now() - datetime.timedelta(days=1)
+    files = [
+        DumpedFileFactory(path="/videos/foo-{}.mkv".format(i))
+        for i in range(5)
+    ]
+
+    rows = {}
+    for writer in (OrmWriter, ExecutemanyWriter):
+        directory = DirectoryFactory(path="/videos")
+        writer(batch_size=batch_size).create(directory, files, batch_date)
+
+        rows[writer.name] = list(
+            MediaFile.objects.filter(directory=directory).order_by("path").values(
+                "title", "path", "absolute_dir", "dirname", "filename", "container",
+                "filesize", "cover", "stored_date", "loaded_date",
+            )
+        )
+
+    assert len(rows["executemany"]) == 5
+    assert rows["executemany"] == rows["orm"]
+    assert rows["executemany"][0]["loaded_date"] == batch_date
+
+
+def test_copy_writer_buffer():
+    """
+    COPY writer should escape values for the text format.
+    """
+    writer = CopyWriter(using="default")
+
+    buffer = writer.get_buffer([
+        (1, "foo\tbar\\baz", None, datetime.datetime(2022, 6, 13, 13, 57, 34)),
+        (2, "multi\nline", "", 0),
+    ])
+
+    assert buffer.read() == (
+        "1\tfoo\\tbar\\\\baz\t\\N\t2022-06-13T13:57:34\n"
+        "2\tmulti\\nline\t\t0\n"
+    )
+    assert writer.get_statement().startswith(
+        'COPY "django_deovi_mediafile" ("directory_id", "title", "path"'
+    )
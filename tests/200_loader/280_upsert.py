@@ -0,0 +1,99 @@
+import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from django_deovi.factories import (
+    DeviceFactory, DirectoryFactory, DumpedFileFactory, MediaFileFactory
+)
+from django_deovi.loader import DumpLoader
+from django_deovi.models import MediaFile
+
+
+def test_loader_upsert(db):
+    """
+    Upsert should create new files and only update the changed ones, without
+    reading existing files.
+    """
+    yesterday = timezone.now() - datetime.timedelta(days=1)
+
+    device = DeviceFactory()
+    directory = DirectoryFactory(device=device, path="/videos/foo", checksum="1")
+
+    unchanged = DumpedFileFactory(path="/videos/foo/unchanged.mkv")
+    changed = DumpedFileFactory(path="/videos/foo/changed.mkv")
+    added = DumpedFileFactory(path="/videos/foo/added.mkv")
+
+    unchanged_file = MediaFileFactory(
+        directory=directory,
+        loaded_date=yesterday,
+        **unchanged.convert_to_orm_fields()
+    )
+    changed_file = MediaFileFactory(
+        directory=directory,
+        loaded_date=yesterday,
+        **dict(changed.convert_to_orm_fields(), filesize=1)
+    )
+
+    loader = DumpLoader(upsert=True)
+
+    with CaptureQueriesContext(connection) as captured:
+        loader.process_directory(
+            device,
+            {
+                "foo": {
+                    "path": "/videos/foo",
+                    "checksum": "2",
+                    "children_files": [
+                        unchanged.to_dict(), changed.to_dict(), added.to_dict(),
+                    ],
+                },
+            },
+            None,
+        )
+
+    assert loader.report.counters["files_upserted"] == 2
+    assert [
+        query["sql"] for query in captured.captured_queries
+        if query["sql"].startswith("SELECT") and "django_deovi_mediafile" in
+        query["sql"]
+    ] == []
+
+    assert MediaFile.objects.filter(directory=directory).count() == 3
+
+    unchanged_file.refresh_from_db()
+    assert unchanged_file.loaded_date == yesterday
+
+    changed_file.refresh_from_db()
+    assert changed_file.filesize == changed.size
+    assert changed_file.loaded_date > yesterday
+
+    added_file = MediaFile.objects.get(path=added.path)
+    assert added_file.filename == "added.mkv"
+    assert added_file.stored_date == added.convert_to_orm_fields()["stored_date"]
+
+
+def test_load_upsert_sync(db, tests_settings):
+    """
+    Upsert should keep the files index up to date so pruning only removes the
+    files which are not in the dump.
+    """
+    device = DeviceFactory(slug="donald")
+    billyboy = DirectoryFactory(device=device, path="/videos/series/BillyBoy")
+    kept = MediaFileFactory(
+        directory=billyboy, path="/videos/series/BillyBoy/BillyBoy_S01E01.mkv"
+    )
+    MediaFileFactory(directory=billyboy, path="/videos/series/BillyBoy/gone.mkv")
+
+    report = DumpLoader(upsert=True).load(
+        "donald",
+        tests_settings.fixtures_path / "dump_directories.json",
+        covers_basepath=tests_settings.fixtures_path,
+        sync=True,
+    )
+
+    assert report.pruned == {"directories": [], "files": 1}
+    assert report.counters["files_upserted"] == 5
+    assert MediaFile.objects.filter(pk=kept.pk).exists() is True
+    assert MediaFile.objects.filter(directory__device=device).count() == 5
@@ -0,0 +1,126 @@
+import datetime
+
+import pytest
+
+from django.utils import timezone
+
+from django_deovi.diff import FileDiff
+from django_deovi.dump import DumpedFileBatch
+from django_deovi.exceptions import DjangoDeoviError
+from django_deovi.factories import (
+    DeviceFactory, DirectoryFactory, DumpedFileFactory, MediaFileFactory
+)
+from django_deovi.index import MediaFileIndex
+from django_deovi.loader import DumpLoader
+from django_deovi.models import MediaFile
+
+
+def test_file_diff_compare(db):
+    """
+    Diff should classify dumped files and existing rows with a single merge.
+    """
+    device = DeviceFactory()
+    foo = DirectoryFactory(device=device, path="/videos/foo")
+    bar = DirectoryFactory(device=device, path="/videos/bar")
+
+    unchanged = DumpedFileFactory(path="/videos/foo/unchanged.mkv")
+    changed = DumpedFileFactory(path="/videos/foo/changed.mkv")
+    added = DumpedFileFactory(path="/videos/bar/added.mkv")
+
+    unchanged_file = MediaFileFactory(
+        directory=foo, **unchanged.convert_to_orm_fields()
+    )
+    changed_file = MediaFileFactory(
+        directory=foo, **dict(changed.convert_to_orm_fields(), filesize=1)
+    )
+    # Same path than a dumped file but from another directory
+    removed_file = MediaFileFactory(directory=bar, path=unchanged.path)
+
+    diff = FileDiff(DumpLoader.EDITABLE_FIELDS)
+    batches = {
+        foo.pk: DumpedFileBatch.from_objects([unchanged, changed]),
+        bar.pk: DumpedFileBatch.from_objects([added]),
+    }
+
+    for index in (None, MediaFileIndex.from_device(device)):
+        result = diff.compare(
+            diff.get_dumped_frame(batches),
+            diff.get_existing_frame([foo.pk, bar.pk], index=index),
+        )
+
+        assert list(result.create["path"]) == [added.path]
+        assert list(result.create["position"]) == [0]
+        assert list(result.unchanged["pk"]) == [unchanged_file.pk]
+        assert list(result.update["pk"]) == [changed_file.pk]
+        assert list(result.delete["pk"]) == [removed_file.pk]
+        assert result.changed.to_dict("records") == [
+            dict(dict.fromkeys(result.changed.columns, False), filesize=True)
+        ]
+
+    # Compared directories have been removed from index
+    assert len(index) == 0
+
+
+def test_loader_diff_engine_invalid():
+    """
+    An unknown diff engine should raise an error.
+    """
+    with pytest.raises(DjangoDeoviError) as excinfo:
+        DumpLoader(diff_engine="nope")
+
+    assert str(excinfo.value) == "Unknown diff engine: nope"
+
+
+@pytest.mark.parametrize("sync", [False, True])
+def test_load_diff_engine(db, tests_settings, sync):
+    """
+    Load with the pandas diff engine should write the same files and report the
+    same counters than the default one.
+    """
+    yesterday = timezone.now() - datetime.timedelta(days=1)
+    results = []
+
+    for engine in DumpLoader.DIFF_ENGINES:
+        device = DeviceFactory(slug="donald-{}".format(engine))
+        billyboy = DirectoryFactory(device=device, path="/videos/series/BillyBoy")
+        MediaFileFactory(
+            directory=billyboy,
+            path="/videos/series/BillyBoy/BillyBoy_S01E01.mkv",
+            loaded_date=yesterday,
+        )
+        MediaFileFactory(
+            directory=billyboy,
+            path="/videos/series/BillyBoy/gone.mkv",
+            filesize=1,
+            stored_date=yesterday,
+            loaded_date=yesterday,
+        )
+
+        report = DumpLoader(diff_engine=engine, chunk_limit=2).load(
+            device.slug,
+            tests_settings.fixtures_path / "dump_directories.json",
+            covers_basepath=tests_settings.fixtures_path,
+            sync=sync,
+        )
+
+        results.append((
+            report.counters,
+            report.pruned,
+            list(
+                MediaFile.objects.filter(directory__device=device).order_by(
+                    "path"
+                ).values_list(
+                    "path", "filename", "absolute_dir", "container", "filesize",
+                    "stored_date",
+                )
+            ),
+        ))
+
+    assert results[0] == results[1]
+
+    counters, pruned, files = results[1]
+    assert counters["files_created"] == 4
+    assert counters["files_updated"] == 1
+    assert len(files) == (5 if sync else 6)
+    if sync:
+        assert pruned == {"directories": [], "files": 1}